@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """
+    Collects concurrent scene graph forward passes into micro-batches.
+
+    Callers submit one preprocessed image with its boxes and block on a
+    future. A background thread waits up to ``max_wait_ms`` for more requests
+    (or until ``max_batch_size`` is reached), runs one backbone pass over the
+    whole batch and hands each caller the outputs for its own image.
+    """
+
+    def __init__(
+        self,
+        model_getter: Callable[[], Any],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+    ):
+        # model_getter is called per batch so hot-reloaded models are picked up
+        self.model_getter = model_getter
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics
+        self.batches_run = 0
+        self.images_run = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="inference-batcher", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Inference batcher started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.0f})"
+        )
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def submit(
+        self,
+        img_tensor: torch.Tensor,
+        boxes: torch.Tensor,
+        max_pairs: Optional[int] = None,
+    ) -> Future:
+        """Queue one image ([1, 3, H, W] or [3, H, W]) with its [N, 5] boxes."""
+        if self._thread is None:
+            raise RuntimeError("Inference batcher is not running")
+
+        if img_tensor.dim() == 4:
+            img_tensor = img_tensor[0]
+
+        future: Future = Future()
+        self._queue.put((img_tensor, boxes, max_pairs, future))
+        return future
+
+    def infer(
+        self,
+        img_tensor: torch.Tensor,
+        boxes: torch.Tensor,
+        max_pairs: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Run one image through the batcher and wait for its outputs."""
+        return self.submit(img_tensor, boxes, max_pairs).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches_run": self.batches_run,
+            "images_run": self.images_run,
+            "mean_batch_size": (
+                self.images_run / self.batches_run if self.batches_run else 0.0
+            ),
+            "pending": self._queue.qsize(),
+        }
+
+    def _collect_batch(self, first) -> List:
+        """Gather more requests until the batch is full or the wait expires."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop signal - finish this batch first
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = self._collect_batch(item)
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                logger.error(f"Error running inference batch: {str(e)}")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run_batch(self, batch: List) -> None:
+        models = self.model_getter()
+        device = models.device
+
+        images = torch.stack([img.to(device) for img, _, _, _ in batch])
+        boxes = [b.to(device) for _, b, _, _ in batch]
+        max_pairs = [limit for _, _, limit, _ in batch]
+
+        # One backbone pass for the whole batch
+        with torch.no_grad():
+            outputs = models.model(
+                images, boxes, max_pairs=max_pairs, heads=models.heads
+            )
+
+        self.batches_run += 1
+        self.images_run += len(batch)
+
+        # Hand each request the outputs for its own image (as a batch of one)
+        for i, (*_, future) in enumerate(batch):
+            future.set_result({key: [value[i]] for key, value in outputs.items()})
@@ -0,0 +1,195 @@
+"""
+Export the scene graph model to a static TorchScript or ONNX graph.
+
+The backbone, RoI pooling and the heads (object classifier, attribute
+classifier, bounding box regressor and relationship predictor) are traced into
+one graph with dynamic image, box and pair counts. Pair building and pruning
+stay in Python, so max_pairs works the same with every runtime.
+
+Usage (from the backend directory):
+    python -m app.export_model --format onnx --heads objects bboxes relationships
+
+Exported graphs always run the heads they were exported with, so export only
+the heads in CONFIG["heads"]["enabled"] to skip the others.
+
+Serve the result by setting CONFIG["runtime"]["backend"] to "onnxruntime"
+(or "torchscript") and CONFIG["runtime"]["path"] to the exported file.
+"""
+
+import os
+import argparse
+import logging
+from typing import Collection, Tuple
+
+import torch
+
+from app.scene_graph_service import (
+    CONFIG,
+    EXPORTED_INPUTS,
+    HEAD_OUTPUTS,
+    MODEL_HEADS,
+    SceneGraphGenerationModel,
+    Vocabulary,
+    build_model,
+    exported_model_path,
+    is_quantized,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"onnx": "onnxruntime", "torchscript": "torchscript"}
+
+
+class ExportableSceneGraphModel(torch.nn.Module):
+    """Tensor-only wrapper around SceneGraphGenerationModel.forward_packed."""
+
+    def __init__(
+        self,
+        model: SceneGraphGenerationModel,
+        heads: Collection[str] = MODEL_HEADS,
+        fused_gather: bool = True,
+    ):
+        super().__init__()
+        self.model = model
+        self.heads = tuple(heads)
+        self.fused_gather = fused_gather
+
+    def forward(
+        self,
+        images: torch.Tensor,
+        boxes: torch.Tensor,
+        batch_idx: torch.Tensor,
+        pairs: torch.Tensor,
+    ) -> Tuple[torch.Tensor, ...]:
+        outputs = self.model.forward_packed(
+            images,
+            boxes,
+            batch_idx,
+            pairs,
+            fused_gather=self.fused_gather,
+            heads=self.heads,
+        )
+        # Only the requested heads become graph outputs
+        return tuple(output for output in outputs if output is not None)
+
+
+def example_inputs(num_classes: int) -> Tuple[torch.Tensor, ...]:
+    """Two images with three boxes each and all their ordered pairs."""
+    img_size = CONFIG["img_size"]
+    images = torch.zeros(2, 3, img_size, img_size)
+    boxes = torch.tensor(
+        [
+            [0.3, 0.3, 0.4, 0.4, 0],
+            [0.6, 0.6, 0.4, 0.4, 1],
+            [0.5, 0.4, 0.2, 0.6, 2],
+        ]
+        * 2
+    )
+    boxes[:, 4] = boxes[:, 4] % num_classes
+    batch_idx = torch.tensor([0, 0, 0, 1, 1, 1])
+    _, pairs = SceneGraphGenerationModel.build_pairs([3, 3], torch.device("cpu"))
+    return images, boxes, batch_idx, pairs
+
+
+def export_model(
+    model: SceneGraphGenerationModel,
+    output_path: str,
+    export_format: str,
+    heads: Collection[str] = MODEL_HEADS,
+) -> None:
+    """
+    Trace a loaded model and save it as TorchScript or ONNX.
+
+    Args:
+        model: fp32 scene graph model (quantized models cannot be exported)
+        output_path: File to write
+        export_format: "torchscript" or "onnx"
+        heads: Heads to include, out of MODEL_HEADS
+    """
+    if is_quantized(model):
+        raise ValueError("Quantized models cannot be exported; export the fp32 model")
+    unknown = [head for head in heads if head not in MODEL_HEADS]
+    if unknown or not heads:
+        raise ValueError(f"Heads must be a non-empty subset of {MODEL_HEADS}")
+
+    # Keep the heads in output order
+    heads = [head for head in MODEL_HEADS if head in heads]
+    model = model.cpu().eval()
+    inputs = example_inputs(model.num_obj_classes)
+
+    if export_format == "torchscript":
+        wrapper = ExportableSceneGraphModel(model, heads).eval()
+        with torch.no_grad():
+            traced = torch.jit.trace(wrapper, inputs, check_trace=False)
+        torch.jit.save(
+            torch.jit.freeze(traced),
+            output_path,
+            _extra_files={"heads": ",".join(heads)},
+        )
+    elif export_format == "onnx":
+        # embedding_bag with per-sample weights has no ONNX kernel; the plain
+        # gathers compute the same RoI features
+        wrapper = ExportableSceneGraphModel(model, heads, fused_gather=False).eval()
+        dynamic_axes = {
+            "images": {0: "batch_size"},
+            "boxes": {0: "num_objects"},
+            "batch_idx": {0: "num_objects"},
+            "pairs": {0: "num_pairs"},
+        }
+        for head in heads:
+            size = "num_pairs" if head == "relationships" else "num_objects"
+            dynamic_axes[HEAD_OUTPUTS[head]] = {0: size}
+        torch.onnx.export(
+            wrapper,
+            inputs,
+            output_path,
+            input_names=list(EXPORTED_INPUTS),
+            output_names=[HEAD_OUTPUTS[head] for head in heads],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the scene graph model")
+    parser.add_argument(
+        "--model-path",
+        default=os.environ.get("SGG_MODEL_PATH", "app/models/model.pth"),
+    )
+    parser.add_argument(
+        "--vocabulary-path",
+        default=os.environ.get("SGG_VOCABULARY_PATH", "app/models/vocabulary.json"),
+    )
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="onnx")
+    parser.add_argument(
+        "--heads",
+        nargs="+",
+        choices=MODEL_HEADS,
+        default=CONFIG["heads"]["enabled"],
+        help="Heads to export (default: CONFIG['heads']['enabled'])",
+    )
+    parser.add_argument(
+        "--output-path",
+        default=None,
+        help="Defaults to <model>.onnx or <model>.ts next to the model",
+    )
+    args = parser.parse_args()
+
+    output_path = args.output_path
+    if output_path is None:
+        output_path = exported_model_path(args.model_path, EXPORT_FORMATS[args.format])
+
+    vocabulary = Vocabulary.load(args.vocabulary_path)
+    model = build_model(vocabulary, args.model_path, torch.device("cpu"))
+    export_model(model, output_path, args.format, heads=args.heads)
+
+    size_mb = os.path.getsize(output_path) / 1024 / 1024
+    logger.info(f"Exported {args.format} model to {output_path} ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
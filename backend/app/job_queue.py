@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Persistent job queue backed by a local SQLite database.
+
+    The API enqueues jobs and inference workers (separate processes) claim
+    them one at a time, so the number of workers scales independently of the
+    number of web processes and queued jobs survive restarts.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+                """
+            )
+            # Queues created before workers sent heartbeats
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "heartbeat_at" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+            )
+            # Progress of every job, streamed to clients as server-sent events
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A connection per call keeps the queue safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, job_id: str, params: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, params, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), time.time()),
+            )
+            self._add_event(conn, job_id, QUEUED)
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Atomically take the oldest queued job, or return None if there is none."""
+        with self._connect() as conn:
+            # IMMEDIATE takes the write lock so two workers never claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT job_id, params FROM jobs WHERE status = ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED,),
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, started_at = ?, "
+                        "heartbeat_at = ? WHERE job_id = ?",
+                        (RUNNING, worker_id, now, now, row["job_id"]),
+                    )
+                    self._add_event(conn, row["job_id"], RUNNING)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return row["job_id"], json.loads(row["params"])
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? "
+                "WHERE job_id = ?",
+                (DONE, json.dumps(result), time.time(), job_id),
+            )
+            # The result is stored once; streams attach it to this event
+            self._add_event(conn, job_id, DONE)
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE job_id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+            self._add_event(conn, job_id, FAILED, {"error": error})
+
+    def heartbeat(self, worker_id: str) -> None:
+        """Mark the jobs a worker is running as still alive."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND worker = ?",
+                (time.time(), RUNNING, worker_id),
+            )
+
+    def requeue_stale(
+        self, timeout: float, is_dead: Optional[Callable[[str], bool]] = None
+    ) -> int:
+        """
+        Put jobs back in the queue whose worker stopped without finishing them.
+
+        A job is stale when its worker sent no heartbeat for timeout seconds,
+        or when is_dead(worker_id) says its worker is gone. Jobs that simply
+        run long on a live worker keep running.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                deadline = time.time() - timeout
+                stale = [
+                    row["job_id"]
+                    for row in conn.execute(
+                        "SELECT job_id, worker, "
+                        "COALESCE(heartbeat_at, started_at) AS alive_at "
+                        "FROM jobs WHERE status = ?",
+                        (RUNNING,),
+                    )
+                    if row["alive_at"] < deadline
+                    or (is_dead is not None and is_dead(row["worker"]))
+                ]
+                for job_id in stale:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = NULL, started_at = NULL, "
+                        "heartbeat_at = NULL WHERE job_id = ?",
+                        (QUEUED, job_id),
+                    )
+                    self._add_event(conn, job_id, QUEUED)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            if stale:
+                logger.warning(f"Requeued {len(stale)} stale jobs")
+            return len(stale)
+
+    @staticmethod
+    def _add_event(
+        conn: sqlite3.Connection,
+        job_id: str,
+        stage: str,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        conn.execute(
+            "INSERT INTO job_events (job_id, stage, data, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (job_id, stage, json.dumps(data or {}), time.time()),
+        )
+
+    def add_event(
+        self, job_id: str, stage: str, data: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Record a progress event of a job (a pipeline stage it finished)."""
+        with self._connect() as conn:
+            self._add_event(conn, job_id, stage, data)
+
+    def poll_events(
+        self, job_id: str, after: int = 0
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        A job (as returned by get) and its events after sequence number after.
+
+        Both are read in one transaction, so a finished job always comes
+        with its final event unless that was already seen.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                event_rows = conn.execute(
+                    "SELECT seq, stage, data, created_at FROM job_events "
+                    "WHERE job_id = ? AND seq > ? ORDER BY seq",
+                    (job_id, after),
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+
+        events = [
+            {
+                "seq": event["seq"],
+                "stage": event["stage"],
+                "timestamp": event["created_at"],
+                "data": json.loads(event["data"]),
+            }
+            for event in event_rows
+        ]
+        return self._job_from_row(row), events
+
+    def prune_events(self, retention: float) -> int:
+        """Delete the events of jobs that finished more than retention seconds ago."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM job_events WHERE job_id IN ("
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) AND finished_at < ?)",
+                (DONE, FAILED, time.time() - retention),
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._job_from_row(row)
+
+    @staticmethod
+    def _job_from_row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+
+        job = {
+            "job_id": row["job_id"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["result"]:
+            job["result"] = json.loads(row["result"])
+        if row["error"]:
+            job["error"] = row["error"]
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+def save_results(
+    job_id: str,
+    objects: List[Dict[str, Any]],
+    relationships: List[Dict[str, Any]],
+    annotated_image_path: str,
+    graph_path: str,
+    output_dir: str,
+) -> Dict[str, Any]:
+    """Build the API result for a job and save it as results.json."""
+    # Generate URLs for frontend
+    # Make sure these URLs match the expected format in the frontend
+    annotated_image_url = f"/outputs/{job_id}/{os.path.basename(annotated_image_path)}"
+    graph_url = f"/outputs/{job_id}/{os.path.basename(graph_path)}"
+
+    # Log the URLs for debugging
+    logger.info(f"Annotated image URL: {annotated_image_url}")
+    logger.info(f"Graph URL: {graph_url}")
+
+    results_data = {
+        "job_id": job_id,
+        "objects": objects,
+        "relationships": relationships,
+        "annotated_image_url": annotated_image_url,
+        "graph_url": graph_url,
+    }
+
+    # Save the results to a JSON file in the output directory
+    results_file = os.path.join(output_dir, "results.json")
+    with open(results_file, "w") as f:
+        json.dump(results_data, f)
+
+    logger.info(f"Results saved to {results_file}")
+    return results_data
@@ -0,0 +1,178 @@
+"""
+Inference worker for queued scene graph jobs.
+
+Pulls jobs submitted with mode=async from the persistent job queue, runs the
+scene graph pipeline and stores the results. Run as many workers as the
+hardware allows, independently of the number of web workers.
+
+Usage (from the backend directory):
+    python -m app.job_worker
+"""
+
+import os
+import time
+import socket
+import threading
+import argparse
+import logging
+from typing import Any, Dict, Optional
+
+import psutil
+
+from app.job_queue import JobQueue, save_results
+from app.result_cache import ResultCache
+from app.model_registry import registry, process_image_with_registry
+from app.scene_graph_service import CONFIG
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_job(
+    job_queue: JobQueue,
+    job_id: str,
+    params: dict,
+    result_cache: Optional[ResultCache] = None,
+) -> None:
+    """Run one claimed job and record its outcome."""
+    logger.info(f"Running job {job_id}")
+    cache_key = params.pop("cache_key", None)
+
+    def progress(stage: str, data: Dict[str, Any]) -> None:
+        # Clients load the rendered files through the outputs endpoint
+        if stage == "rendered":
+            data = {
+                "annotated_image_url": f"/outputs/{job_id}/{data['annotated_image']}",
+                "graph_url": f"/outputs/{job_id}/{data['graph']}",
+            }
+        job_queue.add_event(job_id, stage, data)
+
+    try:
+        objects, relationships, annotated_image_path, graph_path = (
+            process_image_with_registry(progress=progress, **params)
+        )
+        results_data = save_results(
+            job_id,
+            objects,
+            relationships,
+            annotated_image_path,
+            graph_path,
+            params["output_dir"],
+        )
+        job_queue.complete(job_id, results_data)
+        if result_cache is not None and cache_key is not None:
+            result_cache.put(cache_key, results_data)
+        logger.info(f"Job {job_id} done")
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        job_queue.fail(job_id, str(e))
+
+
+def worker_is_dead(worker_id: str) -> bool:
+    """Whether a worker on this machine has exited (others are unknown)."""
+    host, _, pid = worker_id.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    return not psutil.pid_exists(int(pid))
+
+
+def send_heartbeats(job_queue: JobQueue, worker_id: str, stop: threading.Event) -> None:
+    """Keep this worker's running jobs from being requeued as stale."""
+    while not stop.wait(CONFIG["jobs"]["heartbeat_interval"]):
+        try:
+            job_queue.heartbeat(worker_id)
+        except Exception as e:
+            logger.warning(f"Could not send heartbeat: {str(e)}")
+
+
+def run_worker(
+    job_queue: JobQueue,
+    model_path: str,
+    vocabulary_path: str,
+    poll_interval: float = 0.5,
+    max_jobs: Optional[int] = None,
+) -> None:
+    """Claim and run jobs until interrupted (or until max_jobs have run)."""
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    registry.load(model_path, vocabulary_path)
+
+    # Heartbeats run in the background, also while a job is running
+    stop_heartbeats = threading.Event()
+    threading.Thread(
+        target=send_heartbeats,
+        args=(job_queue, worker_id, stop_heartbeats),
+        name="job-heartbeat",
+        daemon=True,
+    ).start()
+
+    # Share finished results with the API through the on-disk cache
+    result_cache = None
+    if CONFIG["cache"]["enabled"]:
+        result_cache = ResultCache(
+            CONFIG["cache"]["dir"],
+            max_memory_entries=CONFIG["cache"]["memory_entries"],
+            max_disk_mb=CONFIG["cache"]["max_disk_mb"],
+        )
+
+    logger.info(f"Worker {worker_id} waiting for jobs")
+    jobs_run = 0
+    last_prune = last_requeue = float("-inf")
+    try:
+        while max_jobs is None or jobs_run < max_jobs:
+            # Recover jobs left running by workers that died, also while
+            # this worker keeps running
+            stale_after = CONFIG["jobs"]["stale_after_s"]
+            if time.monotonic() - last_requeue >= stale_after / 2:
+                job_queue.requeue_stale(stale_after, is_dead=worker_is_dead)
+                last_requeue = time.monotonic()
+
+            # Progress events are only needed while clients follow a job
+            retention = CONFIG["jobs"]["event_retention_s"]
+            if time.monotonic() - last_prune >= min(retention, 300):
+                job_queue.prune_events(retention)
+                last_prune = time.monotonic()
+
+            job = job_queue.claim(worker_id)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            job_id, params = job
+            run_job(job_queue, job_id, params, result_cache)
+            jobs_run += 1
+    finally:
+        stop_heartbeats.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scene graph inference worker")
+    parser.add_argument(
+        "--model-path",
+        default=os.environ.get("SGG_MODEL_PATH", "app/models/model.pth"),
+    )
+    parser.add_argument(
+        "--vocabulary-path",
+        default=os.environ.get("SGG_VOCABULARY_PATH", "app/models/vocabulary.json"),
+    )
+    parser.add_argument("--db-path", default=CONFIG["jobs"]["db_path"])
+    parser.add_argument(
+        "--poll-interval", type=float, default=CONFIG["jobs"]["poll_interval"]
+    )
+    parser.add_argument("--max-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        run_worker(
+            JobQueue(args.db_path),
+            args.model_path,
+            args.vocabulary_path,
+            poll_interval=args.poll_interval,
+            max_jobs=args.max_jobs,
+        )
+    except KeyboardInterrupt:
+        logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    main()
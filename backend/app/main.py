@@ -1,22 +1,401 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
 import os
-import shutil
 import uuid
 import json
-from typing import Optional
+import glob
+import hashlib
+import shutil
+import tempfile
+import functools
+import secrets
+import tarfile
+import time
+import zipfile
+import numpy as np
+from PIL import Image
+from typing import IO, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 import logging
 
-from app.scene_graph_service import process_image
+from app.scene_graph_service import (
+    CONFIG,
+    IMAGE_EXTENSIONS,
+    annotate_image,
+    checkpoint_version,
+    filter_relationships,
+    graph_filename,
+    load_relationship_scores,
+    save_graph,
+)
+from app.model_registry import (
+    registry,
+    init_worker_process,
+    process_image_with_registry,
+    process_images_with_registry,
+    worker_status,
+)
+from app.serve import LAUNCHER_PID_ENV, node_memory_report
+from app.worker_pool import InferencePool, PoolSaturatedError
+from app.job_queue import JobQueue, save_results, QUEUED, DONE, FAILED
+from app.result_cache import ResultCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Define model paths
+MODEL_PATH = os.environ.get("SGG_MODEL_PATH", "app/models/model.pth")
+VOCABULARY_PATH = os.environ.get("SGG_VOCABULARY_PATH", "app/models/vocabulary.json")
+
+# Checkpoints the admin endpoints may load
+MODELS_DIR = os.path.realpath("app/models")
+
+# Token the admin endpoints require; without it they only accept local requests
+ADMIN_TOKEN = os.environ.get("SGG_ADMIN_TOKEN")
+
+
+def _start_inference_workers():
+    """Start the process pool workers and raise if any failed to load models."""
+    for error in inference_pool.start_workers(worker_status).values():
+        if error:
+            raise RuntimeError(f"Inference worker failed to load models: {error}")
+
+
+def _load_models():
+    try:
+        if CONFIG["serving"]["executor"] == "process":
+            # Process pool workers load their own models; this process only
+            # needs the vocabulary and version once they all have
+            registry.load(
+                MODEL_PATH,
+                VOCABULARY_PATH,
+                weights=False,
+                wait_for_workers=_start_inference_workers,
+            )
+        else:
+            registry.load(MODEL_PATH, VOCABULARY_PATH)
+    except Exception:
+        # The error is kept on the registry and reported by /api/health
+        pass
+
+
+def _pool_size() -> int:
+    """Inference jobs to run at once (CONFIG["serving"]["workers"] if set)."""
+    if CONFIG["serving"]["workers"] is not None:
+        return CONFIG["serving"]["workers"]
+    # Threads mostly wait for the batcher, so allow enough of them in flight
+    # to fill a whole micro-batch
+    if CONFIG["serving"]["executor"] == "thread" and CONFIG["batching"]["enabled"]:
+        return CONFIG["batching"]["max_batch_size"]
+    return 2
+
+
+# Bounded pool that runs inference off the event loop
+inference_pool: Optional[InferencePool] = None
+
+# Persistent queue for jobs submitted with mode=async (run by app.job_worker)
+job_queue = JobQueue(CONFIG["jobs"]["db_path"])
+
+# Results of previous uploads, keyed by image content and parameters
+result_cache = (
+    ResultCache(
+        CONFIG["cache"]["dir"],
+        max_memory_entries=CONFIG["cache"]["memory_entries"],
+        max_disk_mb=CONFIG["cache"]["max_disk_mb"],
+    )
+    if CONFIG["cache"]["enabled"]
+    else None
+)
+
+
+def _model_version() -> str:
+    if registry.is_ready:
+        return registry.get().version
+    try:
+        return checkpoint_version(MODEL_PATH)
+    except OSError:
+        return "unavailable"
+
+
+def _outputs_exist(results_data: dict) -> bool:
+    """Check that the job behind cached results is still on disk."""
+    job_id = results_data["job_id"]
+    output_dir = os.path.join("outputs", job_id)
+    if not os.path.exists(os.path.join(output_dir, "results.json")):
+        return False
+
+    # The graph is rendered from the results alone, but the annotated image
+    # needs the upload, which jobs run with render=none did not keep
+    annotated_image = os.path.basename(results_data["annotated_image_url"])
+    short_id = job_id.split("-")[0]
+    return os.path.exists(os.path.join(output_dir, annotated_image)) or bool(
+        glob.glob(os.path.join("uploads", job_id, f"{short_id}.*"))
+    )
+
+
+def _validate_relationship_options(
+    top_k: int, max_relationships: Optional[int]
+) -> None:
+    # Re-filtering can only use the scores stored per pair
+    stored_top_k = CONFIG["relationships"]["stored_top_k"]
+    if not (1 <= top_k <= stored_top_k):
+        raise HTTPException(
+            status_code=400, detail=f"top_k must be between 1 and {stored_top_k}"
+        )
+
+    if max_relationships is not None and max_relationships < 1:
+        raise HTTPException(
+            status_code=400, detail="max_relationships must be at least 1"
+        )
+
+
+def _cache_key(image_bytes: bytes, params: dict) -> str:
+    """Key results by image content, model version and request parameters."""
+    return ResultCache.make_key(
+        image_bytes,
+        _model_version(),
+        # Results also depend on which heads run
+        {**params, "heads": CONFIG["heads"]},
+    )
+
+
+def _is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _spool_upload(upload: UploadFile) -> IO[bytes]:
+    """Copy an upload to a temporary file that outlives the request handler."""
+    # FastAPI closes uploads once the handler returns, before the response
+    # has been streamed
+    upload.file.seek(0)
+    spooled = tempfile.TemporaryFile()
+    shutil.copyfileobj(upload.file, spooled)
+    spooled.seek(0)
+    return spooled
+
+
+def _read_tar_member(archive: tarfile.TarFile, member: tarfile.TarInfo) -> bytes:
+    return archive.extractfile(member).read()
+
+
+def _read_file(file: IO[bytes]) -> bytes:
+    file.seek(0)
+    return file.read()
+
+
+def _list_batch_images(
+    files: List[Tuple[str, Optional[str], IO[bytes]]],
+    max_images: int,
+    max_bytes: int,
+) -> Tuple[List[Tuple[str, Callable[[], bytes]]], List[Any]]:
+    """
+    List the images of a batch request without reading them into memory.
+
+    Archives are expanded in archive order from their member headers alone.
+    Returns (filename, read) pairs, where read() returns the image's bytes,
+    and the opened archives, which the caller closes. Raises HTTPException
+    as soon as there are too many images or their uncompressed size is too
+    large, before anything is decompressed.
+    """
+    images: List[Tuple[str, Callable[[], bytes]]] = []
+    archives: List[Any] = []
+    total_bytes = 0
+
+    def add(name: str, size: int, read: Callable[[], bytes]) -> None:
+        nonlocal total_bytes
+        total_bytes += size
+        if len(images) >= max_images:
+            raise HTTPException(
+                status_code=413, detail=f"At most {max_images} images per request"
+            )
+        if total_bytes > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {max_bytes // (1024 * 1024)} MB of images "
+                "per request",
+            )
+        images.append((name, read))
+
+    try:
+        for filename, content_type, file in files:
+            if _is_archive(filename):
+                try:
+                    if filename.lower().endswith(".zip"):
+                        archive = zipfile.ZipFile(file)
+                        archives.append(archive)
+                        for info in archive.infolist():
+                            if not info.is_dir() and info.filename.lower().endswith(
+                                IMAGE_EXTENSIONS
+                            ):
+                                # Reads stop at the size the header declares
+                                read = functools.partial(archive.read, info)
+                                add(info.filename, info.file_size, read)
+                    else:
+                        archive = tarfile.open(fileobj=file)
+                        archives.append(archive)
+                        for member in archive:
+                            if member.isfile() and member.name.lower().endswith(
+                                IMAGE_EXTENSIONS
+                            ):
+                                read = functools.partial(
+                                    _read_tar_member, archive, member
+                                )
+                                add(member.name, member.size, read)
+                except (zipfile.BadZipFile, tarfile.TarError) as e:
+                    raise HTTPException(
+                        status_code=400, detail=f"Could not read {filename}: {str(e)}"
+                    )
+            elif content_type and content_type.startswith("image/"):
+                size = file.seek(0, os.SEEK_END)
+                add(filename, size, functools.partial(_read_file, file))
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{filename} must be an image or a zip/tar archive",
+                )
+    except Exception:
+        for archive in archives:
+            archive.close()
+        raise
+    return images, archives
+
+
+def _read_batch_images(
+    images: List[Tuple[str, Callable[[], bytes]]],
+) -> List[Tuple[str, Any]]:
+    """Read one chunk of a batch request; unreadable images become exceptions."""
+    chunk = []
+    for filename, read in images:
+        try:
+            chunk.append((filename, read()))
+        except Exception as e:
+            chunk.append((filename, e))
+    return chunk
+
+
+def _require_admin(request: Request) -> None:
+    """Reject admin requests without the admin token (or from other machines)."""
+    if ADMIN_TOKEN:
+        token = request.headers.get("x-admin-token", "")
+        if not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(
+            status_code=403,
+            detail="Admin endpoints only accept local requests unless "
+            "SGG_ADMIN_TOKEN is set",
+        )
+
+
+def _resolve_model_path(model_path: str) -> str:
+    """Resolve a checkpoint path, which must point inside MODELS_DIR."""
+    resolved = os.path.realpath(model_path)
+    if os.path.commonpath([resolved, MODELS_DIR]) != MODELS_DIR:
+        raise HTTPException(
+            status_code=400, detail="model_path must be a file in app/models"
+        )
+    return resolved
+
+
+def _with_render_mode(results_data: dict, render: str) -> dict:
+    """Hide the image URLs from clients that asked for no rendering."""
+    if render == "none":
+        return {**results_data, "annotated_image_url": None, "graph_url": None}
+    return results_data
+
+
+def _render_output(job_id: str, filename: str, output_path: str) -> None:
+    """Render a job's annotated image or graph from its stored results."""
+    with open(os.path.join("outputs", job_id, "results.json"), "r") as f:
+        results_data = json.load(f)
+
+    # Render to a temporary file so no request ever sees a partial image
+    _, extension = os.path.splitext(output_path)
+    tmp_path = os.path.join(
+        os.path.dirname(output_path), f".{uuid.uuid4().hex}{extension}"
+    )
+    if filename.endswith("_annotated.png"):
+        short_id = job_id.split("-")[0]
+        upload_paths = glob.glob(os.path.join("uploads", job_id, f"{short_id}.*"))
+        if not upload_paths:
+            raise FileNotFoundError(f"Upload for job {job_id} not found")
+        image = np.array(Image.open(upload_paths[0]).convert("RGB"))
+        annotate_image(image, results_data["objects"], tmp_path)
+    else:
+        save_graph(results_data["objects"], results_data["relationships"], tmp_path)
+    os.replace(tmp_path, output_path)
+
+
+def _replace_graph(objects: List[dict], relationships: List[dict], path: str) -> None:
+    """Render a graph over path without requests ever seeing a partial file."""
+    _, extension = os.path.splitext(path)
+    tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}{extension}")
+    save_graph(objects, relationships, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _refiltered_graph(
+    objects: List[dict], relationships: List[dict], output_dir: str, filename: str
+) -> None:
+    """
+    Render a re-filtered graph unless it exists, keeping a bounded number.
+
+    Files are named after their filter settings, so concurrent re-filters
+    of a shared job never overwrite each other's graph. The least recently
+    requested ones beyond CONFIG["rendering"]["max_refiltered_graphs"] are
+    deleted.
+    """
+    path = os.path.join(output_dir, filename)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        _replace_graph(objects, relationships, path)
+
+    prefix = filename.split("_refiltered_")[0]
+    variants = sorted(
+        glob.glob(os.path.join(output_dir, f"{prefix}_refiltered_*")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for old_path in variants[CONFIG["rendering"]["max_refiltered_graphs"] :]:
+        try:
+            os.remove(old_path)
+        except FileNotFoundError:
+            pass
+
+
+# Archives accepted by the batch endpoint
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+
+# Renders in progress, so concurrent requests for one image share a render
+_render_locks: Dict[str, asyncio.Lock] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global inference_pool
+
+    serving = CONFIG["serving"]
+    inference_pool = InferencePool(
+        max_workers=_pool_size(),
+        max_queue=serving["max_queue"],
+        executor=serving["executor"],
+        initializer=init_worker_process,
+        initargs=(MODEL_PATH, VOCABULARY_PATH),
+    )
+
+    # Load models in the background so /api/health can report progress
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, _load_models)
+    yield
+    inference_pool.shutdown()
+
+
 # Initialize FastAPI app
-app = FastAPI(title="Scene Graph Generation API")
+app = FastAPI(title="Scene Graph Generation API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -31,9 +410,6 @@ app.add_middleware(
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("outputs", exist_ok=True)
 
-# Mount static files with correct configuration
-app.mount("/outputs", StaticFiles(directory="outputs", html=True), name="outputs")
-
 
 @app.get("/")
 def read_root():
@@ -45,6 +421,12 @@ async def generate_scene_graph(
     image: UploadFile = File(...),
     confidence_threshold: float = Form(0.5),
     use_fixed_boxes: bool = Form(False),
+    max_pairs: Optional[int] = Form(None),
+    mode: str = Form("sync"),
+    render: str = Form("lazy"),
+    top_k: int = Form(CONFIG["relationships"]["top_k"]),
+    max_relationships: Optional[int] = Form(None),
+    dedupe_symmetric: bool = Form(CONFIG["relationships"]["dedupe_symmetric"]),
 ):
     try:
         # Input validation
@@ -58,80 +440,319 @@ async def generate_scene_graph(
                 status_code=400, detail="Confidence threshold must be between 0 and 1"
             )
 
+        if max_pairs is not None and max_pairs < 1:
+            raise HTTPException(status_code=400, detail="max_pairs must be at least 1")
+
+        if mode not in ("sync", "async"):
+            raise HTTPException(
+                status_code=400, detail="mode must be either 'sync' or 'async'"
+            )
+
+        _validate_relationship_options(top_k, max_relationships)
+
+        if render not in ("none", "lazy", "eager"):
+            raise HTTPException(
+                status_code=400,
+                detail="render must be one of 'none', 'lazy' or 'eager'",
+            )
+
+        image_bytes = await image.read()
+
+        # Identical image and parameters: return the earlier results as they are
+        cache_key = None
+        if result_cache is not None:
+            cache_key = _cache_key(
+                image_bytes,
+                {
+                    "confidence_threshold": confidence_threshold,
+                    "use_fixed_boxes": use_fixed_boxes,
+                    "max_pairs": max_pairs,
+                    "top_k": top_k,
+                    "max_relationships": max_relationships,
+                    "dedupe_symmetric": dedupe_symmetric,
+                },
+            )
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                if _outputs_exist(cached):
+                    logger.info(f"Cache hit for job {cached['job_id']}")
+                    return {**_with_render_mode(cached, render), "cached": True}
+                result_cache.discard(cache_key)
+
+        if mode == "async":
+            # Async jobs run in separate worker processes
+            if job_queue.counts()[QUEUED] >= CONFIG["jobs"]["max_queued"]:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Job queue is full",
+                    headers={"Retry-After": "30"},
+                )
+        else:
+            if not registry.is_ready:
+                raise HTTPException(status_code=503, detail="Models are still loading")
+
+            # Reject right away when the inference queue is full
+            inference_pool.check_capacity()
+
         # Generate unique ID for this job
         job_id = str(uuid.uuid4())
         short_id = job_id.split("-")[0]  # First part of UUID for shorter filenames
 
         # Create directories for this job
-        upload_dir = os.path.join("uploads", job_id)
         output_dir = os.path.join("outputs", job_id)
-        os.makedirs(upload_dir, exist_ok=True)
         os.makedirs(output_dir, exist_ok=True)
 
-        # Save the uploaded image - use the short_id as the base filename
-        # This ensures consistent naming patterns that frontend can predict
-        original_filename = image.filename
-        _, ext = os.path.splitext(original_filename)
-        image_filename = f"{short_id}{ext}"
-        image_path = os.path.join(upload_dir, image_filename)
+        # The upload only needs to hit the disk when a worker process reads it
+        # or the annotated image is rendered later from it
+        image_path = None
+        if mode == "async" or render == "lazy" or CONFIG["serving"]["persist_uploads"]:
+            upload_dir = os.path.join("uploads", job_id)
+            os.makedirs(upload_dir, exist_ok=True)
 
-        # Save the file
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+            # Save the uploaded image - use the short_id as the base filename
+            # This ensures consistent naming patterns that frontend can predict
+            original_filename = image.filename
+            _, ext = os.path.splitext(original_filename)
+            image_filename = f"{short_id}{ext}"
+            image_path = os.path.join(upload_dir, image_filename)
 
-        logger.info(f"Image saved to {image_path}")
-        logger.info(f"Job ID: {job_id}, Short ID: {short_id}")
+            # Save the file
+            with open(image_path, "wb") as buffer:
+                buffer.write(image_bytes)
 
-        # Define model paths
-        model_path = "app/models/model.pth"
-        vocabulary_path = "app/models/vocabulary.json"
+            logger.info(f"Image saved to {image_path}")
+
+        logger.info(f"Job ID: {job_id}, Short ID: {short_id}")
 
         # Process the image - pass the short_id as base_filename to use for outputs
-        objects, relationships, annotated_image_path, graph_path = process_image(
-            image_path=image_path,
-            model_path=model_path,
-            vocabulary_path=vocabulary_path,
-            confidence_threshold=confidence_threshold,
-            use_fixed_boxes=use_fixed_boxes,
-            output_dir=output_dir,
-            base_filename=short_id,  # Pass the short ID to use as base filename
-        )
+        params = {
+            "image_path": image_path,
+            "model_path": MODEL_PATH,
+            "vocabulary_path": VOCABULARY_PATH,
+            "confidence_threshold": confidence_threshold,
+            "use_fixed_boxes": use_fixed_boxes,
+            "output_dir": output_dir,
+            "base_filename": short_id,  # Pass the short ID to use as base filename
+            "max_pairs": max_pairs,
+            "top_k": top_k,
+            "max_relationships": max_relationships,
+            "dedupe_symmetric": dedupe_symmetric,
+            # Lazy and unrendered jobs draw their images when first requested
+            "render": render == "eager",
+        }
 
-        # Generate URLs for frontend
-        # Make sure these URLs match the expected format in the frontend
-        annotated_image_url = (
-            f"/outputs/{job_id}/{os.path.basename(annotated_image_path)}"
-        )
-        graph_url = f"/outputs/{job_id}/{os.path.basename(graph_path)}"
+        if mode == "async":
+            # Return immediately; poll the GET endpoint for the outcome
+            job_queue.enqueue(job_id, {**params, "cache_key": cache_key})
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "job_id": job_id,
+                    "status": QUEUED,
+                    "status_url": f"/api/generate-scene-graph/{job_id}",
+                    "events_url": f"/api/generate-scene-graph/{job_id}/events",
+                },
+            )
 
-        # Log the URLs for debugging
-        logger.info(f"Annotated image URL: {annotated_image_url}")
-        logger.info(f"Graph URL: {graph_url}")
+        # Run in the bounded inference pool; concurrent jobs can share a batch.
+        # The pipeline decodes the uploaded bytes once instead of reading the file
+        objects, relationships, annotated_image_path, graph_path = (
+            await inference_pool.run(
+                process_image_with_registry, image_bytes=image_bytes, **params
+            )
+        )
 
         # Save results to a JSON file for later retrieval
-        results_data = {
-            "job_id": job_id,
-            "objects": objects,
-            "relationships": relationships,
-            "annotated_image_url": annotated_image_url,
-            "graph_url": graph_url,
-        }
-
-        # Save the results to a JSON file in the output directory
-        results_file = os.path.join(output_dir, "results.json")
-        with open(results_file, "w") as f:
-            json.dump(results_data, f)
-
-        logger.info(f"Results saved to {results_file}")
+        results_data = save_results(
+            job_id, objects, relationships, annotated_image_path, graph_path, output_dir
+        )
+        if result_cache is not None:
+            result_cache.put(cache_key, results_data)
 
-        # Return results
-        return results_data
+        return _with_render_mode(results_data, render)
 
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
+@app.post("/api/generate-scene-graph/batch")
+async def generate_scene_graph_batch(
+    images: List[UploadFile] = File(...),
+    confidence_threshold: float = Form(0.5),
+    max_pairs: Optional[int] = Form(None),
+    render: str = Form("lazy"),
+    top_k: int = Form(CONFIG["relationships"]["top_k"]),
+    max_relationships: Optional[int] = Form(None),
+    dedupe_symmetric: bool = Form(CONFIG["relationships"]["dedupe_symmetric"]),
+):
+    # Input validation
+    if not (0 <= confidence_threshold <= 1):
+        raise HTTPException(
+            status_code=400, detail="Confidence threshold must be between 0 and 1"
+        )
+
+    if max_pairs is not None and max_pairs < 1:
+        raise HTTPException(status_code=400, detail="max_pairs must be at least 1")
+
+    _validate_relationship_options(top_k, max_relationships)
+
+    if render not in ("none", "lazy", "eager"):
+        raise HTTPException(
+            status_code=400,
+            detail="render must be one of 'none', 'lazy' or 'eager'",
+        )
+
+    if not registry.is_ready:
+        raise HTTPException(status_code=503, detail="Models are still loading")
+
+    try:
+        inference_pool.check_capacity()
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    # List the images of every upload, expanding zip and tar archives; files
+    # are copied and read off the event loop
+    loop = asyncio.get_running_loop()
+    files = []
+    archives = []
+
+    def close_files() -> None:
+        for archive in archives:
+            archive.close()
+        for _, _, file in files:
+            file.close()
+
+    try:
+        for upload in images:
+            file = await loop.run_in_executor(None, _spool_upload, upload)
+            files.append((upload.filename or "image", upload.content_type, file))
+
+        batch_images, archives = await loop.run_in_executor(
+            None,
+            _list_batch_images,
+            files,
+            CONFIG["serving"]["max_batch_images"],
+            CONFIG["serving"]["max_batch_mb"] * 1024 * 1024,
+        )
+        if not batch_images:
+            raise HTTPException(status_code=400, detail="No images found in the upload")
+    except Exception:
+        close_files()
+        raise
+
+    options = {
+        "confidence_threshold": confidence_threshold,
+        "max_pairs": max_pairs,
+        "top_k": top_k,
+        "max_relationships": max_relationships,
+        "dedupe_symmetric": dedupe_symmetric,
+    }
+
+    async def stream() -> AsyncIterator[str]:
+        # Each chunk is read when it is reached, runs as one YOLO call and one
+        # forward pass in the pool, and its results are sent as soon as it
+        # finishes
+        chunk_size = CONFIG["batching"]["max_batch_size"]
+        try:
+            for start in range(0, len(batch_images), chunk_size):
+                chunk = await loop.run_in_executor(
+                    None, _read_batch_images, batch_images[start : start + chunk_size]
+                )
+                for line in await _run_batch_chunk(
+                    list(enumerate(chunk, start)), options, render
+                ):
+                    yield json.dumps(line) + "\n"
+        finally:
+            close_files()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+async def _run_batch_chunk(
+    chunk: List[Tuple[int, Tuple[str, Any]]], options: dict, render: str
+) -> List[dict]:
+    """Generate the scene graphs of one chunk of a batch request."""
+    lines = []
+    jobs = []
+    for index, (filename, image_bytes) in chunk:
+        if isinstance(image_bytes, Exception):
+            lines.append(
+                {"index": index, "filename": filename, "error": str(image_bytes)}
+            )
+            continue
+
+        # Identical images share cached results with single uploads
+        cache_key = None
+        if result_cache is not None:
+            cache_key = _cache_key(image_bytes, {**options, "use_fixed_boxes": False})
+            cached = result_cache.get(cache_key)
+            if cached is not None and _outputs_exist(cached):
+                result = {**_with_render_mode(cached, render), "cached": True}
+                lines.append({"index": index, "filename": filename, **result})
+                continue
+
+        job_id = str(uuid.uuid4())
+        short_id = job_id.split("-")[0]
+        output_dir = os.path.join("outputs", job_id)
+
+        # Lazily rendered images are drawn from the upload later
+        if render == "lazy" or CONFIG["serving"]["persist_uploads"]:
+            upload_dir = os.path.join("uploads", job_id)
+            os.makedirs(upload_dir, exist_ok=True)
+            _, ext = os.path.splitext(filename)
+            with open(os.path.join(upload_dir, f"{short_id}{ext}"), "wb") as f:
+                f.write(image_bytes)
+
+        jobs.append((index, filename, image_bytes, job_id, output_dir, cache_key))
+
+    if jobs:
+        # The request already streams, so wait for a queue slot instead of failing
+        try:
+            results = await inference_pool.run_when_free(
+                process_images_with_registry,
+                images=[image_bytes for _, _, image_bytes, *_ in jobs],
+                output_dirs=[output_dir for *_, output_dir, _ in jobs],
+                base_filenames=[job_id.split("-")[0] for *_, job_id, _, _ in jobs],
+                render=render == "eager",
+                **options,
+            )
+        except Exception as e:
+            # Fail this chunk's images instead of cutting off the stream
+            logger.error(f"Error processing a batch chunk: {str(e)}")
+            results = [e] * len(jobs)
+
+        for (index, filename, _, job_id, output_dir, cache_key), result in zip(
+            jobs, results
+        ):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing {filename}: {str(result)}")
+                lines.append(
+                    {"index": index, "filename": filename, "error": str(result)}
+                )
+                continue
+
+            results_data = save_results(job_id, *result, output_dir)
+            if result_cache is not None:
+                result_cache.put(cache_key, results_data)
+            result = _with_render_mode(results_data, render)
+            lines.append({"index": index, "filename": filename, **result})
+
+    return sorted(lines, key=lambda line: line["index"])
+
+
 @app.get("/api/generate-scene-graph/{job_id}")
 async def get_scene_graph_result(job_id: str):
     try:
@@ -141,104 +762,322 @@ async def get_scene_graph_result(job_id: str):
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid job ID format")
 
-        # Check if the output directory exists
-        output_dir = os.path.join("outputs", job_id)
-        if not os.path.exists(output_dir):
+        # Jobs submitted with mode=async report their queue status
+        job = job_queue.get(job_id)
+        if job is not None:
+            if job["status"] == DONE:
+                return {**job.pop("result"), **job}
+            return job
+
+        # Otherwise look for the results of a synchronous job
+        results_file = os.path.join("outputs", job_id, "results.json")
+        if not os.path.exists(results_file):
             raise HTTPException(
                 status_code=404, detail=f"Results for job {job_id} not found"
             )
 
-        # Check if we have a results JSON file
+        # Read the results from the JSON file
+        with open(results_file, "r") as f:
+            results_data = json.load(f)
+
+        # Return the stored results
+        return {**results_data, "status": DONE}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting results for job {job_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error retrieving results: {str(e)}"
+        )
+
+
+def _format_event(
+    job_id: str, stage: str, timestamp: float, data: Dict, seq: Optional[int] = None
+) -> str:
+    """One job event in the text/event-stream format."""
+    data = {"job_id": job_id, "stage": stage, "timestamp": timestamp, **data}
+    message = f"event: {stage}\ndata: {json.dumps(data)}\n\n"
+    return message if seq is None else f"id: {seq}\n{message}"
+
+
+def _final_event_data(job: Dict) -> Dict:
+    """Details of the done or failed event: the results or the error."""
+    if job["status"] == DONE:
+        return job.get("result", {})
+    return {"error": job.get("error")}
+
+
+@app.get("/api/generate-scene-graph/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Stream the progress of an async job as server-sent events.
+
+    Every stage the job finishes is sent as an event named after the stage
+    (queued, running, decoded, detected, scored, rendered, then done or
+    failed), with its timestamp and details. The detected event already
+    lists the detector's objects and done carries the full results. The
+    stream ends after done or failed; reconnecting clients send
+    Last-Event-ID and only get the events they missed. Jobs whose events
+    were already pruned only get their final event.
+    """
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+    # Only jobs submitted with mode=async are tracked in the queue
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    last_event_id = request.headers.get("last-event-id", "")
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+
+    async def stream() -> AsyncIterator[str]:
+        nonlocal after
+        loop = asyncio.get_running_loop()
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            job, events = await loop.run_in_executor(
+                None, job_queue.poll_events, job_id, after
+            )
+            if job is None:
+                return
+
+            for event in events:
+                after = event["seq"]
+                data = event["data"]
+                if event["stage"] == DONE:
+                    data = _final_event_data(job)
+                yield _format_event(
+                    job_id, event["stage"], event["timestamp"], data, event["seq"]
+                )
+                if event["stage"] in (DONE, FAILED):
+                    return
+
+            if job["status"] in (DONE, FAILED) and not events:
+                # Events of old jobs are pruned; report how the job ended
+                if not last_event_id:
+                    yield _format_event(
+                        job_id,
+                        job["status"],
+                        job["finished_at"],
+                        _final_event_data(job),
+                    )
+                # A client reconnecting after the last event has nothing to wait for
+                return
+
+            if events:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= CONFIG["jobs"]["event_keepalive_s"]:
+                # Keeps proxies from closing the idle connection
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(CONFIG["jobs"]["event_poll_interval"])
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/generate-scene-graph/{job_id}/refilter")
+async def refilter_scene_graph(
+    job_id: str,
+    confidence_threshold: float = Form(0.5),
+    render_graph: bool = Form(True),
+    top_k: int = Form(CONFIG["relationships"]["top_k"]),
+    max_relationships: Optional[int] = Form(None),
+    dedupe_symmetric: bool = Form(CONFIG["relationships"]["dedupe_symmetric"]),
+):
+    try:
+        # Check if job ID is valid UUID format
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+        if not (0 <= confidence_threshold <= 1):
+            raise HTTPException(
+                status_code=400, detail="Confidence threshold must be between 0 and 1"
+            )
+
+        _validate_relationship_options(top_k, max_relationships)
+        if max_relationships is None:
+            max_relationships = CONFIG["relationships"]["max_relationships"]
+
+        output_dir = os.path.join("outputs", job_id)
         results_file = os.path.join(output_dir, "results.json")
-        if os.path.exists(results_file):
-            try:
-                # Read the results from the JSON file
-                with open(results_file, "r") as f:
-                    results_data = json.load(f)
-
-                # Return the stored results
-                return results_data
-            except Exception as json_error:
-                logger.error(f"Error reading results file: {str(json_error)}")
-                # Fall back to generating default results
-
-        # If no results file exists or there was an error reading it,
-        # create URLs and placeholder objects/relationships
-        # Look for result files
-        files = os.listdir(output_dir)
-        annotated_image_file = next((f for f in files if "_annotated.png" in f), None)
-        graph_file = next((f for f in files if "_graph.png" in f), None)
-
-        if not annotated_image_file or not graph_file:
-            raise HTTPException(status_code=404, detail="Result files are incomplete")
-
-        # Create URLs for frontend
-        annotated_image_url = f"/outputs/{job_id}/{annotated_image_file}"
-        graph_url = f"/outputs/{job_id}/{graph_file}"
-
-        # For demonstration purposes, create sample objects and relationships
-        # This would normally come from a database in a production application
-        objects = [
-            {
-                "label": "person",
-                "label_id": 1,
-                "score": 0.91,
-                "bbox": [0.3, 0.4, 0.1, 0.3],
-            },
-            {
-                "label": "bicycle",
-                "label_id": 2,
-                "score": 0.87,
-                "bbox": [0.5, 0.5, 0.2, 0.2],
-            },
-            {
-                "label": "car",
-                "label_id": 3,
-                "score": 0.76,
-                "bbox": [0.7, 0.4, 0.15, 0.1],
-            },
-        ]
-
-        relationships = [
-            {
-                "subject": "person",
-                "predicate": "riding",
-                "object": "bicycle",
-                "score": 0.82,
-                "subject_id": 0,
-                "object_id": 1,
-                "predicate_id": 5,
-            },
-            {
-                "subject": "person",
-                "predicate": "near",
-                "object": "car",
-                "score": 0.71,
-                "subject_id": 0,
-                "object_id": 2,
-                "predicate_id": 7,
-            },
-        ]
-
-        # Return result data with populated objects and relationships
+        if not os.path.exists(results_file):
+            raise HTTPException(
+                status_code=404, detail=f"Results for job {job_id} not found"
+            )
+
+        if not registry.is_ready:
+            raise HTTPException(status_code=503, detail="Models are still loading")
+
+        with open(results_file, "r") as f:
+            results_data = json.load(f)
+        objects = results_data["objects"]
+        short_id = job_id.split("-")[0]
+
+        # Rebuild the relationships from the stored per-pair scores
+        relationships = []
+        scores_path = os.path.join(output_dir, f"{short_id}_rel_scores.npz")
+        if os.path.exists(scores_path):
+            rel_scores, rel_labels, obj_pairs = load_relationship_scores(scores_path)
+            relationships = filter_relationships(
+                objects,
+                rel_scores,
+                rel_labels,
+                obj_pairs,
+                confidence_threshold,
+                registry.get().vocabulary,
+                top_k=top_k,
+                max_relationships=max_relationships,
+                dedupe_symmetric=dedupe_symmetric,
+            )
+        elif len(objects) > 1:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Relationship scores were not stored for job {job_id}",
+            )
+
+        # Only the graph depends on the threshold; the annotated image is reused
+        graph_url = None
+        if render_graph:
+            # One file per filter setting, named by a hash of the settings
+            settings = json.dumps(
+                [confidence_threshold, top_k, max_relationships, dedupe_symmetric]
+            )
+            digest = hashlib.sha1(settings.encode()).hexdigest()[:12]
+            filename = graph_filename(f"{short_id}_refiltered_{digest}")
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, _refiltered_graph, objects, relationships, output_dir, filename
+            )
+            graph_url = f"/outputs/{job_id}/{filename}"
+
         return {
-            "job_id": job_id,
-            "annotated_image_url": annotated_image_url,
-            "graph_url": graph_url,
-            "objects": objects,
+            **results_data,
             "relationships": relationships,
+            "graph_url": graph_url,
+            "confidence_threshold": confidence_threshold,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting results for job {job_id}: {str(e)}")
+        logger.error(f"Error re-filtering results for job {job_id}: {str(e)}")
         raise HTTPException(
-            status_code=500, detail=f"Error retrieving results: {str(e)}"
+            status_code=500, detail=f"Error re-filtering results: {str(e)}"
         )
 
 
+@app.get("/outputs/{job_id}/{filename}")
+async def get_output_file(job_id: str, filename: str):
+    # Check if job ID is valid UUID format
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if filename.startswith(".") or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    output_path = os.path.join("outputs", job_id, filename)
+    if not os.path.exists(output_path):
+        # Only the standard images of a finished job can be rendered
+        short_id = job_id.split("-")[0]
+        renderable = (
+            f"{short_id}_annotated.png",
+            f"{short_id}_graph.png",
+            f"{short_id}_graph.svg",
+        )
+        results_file = os.path.join("outputs", job_id, "results.json")
+        if filename not in renderable or not os.path.exists(results_file):
+            raise HTTPException(status_code=404, detail="File not found")
+
+        lock = _render_locks.setdefault(output_path, asyncio.Lock())
+        try:
+            async with lock:
+                if not os.path.exists(output_path):
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(
+                        None, _render_output, job_id, filename, output_path
+                    )
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error rendering {output_path}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error rendering: {str(e)}")
+        finally:
+            _render_locks.pop(output_path, None)
+
+    return FileResponse(output_path)
+
+
 @app.get("/api/health")
 def health_check():
-    return {"status": "healthy"}
+    if not registry.is_ready:
+        # Not ready until the models are loaded and warmed up
+        return JSONResponse(status_code=503, content=registry.info())
+
+    return {**registry.info(), "status": "healthy"}
+
+
+@app.get("/api/metrics")
+def metrics():
+    return {
+        "inference_pool": inference_pool.stats() if inference_pool else None,
+        "batching": registry.batcher.stats() if registry.batcher else None,
+        "jobs": job_queue.counts(),
+        "cache": result_cache.stats() if result_cache else None,
+        # Every worker on this node when launched with app.serve
+        "memory": node_memory_report(),
+    }
+
+
+@app.post("/api/admin/reload-model")
+async def reload_model(request: Request, model_path: Optional[str] = Form(None)):
+    _require_admin(request)
+    if model_path is not None:
+        # Checkpoints are unpickled, so only the server's own files are loaded
+        model_path = _resolve_model_path(model_path)
+
+    # A reload would only reach the worker handling this request
+    if os.environ.get(LAUNCHER_PID_ENV):
+        raise HTTPException(
+            status_code=409,
+            detail="Reloading is not supported with app.serve workers; "
+            "restart app.serve to load a new model",
+        )
+
+    # Process pool workers keep the models they loaded at startup
+    if CONFIG["serving"]["executor"] == "process":
+        raise HTTPException(
+            status_code=409,
+            detail="Reloading is not supported with the process executor; "
+            "restart the server to load a new model",
+        )
+
+    if not registry.is_ready:
+        raise HTTPException(status_code=503, detail="Models are still loading")
+
+    try:
+        # Build the new model off the event loop; requests keep using the old one
+        loop = asyncio.get_running_loop()
+        models = await loop.run_in_executor(None, registry.reload, model_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reloading model: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reloading model: {str(e)}")
+
+    return {"status": "reloaded", "model_version": models.version}
 
 
 if __name__ == "__main__":
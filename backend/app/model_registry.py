@@ -0,0 +1,239 @@
+import os
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+from app.batching import InferenceBatcher
+from app.scene_graph_service import (
+    CONFIG,
+    IMPORT_SECONDS,
+    SceneGraphModels,
+    Vocabulary,
+    load_models,
+    load_yolo_model,
+    process_image,
+    process_images,
+    warmup_models,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Process-wide holder for the loaded scene graph models."""
+
+    def __init__(self):
+        self._models: Optional[SceneGraphModels] = None
+        # Loaded before forking workers; each worker warms them up itself
+        self._preloaded: Optional[SceneGraphModels] = None
+        # What load() reuses when only part of the models could be preloaded
+        self._preloaded_parts: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.status = "not_loaded"
+        self.error: Optional[str] = None
+        self.vocabulary_path: Optional[str] = None
+        self.batcher: Optional[InferenceBatcher] = None
+        self.startup: Optional[Dict[str, float]] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._models is not None
+
+    def load(
+        self,
+        model_path: str,
+        vocabulary_path: str,
+        warmup: bool = True,
+        weights: bool = True,
+        wait_for_workers: Optional[Callable[[], None]] = None,
+    ) -> SceneGraphModels:
+        """
+        Load models once; later calls return the already loaded bundle.
+
+        With weights=False only the vocabulary and version are loaded (see
+        load_models) and nothing is warmed up or batched. wait_for_workers
+        runs first, so inference worker processes that fail to start leave
+        the registry in the error state.
+        """
+        with self._reload_lock:
+            if self._models is not None:
+                return self._models
+
+            self.status = "loading"
+            self.vocabulary_path = vocabulary_path
+            try:
+                if wait_for_workers is not None:
+                    wait_for_workers()
+                models = self._preloaded or load_models(
+                    model_path,
+                    vocabulary_path,
+                    weights=weights,
+                    **self._preloaded_parts,
+                )
+                started = time.perf_counter()
+                if warmup and models.model is not None:
+                    warmup_models(models)
+                warmup_s = time.perf_counter() - started
+            except Exception as e:
+                self.status = "error"
+                self.error = str(e)
+                logger.error(f"Error loading models: {str(e)}")
+                raise
+
+            with self._lock:
+                self._models = models
+            # Later reloads must not keep the preloaded weights alive
+            self._preloaded = None
+            self._preloaded_parts = {}
+            if models.model is not None:
+                self._start_batcher()
+            self.status = "ready"
+            self.error = None
+            self.startup = startup_report(models, warmup_s)
+            logger.info(
+                f"Models ready (version {models.version}); startup: "
+                + ", ".join(f"{key} {value:.2f}" for key, value in self.startup.items())
+            )
+            return models
+
+    def preload(self, model_path: str, vocabulary_path: str) -> None:
+        """
+        Load the models without warming them up or starting any threads.
+
+        Meant for a parent process that forks workers afterwards: the workers
+        share the loaded weights and finish startup in load().
+        """
+        with self._reload_lock:
+            if self._preloaded is not None or self._preloaded_parts:
+                return
+            if CONFIG["runtime"]["backend"] == "eager":
+                self._preloaded = load_models(model_path, vocabulary_path)
+            else:
+                # Exported graphs start their own thread pools, which do not
+                # survive a fork, and take each worker's thread budget; the
+                # workers build them in load() and share the rest
+                self._preloaded_parts = {
+                    "vocabulary": Vocabulary.load(vocabulary_path),
+                    "yolo_model": load_yolo_model(),
+                }
+
+    def reload(self, model_path: Optional[str] = None) -> SceneGraphModels:
+        """
+        Hot-reload a checkpoint without restarting the server.
+
+        The new model is built and warmed up next to the current one, which
+        keeps serving requests until it is swapped in.
+        """
+        # A pinned exported graph would be loaded again whatever the checkpoint
+        runtime = CONFIG["runtime"]
+        if model_path is not None and runtime["backend"] != "eager" and runtime["path"]:
+            raise ValueError(
+                f"CONFIG['runtime']['path'] pins the exported model to "
+                f"{runtime['path']}; reload without a model_path to load it again"
+            )
+
+        with self._reload_lock:
+            current = self.get()
+            model_path = model_path or current.model_path
+
+            logger.info(f"Reloading model from {model_path}...")
+            self.status = "reloading"
+            try:
+                models = load_models(
+                    model_path,
+                    self.vocabulary_path,
+                    device=current.device,
+                    vocabulary=current.vocabulary,
+                    yolo_model=current.yolo_model,
+                )
+                warmup_models(models)
+            except Exception as e:
+                # Keep serving the previous model
+                self.status = "ready"
+                logger.error(f"Error reloading model: {str(e)}")
+                raise
+
+            with self._lock:
+                self._models = models
+            self.status = "ready"
+            logger.info(f"Reloaded model (version {models.version})")
+            return models
+
+    def _start_batcher(self) -> None:
+        """Start the micro-batching scheduler if enabled in the config."""
+        batching = CONFIG["batching"]
+        if not batching["enabled"] or self.batcher is not None:
+            return
+
+        # The batcher looks models up per batch, so reloads need no restart
+        self.batcher = InferenceBatcher(
+            self.get,
+            max_batch_size=batching["max_batch_size"],
+            max_wait_ms=batching["max_wait_ms"],
+        )
+        self.batcher.start()
+
+    def get(self) -> SceneGraphModels:
+        """Return the loaded models, failing if loading has not finished."""
+        with self._lock:
+            models = self._models
+        if models is None:
+            raise RuntimeError(f"Models are not ready (status: {self.status})")
+        return models
+
+    def info(self) -> Dict[str, Any]:
+        """Describe the registry state for health checks."""
+        info = {"status": self.status}
+        if self._models is not None:
+            info["model_version"] = self._models.version
+            info["device"] = str(self._models.device)
+        if self.startup is not None:
+            info["startup"] = self.startup
+        if self.batcher is not None:
+            info["batching"] = self.batcher.stats()
+        if self.error:
+            info["error"] = self.error
+        return info
+
+
+def startup_report(models: SceneGraphModels, warmup_s: float) -> Dict[str, float]:
+    """Seconds spent on imports, loading each part and warm-up."""
+    report = {"imports_s": IMPORT_SECONDS, **models.load_timings, "warmup_s": warmup_s}
+    # Everything since the process started, including the interpreter itself
+    report["ready_after_s"] = time.time() - psutil.Process().create_time()
+    return {key: round(value, 3) for key, value in report.items()}
+
+
+# Shared registry for this process
+registry = ModelRegistry()
+
+
+def init_worker_process(model_path: str, vocabulary_path: str) -> None:
+    """Load the models in an inference worker process."""
+    try:
+        registry.load(model_path, vocabulary_path)
+    except Exception:
+        # Raising here would break the whole pool without saying why; the
+        # error is kept on the registry and reported through worker_status
+        pass
+
+
+def worker_status() -> Tuple[int, Optional[str]]:
+    """Pid and model load error (if any) of the current worker process."""
+    return os.getpid(), registry.error
+
+
+def process_image_with_registry(**kwargs) -> Tuple[List, List, str, str]:
+    """Run process_image with the models loaded in the current process."""
+    return process_image(models=registry.get(), batcher=registry.batcher, **kwargs)
+
+
+def process_images_with_registry(**kwargs) -> List[Any]:
+    """Run process_images with the models loaded in the current process."""
+    return process_images(models=registry.get(), **kwargs)
@@ -0,0 +1,363 @@
+"""
+Generate scene graphs for a directory or manifest of images.
+
+Runs a streaming pipeline with bounded queues between its stages, so memory
+use stays the same however many images there are:
+
+    read, decode and resize     (--decode-threads prefetch threads)
+    -> detection and scene graph model   (batches of --batch-size)
+    -> JSON writing and rendering        (background writer thread)
+
+Results are appended to <output-dir>/results.jsonl, one line per image in
+input order. The list of inputs is saved to <output-dir>/manifest.txt on the
+first run and the progress to <output-dir>/checkpoint.json, so running the
+same command again after an interruption continues where it stopped.
+
+Usage (from the backend directory):
+    python -m app.process_dataset images/ --output-dir results/
+    python -m app.process_dataset paths.txt --output-dir results/ --render
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import itertools
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import torch
+from PIL import Image
+
+from app.scene_graph_service import (
+    CONFIG,
+    IMAGE_EXTENSIONS,
+    SceneGraphModels,
+    finish_scene_graph,
+    load_models,
+    preprocess_image,
+    run_batch_inference,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def iter_image_paths(source: str) -> Iterator[str]:
+    """Image paths of a directory (recursively, sorted) or of a manifest file."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
+    else:
+        # One path per line; blank lines and comments are skipped
+        with open(source, "r") as f:
+            for line in f:
+                path = line.strip()
+                if path and not path.startswith("#"):
+                    yield path
+
+
+def prepare_manifest(source: str, output_dir: str) -> str:
+    """
+    Write the inputs to output_dir/manifest.txt unless a previous run did.
+
+    Later runs read the saved manifest, so images added to the source since
+    then do not shift the order the checkpoint refers to.
+    """
+    manifest_path = os.path.join(output_dir, "manifest.txt")
+    if os.path.exists(manifest_path):
+        logger.info(f"Resuming with the inputs in {manifest_path}")
+        return manifest_path
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        for path in iter_image_paths(source):
+            f.write(f"{path}\n")
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def load_progress(output_dir: str) -> Tuple[int, int]:
+    """Images finished and the matching size of results.jsonl."""
+    try:
+        with open(os.path.join(output_dir, "checkpoint.json"), "r") as f:
+            checkpoint = json.load(f)
+        return checkpoint["completed"], checkpoint["results_bytes"]
+    except (OSError, ValueError, KeyError):
+        return 0, 0
+
+
+def save_progress(output_dir: str, completed: int, results_bytes: int) -> None:
+    path = os.path.join(output_dir, "checkpoint.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"completed": completed, "results_bytes": results_bytes}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_image(path: str) -> Tuple[Image.Image, torch.Tensor]:
+    """Decode and preprocess one image (runs in the prefetch threads)."""
+    image = Image.open(path).convert("RGB")
+    return image, preprocess_image(image)
+
+
+def prefetch(
+    paths: Iterable[str], num_threads: int, depth: int
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Load images in background threads, at most depth ahead of the consumer.
+
+    Yields (path, (image, tensor)) in input order, or (path, exception) for
+    images that could not be read.
+    """
+    with ThreadPoolExecutor(num_threads, thread_name_prefix="decode") as executor:
+        pending = deque()
+        paths = iter(paths)
+        for path in itertools.islice(paths, depth):
+            pending.append((path, executor.submit(load_image, path)))
+
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(load_image, next_path)))
+            try:
+                yield path, future.result()
+            except Exception as e:
+                yield path, e
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ResultWriter:
+    """
+    Background thread that turns predictions into JSON lines and images.
+
+    Results are written in the order they are put, and the checkpoint is
+    updated every checkpoint_every images, always matching results.jsonl.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        models: SceneGraphModels,
+        args: argparse.Namespace,
+        completed: int,
+        results_bytes: int,
+        max_pending: int,
+    ):
+        self.output_dir = output_dir
+        self.images_dir = os.path.join(output_dir, "images")
+        self.models = models
+        self.args = args
+        self.completed = completed
+        self.failed = 0
+
+        # Drop lines written after the last checkpoint; they are redone
+        results_path = os.path.join(output_dir, "results.jsonl")
+        with open(results_path, "a") as f:
+            f.truncate(results_bytes)
+        self._file = open(results_path, "a")
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(
+            target=self._run, name="result-writer", daemon=True
+        )
+        self._error: Optional[Exception] = None
+
+    def start(self) -> None:
+        os.makedirs(self.images_dir, exist_ok=True)
+        self._thread.start()
+
+    def put(self, path: str, prediction: Any) -> None:
+        """Queue one image's prediction (or exception); blocks when full."""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((path, prediction))
+
+    def close(self) -> None:
+        """Write everything still queued and save the final checkpoint."""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                self._write(*item)
+                if self.completed % self.args.checkpoint_every == 0:
+                    self._checkpoint()
+            self._checkpoint()
+        except Exception as e:
+            self._error = e
+            # Keep draining so the pipeline does not block on a full queue
+            while self._queue.get() is not None:
+                pass
+
+    def _write(self, path: str, prediction: Any) -> None:
+        if not isinstance(prediction, Exception):
+            try:
+                line = self._finish(path, prediction)
+            except Exception as e:
+                # One image that cannot be finished must not stop the run
+                logger.error(f"Error writing results for {path}: {str(e)}")
+                prediction = e
+
+        if isinstance(prediction, Exception):
+            self.failed += 1
+            line = {"path": path, "error": str(prediction)}
+
+        self._file.write(json.dumps(line) + "\n")
+        self.completed += 1
+
+    def _finish(self, path: str, prediction: Tuple) -> Dict[str, Any]:
+        """Result line of one image, rendering and saving its scores if asked."""
+        # Index-based prefixes stay unique for images with the same name
+        name = os.path.splitext(os.path.basename(path))[0]
+        file_prefix = f"{self.completed:08d}_{name}"
+        objects, relationships, annotated_path, graph_path = finish_scene_graph(
+            *prediction,
+            self.models.vocabulary,
+            self.args.confidence_threshold,
+            self.images_dir,
+            file_prefix,
+            render=self.args.render,
+            save_scores=self.args.save_scores,
+        )
+        line = {"path": path, "objects": objects, "relationships": relationships}
+        if self.args.render:
+            line["annotated_image"] = os.path.relpath(annotated_path, self.output_dir)
+            line["graph"] = os.path.relpath(graph_path, self.output_dir)
+        return line
+
+    def _checkpoint(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        save_progress(self.output_dir, self.completed, self._file.tell())
+
+
+def run_pipeline(args: argparse.Namespace) -> None:
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = prepare_manifest(args.source, args.output_dir)
+    completed, results_bytes = load_progress(args.output_dir)
+    if completed:
+        logger.info(f"Skipping {completed} images finished by a previous run")
+
+    models = load_models(args.model_path, args.vocabulary_path)
+
+    writer = ResultWriter(
+        args.output_dir,
+        models,
+        args,
+        completed,
+        results_bytes,
+        max_pending=2 * args.batch_size,
+    )
+    writer.start()
+
+    paths = itertools.islice(iter_image_paths(manifest_path), completed, None)
+    loaded = prefetch(paths, args.decode_threads, depth=2 * args.batch_size)
+
+    started = time.perf_counter()
+    last_report = started
+    for batch in batched(loaded, args.batch_size):
+        readable = [
+            (path, item) for path, item in batch if not isinstance(item, Exception)
+        ]
+        predictions = iter(
+            run_batch_inference(
+                [image for _, (image, _) in readable],
+                models,
+                max_pairs=args.max_pairs,
+                img_tensors=[tensor for _, (_, tensor) in readable],
+            )
+        )
+
+        # Hand everything to the writer in input order
+        for path, item in batch:
+            writer.put(path, item if isinstance(item, Exception) else next(predictions))
+
+        now = time.perf_counter()
+        if now - last_report >= args.report_every:
+            done = writer.completed - completed
+            logger.info(
+                f"{writer.completed} images done ({done / (now - started):.1f} "
+                f"images/s, {writer.failed} failed)"
+            )
+            last_report = now
+
+    writer.close()
+    elapsed = time.perf_counter() - started
+    done = writer.completed - completed
+    logger.info(
+        f"Finished {done} images in {elapsed:.1f}s "
+        f"({done / max(elapsed, 1e-9):.1f} images/s, {writer.failed} failed); "
+        f"results in {os.path.join(args.output_dir, 'results.jsonl')}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate scene graphs for a directory or manifest of images"
+    )
+    parser.add_argument("source", help="Image directory or file with one path per line")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument(
+        "--model-path",
+        default=os.environ.get("SGG_MODEL_PATH", "app/models/model.pth"),
+    )
+    parser.add_argument(
+        "--vocabulary-path",
+        default=os.environ.get("SGG_VOCABULARY_PATH", "app/models/vocabulary.json"),
+    )
+    parser.add_argument("--confidence-threshold", type=float, default=0.5)
+    parser.add_argument(
+        "--max-pairs", type=int, default=CONFIG["relationships"]["max_pairs"]
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=CONFIG["batching"]["max_batch_size"]
+    )
+    parser.add_argument("--decode-threads", type=int, default=4)
+    parser.add_argument(
+        "--render",
+        action="store_true",
+        help="Save the annotated image and graph of every image",
+    )
+    parser.add_argument(
+        "--save-scores",
+        action="store_true",
+        help="Save the per-pair relationship scores of every image",
+    )
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument(
+        "--report-every", type=float, default=10.0, help="Seconds between reports"
+    )
+    args = parser.parse_args()
+
+    try:
+        run_pipeline(args)
+    except KeyboardInterrupt:
+        logger.info("Interrupted; run the same command again to resume")
+
+
+if __name__ == "__main__":
+    main()
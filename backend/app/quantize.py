@@ -0,0 +1,116 @@
+"""
+Save an int8 quantized copy of the scene graph model for CPU inference.
+
+Linear layers are dynamically quantized. With --calibration-dir the ResNet
+backbone is statically quantized too, calibrated on the images in that
+directory (a few dozen representative photos are enough).
+
+Usage (from the backend directory):
+    python -m app.quantize --calibration-dir calibration_images/
+
+Serve the result by pointing SGG_MODEL_PATH at the saved checkpoint.
+"""
+
+import os
+import argparse
+import logging
+from typing import Optional
+
+import torch
+from PIL import Image
+
+from app.scene_graph_service import (
+    IMAGE_EXTENSIONS,
+    Vocabulary,
+    build_model,
+    preprocess_image,
+    quantize_model,
+    save_quantized_model,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_calibration_images(image_dir: str, max_images: int) -> torch.Tensor:
+    """Preprocess up to max_images images from image_dir into one batch."""
+    filenames = sorted(
+        name
+        for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:max_images]
+    if not filenames:
+        raise FileNotFoundError(f"No images found in {image_dir}")
+
+    return torch.stack(
+        [
+            preprocess_image(Image.open(os.path.join(image_dir, name)).convert("RGB"))
+            for name in filenames
+        ]
+    )
+
+
+def quantize_checkpoint(
+    model_path: str,
+    vocabulary_path: str,
+    output_path: str,
+    calibration_dir: Optional[str] = None,
+    max_calibration_images: int = 64,
+) -> None:
+    """Load an fp32 checkpoint, quantize it and save the result."""
+    vocabulary = Vocabulary.load(vocabulary_path)
+    model = build_model(vocabulary, model_path, torch.device("cpu"))
+
+    calibration_images = None
+    if calibration_dir is not None:
+        calibration_images = load_calibration_images(
+            calibration_dir, max_calibration_images
+        )
+        logger.info(f"Calibrating backbone on {len(calibration_images)} images")
+
+    quantized = quantize_model(model, calibration_images)
+    save_quantized_model(quantized, output_path)
+
+    size_mb = os.path.getsize(output_path) / 1024 / 1024
+    logger.info(f"Quantized model saved to {output_path} ({size_mb:.1f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the scene graph model")
+    parser.add_argument(
+        "--model-path",
+        default=os.environ.get("SGG_MODEL_PATH", "app/models/model.pth"),
+    )
+    parser.add_argument(
+        "--vocabulary-path",
+        default=os.environ.get("SGG_VOCABULARY_PATH", "app/models/vocabulary.json"),
+    )
+    parser.add_argument(
+        "--output-path",
+        default=None,
+        help="Defaults to <model>_int8.pth next to the model",
+    )
+    parser.add_argument(
+        "--calibration-dir",
+        default=None,
+        help="Images to calibrate the backbone with (backbone stays fp32 if omitted)",
+    )
+    parser.add_argument("--max-calibration-images", type=int, default=64)
+    args = parser.parse_args()
+
+    output_path = args.output_path
+    if output_path is None:
+        output_path = f"{os.path.splitext(args.model_path)[0]}_int8.pth"
+
+    quantize_checkpoint(
+        args.model_path,
+        args.vocabulary_path,
+        output_path,
+        calibration_dir=args.calibration_dir,
+        max_calibration_images=args.max_calibration_images,
+    )
+
+
+if __name__ == "__main__":
+    main()
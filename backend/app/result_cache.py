@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of scene graph results.
+
+    Results are keyed by a hash of the uploaded image bytes, the model version
+    and the request parameters. Recent entries live in an in-memory LRU and
+    every entry is also written to a size-capped directory on disk, which is
+    shared by all processes using the same cache_dir.
+    """
+
+    def __init__(
+        self, cache_dir: str, max_memory_entries: int = 256, max_disk_mb: float = 512
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = sum(
+            os.path.getsize(os.path.join(cache_dir, name))
+            for name in os.listdir(cache_dir)
+            if name.endswith(".json")
+        )
+
+        # Statistics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_bytes: bytes, model_version: str, params: Dict[str, Any]) -> str:
+        """Hash the image content together with everything that affects the result."""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(model_version.encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                results = json.load(f)
+            # Mark as recently used for disk eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, results)
+        return results
+
+    def put(self, key: str, results: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remember(key, results)
+
+        path = self._path(key)
+        data = json.dumps(results)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def discard(self, key: str) -> None:
+        """Drop an entry whose results are no longer usable."""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _remember(self, key: str, results: Dict[str, Any]) -> None:
+        self._memory[key] = results
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """Remove least recently used files until the cache fits its size cap."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Recount in case other processes wrote to the same directory
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
+        logger.info(f"Evicted disk cache down to {self._disk_bytes} bytes")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
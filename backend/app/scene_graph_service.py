@@ -1,17 +1,37 @@
+import time
+
+# Measured from here so the startup report covers the heavy imports below
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import io
 import json
+import shutil
 import torch
+import colorsys
+import math
+from collections import deque
+from xml.sax.saxutils import escape
 import numpy as np
-import matplotlib.pyplot as plt
-import networkx as nx
-from PIL import Image
-import torchvision.transforms as T
-from typing import Dict, List, Tuple, Any, Union, Optional
+from PIL import Image, ImageDraw, ImageFont
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    Any,
+    Callable,
+    Collection,
+    Union,
+    Optional,
+    TYPE_CHECKING,
+)
 import logging
 
-# Import from your existing code
-from ultralytics import YOLO
-from math import isclose
+# Detector and plotting libraries are imported when first used, so workers
+# that never render or detect (and every process at import) skip them
+if TYPE_CHECKING:
+    from ultralytics import YOLO
+    from app.batching import InferenceBatcher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,9 +50,6 @@ def set_seeds(seed=42):
     torch.backends.cudnn.benchmark = False
 
 
-# Call this at the start
-set_seeds(42)
-
 # Configuration
 CONFIG = {
     "img_size": 512,
@@ -46,21 +63,157 @@ CONFIG = {
         "conf": 0.25,  # Default confidence threshold
         "iou": 0.45,  # Default IoU threshold for NMS
     },
+    "serving": {
+        "warmup_iterations": 2,  # Dummy inferences run after loading the models
+        "executor": "thread",  # "thread" or "process" pool for inference
+        # Inference jobs running at once (None: enough threads to fill a
+        # micro-batch with the thread executor, otherwise 2)
+        "workers": None,
+        "max_queue": 8,  # Jobs waiting for a worker before rejecting with 503
+        # Keep every upload in uploads/; otherwise only async jobs and lazily
+        # rendered jobs write theirs
+        "persist_uploads": False,
+        "max_batch_images": 1000,  # Images per batch endpoint request
+        "max_batch_mb": 1024,  # Uncompressed size of a batch request's images
+        # Web workers started by app.serve, sharing one copy of the models
+        "processes": 1,
+        # Torch threads per app.serve worker (None: one per core of its slice)
+        "threads_per_process": None,
+    },
+    "relationships": {
+        # Keep only the most plausible pairs per image before relationship
+        # scoring (None scores every ordered pair)
+        "max_pairs": None,
+        # Scores kept per pair so results can be re-filtered without inference
+        "stored_top_k": 5,
+        "top_k": 1,  # Predicates returned per object pair
+        "max_relationships": None,  # Keep only the highest scoring ones
+        # Predicates that read the same in both directions; with
+        # dedupe_symmetric only the higher scoring direction is returned
+        "dedupe_symmetric": False,
+        "symmetric_predicates": [
+            "near",
+            "next to",
+            "beside",
+            "close to",
+            "adjacent to",
+            "touching",
+            "across from",
+            "opposite",
+            "and",
+        ],
+    },
+    "jobs": {
+        "db_path": "jobs.db",  # SQLite queue shared with app.job_worker processes
+        "max_queued": 1000,  # Queued async jobs before rejecting with 503
+        "poll_interval": 0.5,  # Seconds an idle worker waits before polling again
+        # Running jobs whose worker sent no heartbeat for this long are requeued
+        "stale_after_s": 120,
+        "heartbeat_interval": 15,  # Seconds between heartbeats of a worker
+        "event_poll_interval": 0.2,  # Seconds between checks for new job events
+        "event_keepalive_s": 15,  # Comment sent on idle event streams
+        # Events of finished jobs are deleted after this many seconds
+        "event_retention_s": 3600,
+    },
+    "cache": {
+        "enabled": True,  # Reuse results for identical uploads and parameters
+        "dir": "cache",
+        "memory_entries": 256,
+        "max_disk_mb": 512,
+    },
+    "rendering": {
+        # "pil" draws on the image at native resolution, "matplotlib" renders
+        # a 300 dpi figure (slower, larger files)
+        "annotator": "pil",
+        "png_compress_level": 1,  # zlib level for PIL-rendered PNGs (0-9)
+        # "svg" writes a lightweight vector graph with a circular layout,
+        # "png" a 300 dpi matplotlib figure with a spring layout
+        "graph": "svg",
+        # Re-filtered graphs kept per job, one per filter setting
+        "max_refiltered_graphs": 8,
+    },
+    "quantization": {
+        # Run CPU inference with int8 dynamically quantized Linear layers.
+        # Checkpoints saved by app.quantize are always loaded quantized.
+        "enabled": False,
+    },
+    "heads": {
+        # Model heads run for every image; the others are skipped. Without
+        # "objects" or "bboxes" the detector's labels or boxes are returned,
+        # and without all three of "objects", "bboxes" and "attributes" the
+        # backbone is skipped too (relationships only need the boxes)
+        "enabled": ["objects", "bboxes", "relationships"],
+        "attribute_top_k": 3,  # Attributes returned per object with "attributes"
+    },
+    "runtime": {
+        # "eager" runs the PyTorch model; "torchscript" and "onnxruntime" run
+        # the graph saved by app.export_model (pair selection stays in Python)
+        "backend": "eager",
+        # Exported graph (defaults to <model>.ts or <model>.onnx)
+        "path": None,
+        "num_threads": None,  # ONNX Runtime intra-op threads (None: all cores)
+    },
+    "video": {
+        "sample_fps": 5,  # Frames per second of video that are processed
+        "match_iou": 0.5,  # Minimum IoU to continue a track in the next frame
+        # Mean absolute difference of 32x32 grayscale thumbnails (0-1) from
+        # the last keyframe that triggers a new keyframe
+        "scene_change": 0.08,
+        "max_keyframe_interval": 30,  # Sampled frames between forced keyframes
+        # Largest change of either normalized box of a pair for which its
+        # relationship scores are carried forward
+        "motion_threshold": 0.02,
+    },
+    "batching": {
+        "enabled": True,  # Group concurrent requests into one forward pass
+        "max_batch_size": 8,
+        "max_wait_ms": 10,  # How long the first request waits for company
+    },
 }
 
 
 # Vocabulary class
 class Vocabulary:
-    """Vocabulary for objects, attributes, and relationships in scene graphs."""
+    """
+    Vocabulary for objects, attributes, and relationships in scene graphs.
+
+    Names are stored in arrays indexed by id, so a batch of ids maps to names
+    with a single numpy indexing operation. The name-to-id dictionaries are
+    only built when first used.
+    """
 
-    def __init__(self):
-        # Initialize dictionaries for mapping between terms and IDs
-        self.object2id = {"<unk>": 0}
-        self.id2object = {0: "<unk>"}
-        self.relationship2id = {"<unk>": 0}
-        self.id2relationship = {0: "<unk>"}
-        self.attribute2id = {"<unk>": 0}
-        self.id2attribute = {0: "<unk>"}
+    def __init__(
+        self,
+        object_names: Optional[np.ndarray] = None,
+        relationship_names: Optional[np.ndarray] = None,
+        attribute_names: Optional[np.ndarray] = None,
+    ):
+        # Id-indexed name tables; id 0 is <unk>
+        self.object_names = _name_table(object_names)
+        self.relationship_names = _name_table(relationship_names)
+        self.attribute_names = _name_table(attribute_names)
+
+        self._object2id: Optional[Dict[str, int]] = None
+        self._relationship2id: Optional[Dict[str, int]] = None
+        self._attribute2id: Optional[Dict[str, int]] = None
+
+    @property
+    def object2id(self) -> Dict[str, int]:
+        if self._object2id is None:
+            self._object2id = _name_index(self.object_names)
+        return self._object2id
+
+    @property
+    def relationship2id(self) -> Dict[str, int]:
+        if self._relationship2id is None:
+            self._relationship2id = _name_index(self.relationship_names)
+        return self._relationship2id
+
+    @property
+    def attribute2id(self) -> Dict[str, int]:
+        if self._attribute2id is None:
+            self._attribute2id = _name_index(self.attribute_names)
+        return self._attribute2id
 
     def get_object_id(self, obj_name: str) -> int:
         return self.object2id.get(obj_name, 0)  # Return <unk> ID if not found
@@ -72,43 +225,120 @@ class Vocabulary:
         return self.attribute2id.get(attr_name, 0)  # Return <unk> ID if not found
 
     def get_object_name(self, obj_id: int) -> str:
-        return self.id2object.get(obj_id, "<unk>")
+        return _lookup_names(self.object_names, [obj_id])[0]
 
     def get_relationship_name(self, rel_id: int) -> str:
-        return self.id2relationship.get(rel_id, "<unk>")
+        return _lookup_names(self.relationship_names, [rel_id])[0]
 
     def get_attribute_name(self, attr_id: int) -> str:
-        return self.id2attribute.get(attr_id, "<unk>")
+        return _lookup_names(self.attribute_names, [attr_id])[0]
+
+    def get_object_names(self, obj_ids: np.ndarray) -> List[str]:
+        return _lookup_names(self.object_names, obj_ids)
+
+    def get_relationship_names(self, rel_ids: np.ndarray) -> List[str]:
+        return _lookup_names(self.relationship_names, rel_ids)
+
+    def get_attribute_names(self, attr_ids: np.ndarray) -> List[str]:
+        return _lookup_names(self.attribute_names, attr_ids)
 
     @classmethod
     def load(cls, path: str) -> "Vocabulary":
-        """Load vocabulary from a JSON file."""
-        vocab = cls()
+        """
+        Load vocabulary from a JSON file.
+
+        The parsed tables are compiled into a directory of .npy files next to
+        the JSON file, which later loads memory-map instead of parsing it again.
+        """
+        compiled_path = f"{os.path.splitext(path)[0]}.compiled"
+        if _compiled_is_current(compiled_path, path):
+            return cls.load_compiled(compiled_path)
 
         with open(path, "r") as f:
             data = json.load(f)
 
-        # Load objects
-        vocab.object2id = data["objects"]
-        vocab.id2object = {
-            int(k): v for k, v in {v: k for k, v in vocab.object2id.items()}.items()
-        }
-
-        # Load relationships
-        vocab.relationship2id = data["relationships"]
-        vocab.id2relationship = {
-            int(k): v
-            for k, v in {v: k for k, v in vocab.relationship2id.items()}.items()
-        }
+        vocab = cls(
+            object_names=_names_by_id(data["objects"]),
+            relationship_names=_names_by_id(data["relationships"]),
+            attribute_names=_names_by_id(data["attributes"]),
+        )
 
-        # Load attributes
-        vocab.attribute2id = data["attributes"]
-        vocab.id2attribute = {
-            int(k): v for k, v in {v: k for k, v in vocab.attribute2id.items()}.items()
-        }
+        try:
+            vocab.save_compiled(compiled_path, source_path=path)
+        except OSError as e:
+            logger.warning(f"Could not save compiled vocabulary: {str(e)}")
 
         return vocab
 
+    @classmethod
+    def load_compiled(cls, path: str) -> "Vocabulary":
+        """Memory-map a vocabulary saved with save_compiled."""
+        return cls(
+            **{
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                for name in _VOCABULARY_TABLES
+            }
+        )
+
+    def save_compiled(self, path: str, source_path: Optional[str] = None) -> None:
+        """Save the name tables as .npy files in the directory path."""
+        # Write to a temporary directory first so readers never see a partial one
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name in _VOCABULARY_TABLES:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+
+        if source_path is not None:
+            with open(os.path.join(tmp_path, "source.json"), "w") as f:
+                json.dump(_source_signature(source_path), f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process compiled it at the same time
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+_VOCABULARY_TABLES = ("object_names", "relationship_names", "attribute_names")
+
+
+def _name_table(names: Optional[np.ndarray]) -> np.ndarray:
+    return np.array(["<unk>"]) if names is None else names
+
+
+def _names_by_id(name2id: Dict[str, int]) -> np.ndarray:
+    """Turn a name-to-id mapping into an id-indexed name array."""
+    names = ["<unk>"] * (max(name2id.values(), default=0) + 1)
+    for name, idx in name2id.items():
+        names[idx] = name
+    return np.array(names)
+
+
+def _name_index(names: np.ndarray) -> Dict[str, int]:
+    return {name: idx for idx, name in enumerate(names.tolist())}
+
+
+def _lookup_names(names: np.ndarray, ids) -> List[str]:
+    """Map ids to names, returning <unk> for ids outside the table."""
+    ids = np.asarray(ids, dtype=np.int64)
+    valid = (ids >= 0) & (ids < len(names))
+    return np.where(valid, names[np.where(valid, ids, 0)], "<unk>").tolist()
+
+
+def _source_signature(path: str) -> Dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _compiled_is_current(compiled_path: str, source_path: str) -> bool:
+    """Check that a compiled vocabulary exists and matches its JSON source."""
+    try:
+        with open(os.path.join(compiled_path, "source.json"), "r") as f:
+            return json.load(f) == _source_signature(source_path)
+    except (OSError, ValueError):
+        return False
+
 
 # Model Architecture
 class VisualFeatureEncoder(torch.nn.Module):
@@ -190,57 +420,119 @@ class RelationshipPredictor(torch.nn.Module):
         obj_pairs: List[torch.Tensor],
     ) -> Dict[str, List[torch.Tensor]]:
         """Forward pass for relationship prediction."""
-        results = {}
-        all_rel_logits = []
-
-        # Process each example in the batch
-        for i, (feats, boxes, pairs) in enumerate(
-            zip(obj_features, obj_boxes, obj_pairs)
-        ):
+        # Pack the pairs of every example into one batch with global indices
+        packed_boxes = []
+        packed_pairs = []
+        pair_counts = []
+        offset = 0
+        for boxes, pairs in zip(obj_boxes, obj_pairs):
             if len(pairs) == 0 or boxes.size(0) == 0:
-                # No relationships to predict
-                all_rel_logits.append(None)
+                pair_counts.append(0)
                 continue
 
-            # Extract object classes from boxes
-            obj_classes = boxes[:, 4].long()
-            obj_embeds = self.obj_embedding(obj_classes)
+            packed_boxes.append(boxes)
+            packed_pairs.append(pairs.long() + offset)
+            pair_counts.append(len(pairs))
+            offset += boxes.size(0)
 
-            # Create pairs of object features
-            subj_idx = pairs[:, 0].long()
-            obj_idx = pairs[:, 1].long()
+        if not packed_pairs:
+            # No relationships to predict
+            return {"rel_logits": [None] * len(obj_pairs)}
 
-            subj_feats = obj_embeds[subj_idx]
-            obj_feats = obj_embeds[obj_idx]
+        rel_logits = self.forward_packed(
+            torch.cat(packed_boxes), torch.cat(packed_pairs)
+        )
 
-            # Spatial features
-            subj_boxes = boxes[subj_idx, :4]  # [x_c, y_c, w, h]
-            obj_boxes = boxes[obj_idx, :4]  # [x_c, y_c, w, h]
+        # Split the logits back per example
+        all_rel_logits = [
+            logits if count > 0 else None
+            for logits, count in zip(rel_logits.split(pair_counts), pair_counts)
+        ]
+        return {"rel_logits": all_rel_logits}
+
+    def forward_packed(self, boxes: torch.Tensor, pairs: torch.Tensor) -> torch.Tensor:
+        """
+        Predict relationships for pairs packed from any number of images.
+
+        Args:
+            boxes: [num_objects, 5] boxes of all images, [x_c, y_c, w, h, class_id]
+            pairs: [num_pairs, 2] (subject, object) indices into boxes
+
+        Returns:
+            [num_pairs, num_rel_classes] relationship logits
+        """
+        # Extract object classes from boxes
+        obj_classes = boxes[:, 4].long()
+        obj_embeds = self.obj_embedding(obj_classes)
+
+        # Create pairs of object features
+        subj_idx = pairs[:, 0].long()
+        obj_idx = pairs[:, 1].long()
+
+        subj_feats = obj_embeds[subj_idx]
+        obj_feats = obj_embeds[obj_idx]
+
+        # Spatial features
+        subj_boxes = boxes[subj_idx, :4]  # [x_c, y_c, w, h]
+        obj_boxes = boxes[obj_idx, :4]  # [x_c, y_c, w, h]
+
+        # Compute relative spatial features
+        delta_x = subj_boxes[:, 0] - obj_boxes[:, 0]
+        delta_y = subj_boxes[:, 1] - obj_boxes[:, 1]
+
+        # Concatenate spatial features
+        spatial_feats = torch.cat(
+            [subj_boxes, obj_boxes, delta_x.unsqueeze(1), delta_y.unsqueeze(1)],
+            dim=1,
+        )
 
-            # Compute relative spatial features
-            delta_x = subj_boxes[:, 0] - obj_boxes[:, 0]
-            delta_y = subj_boxes[:, 1] - obj_boxes[:, 1]
+        spatial_feats = self.spatial_fc(spatial_feats)
 
-            # Concatenate spatial features
-            spatial_feats = torch.cat(
-                [subj_boxes, obj_boxes, delta_x.unsqueeze(1), delta_y.unsqueeze(1)],
-                dim=1,
-            )
+        # Concatenate subject and object features
+        subj_obj_feats = torch.cat([subj_feats, obj_feats, spatial_feats], dim=1)
 
-            spatial_feats = self.spatial_fc(spatial_feats)
+        # Visual fusion
+        fused_feats = self.visual_fusion(subj_obj_feats)
 
-            # Concatenate subject and object features
-            subj_obj_feats = torch.cat([subj_feats, obj_feats, spatial_feats], dim=1)
+        # Predict relationships
+        return self.rel_classifier(fused_feats)
 
-            # Visual fusion
-            fused_feats = self.visual_fusion(subj_obj_feats)
 
-            # Predict relationships
-            rel_logits = self.rel_classifier(fused_feats)
-            all_rel_logits.append(rel_logits)
+def score_pair_proposals(boxes: torch.Tensor, pairs: torch.Tensor) -> torch.Tensor:
+    """
+    Cheap spatial plausibility score for (subject, object) pairs.
 
-        results["rel_logits"] = all_rel_logits
-        return results
+    Overlapping and nearby boxes are far more likely to be related than
+    distant ones, so pairs are scored by their IoU plus a proximity term
+    based on the centre distance relative to the box sizes.
+
+    Args:
+        boxes: [num_objects, 4+] normalized [x_c, y_c, w, h, ...] boxes
+        pairs: [num_pairs, 2] indices into boxes
+
+    Returns:
+        [num_pairs] scores, higher is more plausible
+    """
+    subj = boxes[pairs[:, 0], :4]
+    obj = boxes[pairs[:, 1], :4]
+
+    # Intersection over union
+    ix1 = torch.max(subj[:, 0] - subj[:, 2] / 2, obj[:, 0] - obj[:, 2] / 2)
+    iy1 = torch.max(subj[:, 1] - subj[:, 3] / 2, obj[:, 1] - obj[:, 3] / 2)
+    ix2 = torch.min(subj[:, 0] + subj[:, 2] / 2, obj[:, 0] + obj[:, 2] / 2)
+    iy2 = torch.min(subj[:, 1] + subj[:, 3] / 2, obj[:, 1] + obj[:, 3] / 2)
+    inter = (ix2 - ix1).clamp(min=0) * (iy2 - iy1).clamp(min=0)
+    union = subj[:, 2] * subj[:, 3] + obj[:, 2] * obj[:, 3] - inter
+    iou = inter / union.clamp(min=1e-6)
+
+    # Centre distance relative to the mean half-diagonal of the two boxes
+    distance = torch.hypot(subj[:, 0] - obj[:, 0], subj[:, 1] - obj[:, 1])
+    scale = (
+        torch.hypot(subj[:, 2], subj[:, 3]) + torch.hypot(obj[:, 2], obj[:, 3])
+    ) / 4
+    proximity = 1 / (1 + distance / scale.clamp(min=1e-6))
+
+    return iou + proximity
 
 
 class SceneGraphGenerationModel(torch.nn.Module):
@@ -262,10 +554,10 @@ class SceneGraphGenerationModel(torch.nn.Module):
         self.backbone = backbone
         self.num_obj_classes = num_obj_classes
         self.num_rel_classes = num_rel_classes
+        self.num_attr_classes = num_attr_classes
 
         # RoI pooling for object features
         self.roi_size = roi_size
-        self.roi_pool = torch.nn.AdaptiveAvgPool2d((roi_size, roi_size))
 
         # Object feature embedding
         self.obj_feature_embedding = torch.nn.Sequential(
@@ -299,244 +591,981 @@ class SceneGraphGenerationModel(torch.nn.Module):
             torch.Tensor
         ],  # List of [num_boxes, 4] tensors with normalized boxes
     ) -> List[torch.Tensor]:
-        """Extract RoI features for objects."""
-        batch_size = features.shape[0]
-        roi_features = []
-
-        for i in range(batch_size):
-            if len(boxes[i]) == 0:
-                # No objects in this image
-                roi_features.append(
-                    torch.empty(
-                        0,
-                        self.backbone.out_channels * self.roi_size**2,
-                        device=features.device,
-                    )
-                )
-                continue
+        """Extract RoI features for objects, one tensor per image."""
+        counts = [len(b) for b in boxes]
+        return list(self.extract_packed_roi_features(features, boxes).split(counts))
 
-            # Convert normalized [x_c, y_c, w, h] to [x1, y1, x2, y2]
-            bbox = boxes[i][:, :4]
-            x_c, y_c, w, h = bbox[:, 0], bbox[:, 1], bbox[:, 2], bbox[:, 3]
-            x1 = (x_c - w / 2) * features.shape[3]
-            y1 = (y_c - h / 2) * features.shape[2]
-            x2 = (x_c + w / 2) * features.shape[3]
-            y2 = (y_c + h / 2) * features.shape[2]
-
-            # Ensure boxes are within image
-            x1 = torch.clamp(x1, 0, features.shape[3] - 1)
-            y1 = torch.clamp(y1, 0, features.shape[2] - 1)
-            x2 = torch.clamp(x2, 0, features.shape[3] - 1)
-            y2 = torch.clamp(y2, 0, features.shape[2] - 1)
-
-            # Create RoI boxes for torchvision's RoIPool
-            rois = torch.stack([x1, y1, x2, y2], dim=1)
-
-            # Extract features for each RoI
-            obj_features = []
-            for roi in rois:
-                x1, y1, x2, y2 = map(int, roi.cpu().numpy())
-                # Ensure valid box dimensions
-                if x2 <= x1 or y2 <= y1:
-                    roi_feat = torch.zeros(
-                        self.backbone.out_channels,
-                        self.roi_size,
-                        self.roi_size,
-                        device=features.device,
-                    )
-                else:
-                    # Extract feature for this ROI
-                    roi_feat = self.roi_pool(
-                        features[i, :, y1:y2, x1:x2].unsqueeze(0)
-                    ).squeeze(0)
-
-                # Flatten the feature
-                roi_feat = roi_feat.view(-1)
-                obj_features.append(roi_feat)
-
-            if obj_features:
-                obj_features = torch.stack(obj_features)
-            else:
-                obj_features = torch.empty(
-                    0,
-                    self.backbone.out_channels * self.roi_size**2,
-                    device=features.device,
-                )
+    def extract_packed_roi_features(
+        self,
+        features: torch.Tensor,  # [batch_size, channels, height, width]
+        boxes: List[torch.Tensor],  # List of [num_boxes, 4+] normalized boxes
+    ) -> torch.Tensor:
+        """
+        Extract RoI features for the boxes of all images, concatenated.
+
+        All boxes of all images are pooled in a single call. Each box is
+        cropped on the integer feature grid and average pooled into
+        roi_size x roi_size bins exactly like AdaptiveAvgPool2d, but every bin
+        is read from a summed-area table of the feature map instead of
+        cropping and pooling box by box.
+        """
+        counts = [len(b) for b in boxes]
+        if sum(counts) == 0:
+            # No objects in any image
+            channels = features.shape[1]
+            return torch.empty(0, channels * self.roi_size**2, device=features.device)
+
+        # Image index of every box
+        bbox = torch.cat([b[:, :4] for b in boxes if len(b) > 0])
+        batch_idx = torch.repeat_interleave(
+            torch.arange(len(boxes), device=features.device),
+            torch.tensor(counts, device=features.device),
+        )
+        return self.pool_rois(features, bbox, batch_idx)
 
-            roi_features.append(obj_features)
+    def pool_rois(
+        self,
+        features: torch.Tensor,
+        bbox: torch.Tensor,
+        batch_idx: torch.Tensor,
+        fused_gather: bool = True,
+    ) -> torch.Tensor:
+        """
+        Pool roi_size x roi_size features for packed boxes.
+
+        Args:
+            features: [batch_size, channels, height, width] backbone features
+            bbox: [num_rois, 4] normalized [x_c, y_c, w, h] boxes
+            batch_idx: [num_rois] image index of every box
+            fused_gather: Read the bins with one embedding_bag call; otherwise
+                use four plain gathers, which every exporter supports
+
+        Returns:
+            [num_rois, channels * roi_size**2] RoI features
+        """
+        batch_size, channels, height, width = features.shape
+        device = features.device
+        roi_size = self.roi_size
+        num_rois = bbox.shape[0]
+
+        # Convert normalized [x_c, y_c, w, h] to [x1, y1, x2, y2]
+        x_c, y_c, w, h = bbox[:, 0], bbox[:, 1], bbox[:, 2], bbox[:, 3]
+        x1 = (x_c - w / 2) * width
+        y1 = (y_c - h / 2) * height
+        x2 = (x_c + w / 2) * width
+        y2 = (y_c + h / 2) * height
+
+        # Ensure boxes are within image and snap them to the feature grid
+        x1 = torch.clamp(x1, 0, width - 1).long()
+        y1 = torch.clamp(y1, 0, height - 1).long()
+        x2 = torch.clamp(x2, 0, width - 1).long()
+        y2 = torch.clamp(y2, 0, height - 1).long()
+
+        # Empty boxes get zero features
+        valid = (x2 > x1) & (y2 > y1)
+
+        # Adaptive pooling bin edges inside each crop: [num_rois, roi_size]
+        bins = torch.arange(roi_size, device=device)
+        crop_h = (y2 - y1).clamp(min=1).unsqueeze(1)
+        crop_w = (x2 - x1).clamp(min=1).unsqueeze(1)
+        y_start = y1.unsqueeze(1) + bins * crop_h // roi_size
+        y_end = y1.unsqueeze(1) + ((bins + 1) * crop_h + roi_size - 1) // roi_size
+        x_start = x1.unsqueeze(1) + bins * crop_w // roi_size
+        x_end = x1.unsqueeze(1) + ((bins + 1) * crop_w + roi_size - 1) // roi_size
+
+        # Summed-area table with a leading zero row and column,
+        # flattened to [batch_size * (height + 1) * (width + 1), channels]
+        integral = features.permute(0, 2, 3, 1).cumsum(1).cumsum(2)
+        integral = torch.nn.functional.pad(integral, (0, 0, 1, 0, 1, 0))
+        integral = integral.reshape(-1, channels)
+
+        # Table rows of the four corners of every bin: [num_rois, S, S, 4]
+        image_offset = (batch_idx * (height + 1)).unsqueeze(1)
+        top = ((image_offset + y_start) * (width + 1)).unsqueeze(2)
+        bottom = ((image_offset + y_end) * (width + 1)).unsqueeze(2)
+        left = x_start.unsqueeze(1)
+        right = x_end.unsqueeze(1)
+        corners = torch.stack(
+            [bottom + right, top + right, bottom + left, top + left], dim=3
+        )
+
+        # Bin averages from the corner sums; empty boxes get zeros
+        bin_areas = (y_end - y_start).unsqueeze(2) * (x_end - x_start).unsqueeze(1)
+        if fused_gather:
+            signs = torch.tensor([1.0, -1.0, -1.0, 1.0], device=device)
+            weights = signs / bin_areas.unsqueeze(3) * valid.view(-1, 1, 1, 1)
+
+            # One fused gather-and-sum over all bins of all boxes
+            pooled = torch.nn.functional.embedding_bag(
+                corners.view(-1, 4),
+                integral,
+                per_sample_weights=weights.view(-1, 4).to(integral.dtype),
+                mode="sum",
+            )
+        else:
+            corners = corners.view(-1, 4)
+            scale = (valid.view(-1, 1, 1) / bin_areas).view(-1, 1)
+            pooled = (
+                integral[corners[:, 0]]
+                - integral[corners[:, 1]]
+                - integral[corners[:, 2]]
+                + integral[corners[:, 3]]
+            ) * scale.to(integral.dtype)
+
+        # Flatten as [channels, roi_size, roi_size]
+        roi_features = pooled.view(num_rois, roi_size**2, channels).transpose(1, 2)
+        return roi_features.reshape(num_rois, channels * roi_size**2)
+
+    @staticmethod
+    def build_pairs(
+        counts: List[int], device: torch.device
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Create all ordered object pairs (without self-pairs) for every image.
+
+        Args:
+            counts: Number of objects in each image
+            device: Device to create the pairs on
+
+        Returns:
+            Tuple of ([num_pairs, 2] per-image indices, [num_pairs, 2] indices
+            into the concatenated boxes of all images), ordered image by image
+        """
+        counts_t = torch.tensor(counts, device=device)
+        offsets = torch.cumsum(counts_t, 0) - counts_t
+
+        # Enumerate the num_objs x num_objs grid of every image at once
+        grid_sizes = counts_t * counts_t
+        image_idx = torch.repeat_interleave(
+            torch.arange(len(counts), device=device), grid_sizes
+        )
+        grid_starts = torch.cumsum(grid_sizes, 0) - grid_sizes
+        position = torch.arange(int(grid_sizes.sum()), device=device)
+        position = position - grid_starts[image_idx]
+        num_objs = counts_t[image_idx]
+        subj_idx = position // num_objs
+        obj_idx = position % num_objs
+
+        # Exclude self-relationships
+        mask = subj_idx != obj_idx
+        local_pairs = torch.stack([subj_idx[mask], obj_idx[mask]], dim=1)
+        global_pairs = local_pairs + offsets[image_idx[mask]].unsqueeze(1)
+
+        return local_pairs, global_pairs
+
+    @staticmethod
+    def prune_pairs(
+        packed_boxes: torch.Tensor,
+        local_pairs: torch.Tensor,
+        global_pairs: torch.Tensor,
+        counts: List[int],
+        max_pairs: List[Optional[int]],
+    ) -> Tuple[torch.Tensor, torch.Tensor, List[int]]:
+        """
+        Keep only the top-K most plausible pairs of each image.
+
+        Args:
+            packed_boxes: [num_objects, 5] boxes of all images
+            local_pairs: [num_pairs, 2] per-image pair indices from build_pairs
+            global_pairs: [num_pairs, 2] packed pair indices from build_pairs
+            counts: Number of objects in each image
+            max_pairs: Pair budget of each image (None keeps all pairs)
+
+        Returns:
+            Tuple of (local_pairs, global_pairs, pairs per image) after pruning,
+            still ordered image by image and subject by subject
+        """
+        device = packed_boxes.device
+        pair_counts = [n * (n - 1) for n in counts]
+        limits = [
+            count if limit is None else min(limit, count)
+            for limit, count in zip(max_pairs, pair_counts)
+        ]
+        if limits == pair_counts:
+            return local_pairs, global_pairs, pair_counts
 
-        return roi_features
+        scores = score_pair_proposals(packed_boxes, global_pairs)
+        image_idx = torch.repeat_interleave(
+            torch.arange(len(counts), device=device),
+            torch.tensor(pair_counts, device=device),
+        )
+
+        # Sort by score within each image and keep the first K of every image
+        order = torch.argsort(scores, descending=True)
+        order = order[torch.argsort(image_idx[order], stable=True)]
+        pair_counts_t = torch.tensor(pair_counts, device=device)
+        group_starts = torch.cumsum(pair_counts_t, 0) - pair_counts_t
+        rank = torch.arange(len(order), device=device) - group_starts[image_idx[order]]
+        limits_t = torch.tensor(limits, device=device)
+        keep = order[rank < limits_t[image_idx[order]]]
+
+        # Restore the original pair order
+        keep, _ = torch.sort(keep)
+        return local_pairs[keep], global_pairs[keep], limits
+
+    def forward_packed(
+        self,
+        images: torch.Tensor,
+        boxes: torch.Tensor,
+        batch_idx: torch.Tensor,
+        pairs: torch.Tensor,
+        fused_gather: bool = True,
+        heads: Optional[Collection[str]] = None,
+    ) -> Tuple[Optional[torch.Tensor], ...]:
+        """
+        Run the backbone and the requested heads on already packed inputs.
+
+        This is the tensor-only part of the model that app.export_model
+        traces; pair building and pruning happen before it.
+
+        Args:
+            images: [batch_size, 3, H, W] preprocessed images
+            boxes: [num_objects, 5] boxes of all images, [x_c, y_c, w, h, class_id]
+            batch_idx: [num_objects] image index of every box
+            pairs: [num_pairs, 2] (subject, object) indices into boxes
+            fused_gather: See pool_rois
+            heads: Heads to run, out of MODEL_HEADS (None runs all of them)
+
+        Returns:
+            Tuple of (obj_logits, attr_logits, bbox_pred, rel_logits), packed,
+            with None for the heads that did not run
+        """
+        if heads is None:
+            heads = MODEL_HEADS
+        obj_logits = attr_logits = bbox_pred = rel_logits = None
+
+        # The object heads share the backbone, RoI pooling and embedding
+        if any(head in heads for head in ("objects", "attributes", "bboxes")):
+            # Extract features from backbone
+            features = self.backbone(images)
+
+            # Extract RoI features of all boxes: [num_objects, channels * roi_size**2]
+            roi_features = self.pool_rois(
+                features, boxes[:, :4], batch_idx, fused_gather=fused_gather
+            )
+
+            # Embed RoI features
+            obj_feats = self.obj_feature_embedding(roi_features)
+
+            # Predict object classes, attributes and bounding box refinements
+            if "objects" in heads:
+                obj_logits = self.obj_classifier(obj_feats)
+            if "attributes" in heads:
+                attr_logits = self.attr_classifier(obj_feats)
+            if "bboxes" in heads:
+                bbox_pred = self.bbox_regressor(obj_feats)
+
+        # Predict relationships for the pairs of all images in one pass
+        if "relationships" in heads:
+            rel_logits = self.relationship_predictor.forward_packed(boxes, pairs)
+
+        return obj_logits, attr_logits, bbox_pred, rel_logits
 
     def forward(
-        self, images: torch.Tensor, boxes: List[torch.Tensor]
+        self,
+        images: torch.Tensor,
+        boxes: List[torch.Tensor],
+        max_pairs: Optional[Union[int, List[Optional[int]]]] = None,
+        heads: Optional[Collection[str]] = None,
     ) -> Dict[str, Any]:
-        """Forward pass for scene graph generation."""
-        batch_size = images.shape[0]
-
-        # Extract features from backbone
-        features = self.backbone(images)
-
-        # Extract RoI features
-        roi_features = self.extract_roi_features(features, boxes)
-
-        # Process each example in the batch
-        obj_logits_list = []
-        attr_logits_list = []
-        bbox_pred_list = []
-        obj_features_list = []
-
-        for i in range(batch_size):
-            if roi_features[i].shape[0] == 0:
-                # No objects in this image
-                obj_logits_list.append(
-                    torch.empty(0, self.num_obj_classes, device=images.device)
-                )
-                attr_logits_list.append(
-                    torch.empty(0, self.num_attr_classes, device=images.device)
-                )
-                bbox_pred_list.append(torch.empty(0, 4, device=images.device))
-                obj_features_list.append(
-                    torch.empty(
-                        0,
-                        self.obj_feature_embedding[0].out_features,
-                        device=images.device,
-                    )
+        """
+        Forward pass for scene graph generation.
+
+        The boxes and object pairs of all images are packed together so every
+        head runs once per batch; outputs are split back into per-image lists.
+        max_pairs limits relationship scoring to the most plausible pairs,
+        either for all images or per image (None scores every ordered pair).
+        Only the given heads run (all of them when None); the outputs of the
+        others are None for every image.
+        """
+        return run_packed_model(self.forward_packed, images, boxes, max_pairs, heads)
+
+
+# Output of each model head
+HEAD_OUTPUTS = {
+    "objects": "obj_logits",
+    "attributes": "attr_logits",
+    "bboxes": "bbox_pred",
+    "relationships": "rel_logits",
+}
+MODEL_HEADS = tuple(HEAD_OUTPUTS)
+
+
+def run_packed_model(
+    forward_packed: Callable[..., Tuple[Optional[torch.Tensor], ...]],
+    images: torch.Tensor,
+    boxes: List[torch.Tensor],
+    max_pairs: Optional[Union[int, List[Optional[int]]]] = None,
+    heads: Optional[Collection[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Pack per-image boxes and pairs, run a packed forward and split the outputs.
+
+    Shared by the eager model and exported graphs so both select the same
+    pairs and return the same per-image outputs.
+    """
+    if heads is None:
+        heads = MODEL_HEADS
+    batch_size = images.shape[0]
+    device = images.device
+    counts = [len(b) for b in boxes]
+    if not isinstance(max_pairs, list):
+        max_pairs = [max_pairs] * batch_size
+
+    # Pack the boxes of all images
+    if sum(counts) > 0:
+        packed_boxes = torch.cat([b for b in boxes if len(b) > 0])
+    else:
+        packed_boxes = torch.zeros(0, 5, device=device)
+    batch_idx = torch.repeat_interleave(
+        torch.arange(batch_size, device=device), torch.tensor(counts, device=device)
+    )
+
+    # Create object pairs for relationship prediction
+    if "relationships" in heads:
+        local_pairs, global_pairs = SceneGraphGenerationModel.build_pairs(
+            counts, device
+        )
+        pair_counts = [n * (n - 1) for n in counts]
+    else:
+        local_pairs = global_pairs = torch.zeros(0, 2, dtype=torch.long, device=device)
+        pair_counts = [0] * batch_size
+    if len(global_pairs) > 0:
+        local_pairs, global_pairs, pair_counts = SceneGraphGenerationModel.prune_pairs(
+            packed_boxes, local_pairs, global_pairs, counts, max_pairs
+        )
+
+    obj_logits, attr_logits, bbox_pred, rel_logits = forward_packed(
+        images, packed_boxes, batch_idx, global_pairs, heads=heads
+    )
+
+    def split(outputs: Optional[torch.Tensor], sizes: List[int]) -> List[Any]:
+        # Heads that did not run give None for every image
+        if outputs is None:
+            return [None] * batch_size
+        return list(outputs.split(sizes))
+
+    return {
+        "obj_logits": split(obj_logits, counts),
+        "attr_logits": split(attr_logits, counts),
+        "bbox_pred": split(bbox_pred, counts),
+        "rel_logits": [
+            logits if count > 0 else None
+            for logits, count in zip(split(rel_logits, pair_counts), pair_counts)
+        ],
+        "obj_pairs": list(local_pairs.split(pair_counts)),
+    }
+
+
+# Names of the inputs of exported graphs; the outputs are named as in HEAD_OUTPUTS
+EXPORTED_INPUTS = ("images", "boxes", "batch_idx", "pairs")
+
+
+class ExportedSceneGraphModel:
+    """
+    Scene graph model running a graph saved by app.export_model.
+
+    Called like SceneGraphGenerationModel and returns the same outputs; only
+    the packed forward pass runs in TorchScript or ONNX Runtime. The graph
+    always computes the heads it was exported with (self.heads).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        backend: str,
+        device: torch.device,
+        num_threads: Optional[int] = None,
+    ):
+        self.path = path
+        self.backend = backend
+        if backend == "torchscript":
+            extra_files = {"heads": ""}
+            self.module = torch.jit.load(
+                path, map_location=device, _extra_files=extra_files
+            )
+            self.heads = tuple(extra_files["heads"].decode().split(","))
+        elif backend == "onnxruntime":
+            # Optional dependency, only needed for this backend
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            if num_threads is not None:
+                options.intra_op_num_threads = num_threads
+            self.session = onnxruntime.InferenceSession(
+                path, options, providers=["CPUExecutionProvider"]
+            )
+            # Inputs that none of the exported heads read are left out
+            self.input_names = {input.name for input in self.session.get_inputs()}
+            outputs = {output.name for output in self.session.get_outputs()}
+            self.heads = tuple(
+                head for head, output in HEAD_OUTPUTS.items() if output in outputs
+            )
+        else:
+            raise ValueError(f"Unsupported runtime backend: {backend}")
+
+    def forward_packed(
+        self,
+        images: torch.Tensor,
+        boxes: torch.Tensor,
+        batch_idx: torch.Tensor,
+        pairs: torch.Tensor,
+        heads: Optional[Collection[str]] = None,
+    ) -> Tuple[Optional[torch.Tensor], ...]:
+        """Run the exported graph; see SceneGraphGenerationModel.forward_packed."""
+        if heads is None:
+            heads = self.heads
+        missing = [head for head in heads if head not in self.heads]
+        if missing:
+            raise ValueError(
+                f"Exported graph has no {', '.join(missing)} head; "
+                "export it again with app.export_model --heads"
+            )
+
+        if self.backend == "torchscript":
+            outputs = self.module(images, boxes, batch_idx, pairs)
+        else:
+            feeds = {
+                name: tensor.cpu().numpy()
+                for name, tensor in zip(
+                    EXPORTED_INPUTS, (images, boxes.float(), batch_idx, pairs)
                 )
-                continue
+                if name in self.input_names
+            }
+            output_names = [HEAD_OUTPUTS[head] for head in self.heads]
+            outputs = [
+                torch.from_numpy(output)
+                for output in self.session.run(output_names, feeds)
+            ]
 
-            # Embed RoI features
-            obj_feats = self.obj_feature_embedding(roi_features[i])
-            obj_features_list.append(obj_feats)
-
-            # Predict object classes
-            obj_logits = self.obj_classifier(obj_feats)
-            obj_logits_list.append(obj_logits)
-
-            # Predict attributes
-            attr_logits = self.attr_classifier(obj_feats)
-            attr_logits_list.append(attr_logits)
-
-            # Regress bounding box refinements
-            bbox_pred = self.bbox_regressor(obj_feats)
-            bbox_pred_list.append(bbox_pred)
-
-        # Create object pairs for relationship prediction
-        obj_pairs = []
-        for i in range(batch_size):
-            if boxes[i].shape[0] <= 1:
-                # Need at least 2 objects for relationships
-                obj_pairs.append(torch.empty(0, 2, device=images.device))
-                continue
+        by_head = dict(zip(self.heads, outputs))
+        return tuple(by_head[head] if head in heads else None for head in MODEL_HEADS)
+
+    def __call__(
+        self,
+        images: torch.Tensor,
+        boxes: List[torch.Tensor],
+        max_pairs: Optional[Union[int, List[Optional[int]]]] = None,
+        heads: Optional[Collection[str]] = None,
+    ) -> Dict[str, Any]:
+        if heads is None:
+            heads = self.heads
+        return run_packed_model(self.forward_packed, images, boxes, max_pairs, heads)
+
+
+# Model loading
+class SceneGraphModels:
+    """Loaded vocabulary, scene graph model and YOLO detector shared across requests."""
+
+    def __init__(
+        self,
+        vocabulary: Vocabulary,
+        model: Optional[Union[SceneGraphGenerationModel, ExportedSceneGraphModel]],
+        yolo_model: Optional["YOLO"],
+        device: torch.device,
+        model_path: str,
+        version: str,
+        yolo_class_map: Optional[np.ndarray] = None,
+        heads: Optional[Collection[str]] = None,
+        load_timings: Optional[Dict[str, float]] = None,
+    ):
+        self.vocabulary = vocabulary
+        self.model = model
+        self.yolo_model = yolo_model
+        self.device = device
+        self.model_path = model_path
+        self.version = version
+        # Model heads run for each image
+        self.heads = tuple(heads) if heads is not None else MODEL_HEADS
+        # Vocabulary object id of each YOLO class id
+        if yolo_class_map is None and yolo_model is not None:
+            yolo_class_map = build_yolo_class_map(yolo_model.names, vocabulary)
+        self.yolo_class_map = yolo_class_map
+        # Seconds spent loading each part, for the startup report
+        self.load_timings = load_timings or {}
+
+
+def preprocess_image(image: Image.Image) -> torch.Tensor:
+    """Resize and normalize an RGB image into the scene graph model's input."""
+    import torchvision.transforms as T
+
+    transform = T.Compose(
+        [
+            T.Resize((CONFIG["img_size"], CONFIG["img_size"])),
+            T.ToTensor(),
+            T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ]
+    )
+    return transform(image)
+
+
+def quantize_backbone(
+    backbone: torch.nn.Module, calibration_images: torch.Tensor
+) -> torch.nn.Module:
+    """
+    Statically quantize the convolutional backbone to int8 (FX graph mode).
+
+    Convolutions cannot be quantized dynamically, so activation ranges are
+    calibrated on a batch of preprocessed images first.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(
+        backbone.cpu().eval(), qconfig_mapping, example_inputs=(calibration_images[:1],)
+    )
+    with torch.no_grad():
+        for batch in calibration_images.split(4):
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def quantize_model(
+    model: SceneGraphGenerationModel,
+    calibration_images: Optional[torch.Tensor] = None,
+) -> SceneGraphGenerationModel:
+    """
+    Int8 copy of the scene graph model for CPU inference.
+
+    All Linear layers (the 51M-parameter object embedding, the classifiers and
+    the relationship MLPs) are dynamically quantized. The ResNet backbone is
+    also quantized when calibration images are given.
+
+    Args:
+        model: fp32 scene graph model
+        calibration_images: Preprocessed images [B, 3, H, W] to calibrate the
+            backbone with (backbone stays fp32 if not given)
+
+    Returns:
+        Quantized model on the CPU
+    """
+    quantized = torch.ao.quantization.quantize_dynamic(
+        model.cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8
+    )
+    quantized.quantized_backbone = calibration_images is not None
+    if calibration_images is not None:
+        encoder = quantized.backbone
+        encoder.backbone = quantize_backbone(encoder.backbone, calibration_images)
+    return quantized
+
+
+def is_quantized(model: SceneGraphGenerationModel) -> bool:
+    return hasattr(model, "quantized_backbone")
+
+
+def save_checkpoint(checkpoint: Dict[str, Any], path: str) -> None:
+    """
+    Save a checkpoint by writing a new file and renaming it over path.
+
+    Serving processes memory-map the checkpoint they loaded (load_checkpoint);
+    torch.save truncates and rewrites the file in place, which would pull
+    the weights out from under them (SIGBUS). Replacing the file keeps the
+    old one alive until every process that mapped it has moved on.
+    """
+    tmp_path = os.path.join(
+        os.path.dirname(path) or ".", f".{os.path.basename(path)}.tmp"
+    )
+    torch.save(checkpoint, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_quantized_model(model: SceneGraphGenerationModel, path: str) -> None:
+    """Save a model returned by quantize_model so build_model can load it."""
+    save_checkpoint(
+        {
+            "quantized_state_dict": model.state_dict(),
+            "quantized_backbone": model.quantized_backbone,
+        },
+        path,
+    )
+
+
+def checkpoint_version(model_path: str) -> str:
+    """Identify a checkpoint by its file name, size and modification time."""
+    stat = os.stat(model_path)
+    return f"{os.path.basename(model_path)}-{stat.st_size}-{int(stat.st_mtime)}"
+
+
+def exported_model_path(model_path: str, backend: str) -> str:
+    """Default location of a checkpoint's exported graph for a runtime backend."""
+    extension = ".onnx" if backend == "onnxruntime" else ".ts"
+    return f"{os.path.splitext(model_path)[0]}{extension}"
+
+
+def build_yolo_class_map(
+    yolo_class_names: Dict[int, str], vocabulary: Vocabulary
+) -> np.ndarray:
+    """Map YOLO class ids to vocabulary object ids (<unk> if not in the vocabulary)."""
+    class_map = np.zeros(max(yolo_class_names, default=0) + 1, dtype=np.int64)
+    for yolo_id, yolo_name in yolo_class_names.items():
+        # Try direct mapping first
+        if yolo_name in vocabulary.object2id:
+            class_map[yolo_id] = vocabulary.get_object_id(yolo_name)
+        # Try lowercase
+        elif yolo_name.lower() in vocabulary.object2id:
+            class_map[yolo_id] = vocabulary.get_object_id(yolo_name.lower())
+    return class_map
 
-            # Create all possible object pairs
-            num_objs = boxes[i].shape[0]
-            subj_idx = torch.arange(num_objs, device=images.device).repeat_interleave(
-                num_objs
+
+def load_yolo_model() -> "YOLO":
+    """Load the YOLOv8 detector - will download if not present."""
+    from ultralytics import YOLO
+
+    return YOLO(CONFIG["yolo"]["model"])
+
+
+def create_model(vocabulary: Vocabulary) -> SceneGraphGenerationModel:
+    """Create an untrained scene graph model sized for the vocabulary."""
+    # Create encoder
+    encoder = VisualFeatureEncoder(backbone_name=CONFIG["model"]["backbone"])
+
+    # Create model
+    return SceneGraphGenerationModel(
+        backbone=encoder,
+        num_obj_classes=len(vocabulary.object_names),
+        num_rel_classes=len(vocabulary.relationship_names),
+        num_attr_classes=len(vocabulary.attribute_names),
+        embedding_dim=CONFIG["model"]["embedding_dim"],
+        hidden_dim=CONFIG["model"]["hidden_dim"],
+    )
+
+
+def load_checkpoint(model_path: str) -> Dict[str, Any]:
+    """
+    Load a checkpoint with its tensors memory-mapped from the file.
+
+    Nothing is copied up front: pages are read on first use and shared
+    through the page cache by every process that maps the same file. The
+    file must therefore never be rewritten in place while it is served;
+    write new checkpoints with save_checkpoint.
+    """
+    try:
+        return torch.load(model_path, map_location="cpu", mmap=True)
+    except RuntimeError:
+        # Only checkpoints in torch.save's zip format can be memory-mapped
+        logger.warning(
+            f"{model_path} cannot be memory-mapped; re-save it with torch.save "
+            "to load it faster"
+        )
+        return torch.load(model_path, map_location="cpu")
+
+
+def build_model(
+    vocabulary: Vocabulary, model_path: str, device: torch.device
+) -> SceneGraphGenerationModel:
+    """Create the scene graph model and load its checkpoint weights."""
+    # Load model weights
+    logger.info(f"Loading model from {model_path}...")
+    checkpoint = load_checkpoint(model_path)
+    if "quantized_state_dict" in checkpoint:
+        # Recreate the quantized structure, then load its weights and scales
+        calibration_images = None
+        if checkpoint["quantized_backbone"]:
+            img_size = CONFIG["img_size"]
+            calibration_images = torch.zeros(1, 3, img_size, img_size)
+        model = quantize_model(create_model(vocabulary), calibration_images)
+        model.load_state_dict(checkpoint["quantized_state_dict"])
+        logger.info("Loaded quantized model from checkpoint")
+        return model.eval()
+
+    # Create the model without allocating or initializing weights; the
+    # checkpoint tensors are then used in place instead of being copied
+    with torch.device("meta"):
+        model = create_model(vocabulary)
+    if "model_state_dict" in checkpoint:
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        logger.info("Loaded model state dict from checkpoint")
+    else:
+        model.load_state_dict(checkpoint, assign=True)
+        logger.info("Loaded direct model state from checkpoint")
+
+    model.to(device)
+    model.eval()
+
+    return model
+
+
+def load_models(
+    model_path: str,
+    vocabulary_path: str,
+    device: Optional[torch.device] = None,
+    vocabulary: Optional[Vocabulary] = None,
+    yolo_model: Optional["YOLO"] = None,
+    weights: bool = True,
+) -> SceneGraphModels:
+    """
+    Load everything needed to run the scene graph pipeline.
+
+    Args:
+        model_path: Path to the model checkpoint
+        vocabulary_path: Path to the vocabulary file
+        device: PyTorch device (CUDA if available when not given)
+        vocabulary: Already loaded vocabulary to reuse
+        yolo_model: Already loaded YOLO detector to reuse
+        weights: Load the detector and model; when False the bundle only has
+            the vocabulary and version, for processes that never run inference
+
+    Returns:
+        SceneGraphModels bundle
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found at {model_path}")
+
+    set_seeds(42)
+    timings = {}
+
+    # Set device
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    logger.info(f"Using device: {device}")
+
+    # Load vocabulary
+    if vocabulary is None:
+        if not os.path.exists(vocabulary_path):
+            raise FileNotFoundError(f"Vocabulary not found at {vocabulary_path}")
+
+        started = time.perf_counter()
+        vocabulary = Vocabulary.load(vocabulary_path)
+        timings["vocabulary_s"] = time.perf_counter() - started
+        logger.info(
+            f"Loaded vocabulary with {len(vocabulary.object_names)} objects and {len(vocabulary.relationship_names)} relationships"
+        )
+
+    heads = CONFIG["heads"]["enabled"]
+    unknown = [head for head in heads if head not in MODEL_HEADS]
+    if unknown:
+        raise ValueError(f"Unknown model heads {unknown}, expected {MODEL_HEADS}")
+
+    if not weights:
+        return SceneGraphModels(
+            vocabulary=vocabulary,
+            model=None,
+            yolo_model=None,
+            device=device,
+            model_path=model_path,
+            version=checkpoint_version(model_path),
+            heads=heads,
+            load_timings=timings,
+        )
+
+    # Load detector and scene graph model
+    if yolo_model is None:
+        started = time.perf_counter()
+        yolo_model = load_yolo_model()
+        timings["detector_s"] = time.perf_counter() - started
+
+    # Run an exported graph instead of the eager model
+    runtime = CONFIG["runtime"]
+    if runtime["backend"] != "eager":
+        backend = runtime["backend"]
+        path = runtime["path"] or exported_model_path(model_path, backend)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Exported model not found at {path}")
+        if backend == "onnxruntime":
+            # The session runs on the CPU execution provider
+            device = torch.device("cpu")
+        started = time.perf_counter()
+        model = ExportedSceneGraphModel(
+            path, backend, device, num_threads=runtime["num_threads"]
+        )
+        timings["weights_s"] = time.perf_counter() - started
+        missing = [head for head in heads if head not in model.heads]
+        if missing:
+            raise ValueError(
+                f"Exported model at {path} has no {', '.join(missing)} head; "
+                "export it again with app.export_model --heads"
             )
-            obj_idx = torch.arange(num_objs, device=images.device).repeat(num_objs)
+        logger.info(f"Using {backend} model from {path} (heads: {model.heads})")
+        return SceneGraphModels(
+            vocabulary=vocabulary,
+            model=model,
+            yolo_model=yolo_model,
+            device=device,
+            model_path=model_path,
+            version=checkpoint_version(path),
+            heads=heads,
+            load_timings=timings,
+        )
 
-            # Exclude self-relationships
-            mask = subj_idx != obj_idx
-            pairs = torch.stack([subj_idx[mask], obj_idx[mask]], dim=1)
-            obj_pairs.append(pairs)
+    started = time.perf_counter()
+    model = build_model(vocabulary, model_path, device)
+    version = checkpoint_version(model_path)
+
+    if CONFIG["quantization"]["enabled"] and not is_quantized(model):
+        model = quantize_model(model)
+    timings["weights_s"] = time.perf_counter() - started
+    if is_quantized(model):
+        # Quantized kernels only run on the CPU
+        device = torch.device("cpu")
+        version = f"{version}-int8"
+        logger.info("Using int8 quantized model")
+
+    return SceneGraphModels(
+        vocabulary=vocabulary,
+        model=model,
+        yolo_model=yolo_model,
+        device=device,
+        model_path=model_path,
+        version=version,
+        heads=heads,
+        load_timings=timings,
+    )
+
+
+def warmup_models(models: SceneGraphModels, iterations: Optional[int] = None) -> None:
+    """Run dummy inferences so the first real request does not pay lazy init costs."""
+    if iterations is None:
+        iterations = CONFIG["serving"]["warmup_iterations"]
+
+    img_size = CONFIG["img_size"]
+    blank_image = np.zeros((img_size, img_size, 3), dtype=np.uint8)
+    img_tensor = torch.zeros(1, 3, img_size, img_size, device=models.device)
+    boxes = torch.tensor(
+        [[0.3, 0.3, 0.4, 0.4, 0], [0.6, 0.6, 0.4, 0.4, 0]],
+        device=models.device,
+        dtype=torch.float32,
+    )
+
+    for _ in range(iterations):
+        models.yolo_model(blank_image, verbose=False)
+        with torch.no_grad():
+            models.model(img_tensor, [boxes], heads=models.heads)
+
+    logger.info(f"Warm-up finished ({iterations} iterations)")
 
-        # Predict relationships
-        rel_preds = self.relationship_predictor(obj_features_list, boxes, obj_pairs)
-
-        return {
-            "obj_logits": obj_logits_list,
-            "attr_logits": attr_logits_list,
-            "bbox_pred": bbox_pred_list,
-            "rel_logits": rel_preds.get("rel_logits", []),
-            "obj_pairs": obj_pairs,
-        }
+
+# File extensions read as images from directories and archives
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def decode_image(image_bytes: bytes) -> Image.Image:
+    """Decode uploaded image bytes once into an RGB image."""
+    return Image.open(io.BytesIO(image_bytes)).convert("RGB")
 
 
 # YOLO-based object detection
 def detect_objects_yolo(
-    image_path: str,
+    image: Union[str, np.ndarray],
     vocabulary: Vocabulary,
     device: torch.device,
     use_fixed_boxes: bool = False,
-) -> torch.Tensor:
+    yolo_model: Optional["YOLO"] = None,
+    class_map: Optional[np.ndarray] = None,
+    return_scores: bool = False,
+) -> Union[torch.Tensor, Tuple[torch.Tensor, torch.Tensor]]:
     """
     Detect objects in an image using YOLOv8.
 
     Args:
-        image_path: Path to the input image
+        image: Path to the input image, or the decoded RGB image array
         vocabulary: Vocabulary for mapping class names
         device: PyTorch device
         use_fixed_boxes: Whether to use fixed boxes or YOLO detection
+        yolo_model: Preloaded YOLO model (loaded on demand if not given)
+        class_map: Vocabulary object id of each YOLO class id
+            (built from the vocabulary if not given)
+        return_scores: Also return the detection confidences
 
     Returns:
-        Bounding boxes in format [x_c, y_c, w, h, class_id] (normalized)
+        Bounding boxes in format [x_c, y_c, w, h, class_id] (normalized),
+        and their [num_boxes] confidences with return_scores
     """
     # Load YOLOv8 model - will download if not present
-    yolo_model = YOLO(CONFIG["yolo"]["model"])
+    if yolo_model is None:
+        yolo_model = load_yolo_model()
 
-    # Run inference
-    results = yolo_model(image_path)
+    # Run inference - YOLO expects numpy images in BGR channel order
+    if isinstance(image, np.ndarray):
+        image = np.ascontiguousarray(image[..., ::-1])
+    results = yolo_model(image)
     detections = results[0]
 
-    # No detections
-    if len(detections.boxes) == 0:
-        return torch.zeros((0, 5), device=device, dtype=torch.float32)
+    # Class mapping from YOLO (COCO class names) to our vocabulary
+    if class_map is None:
+        class_map = build_yolo_class_map(yolo_model.names, vocabulary)
 
-    # Process detections
-    boxes = []
+    return yolo_detections_to_boxes(detections, class_map, device, return_scores)
 
-    # Get image dimensions
-    img = Image.open(image_path)
-    img_width, img_height = img.size
 
-    # YOLO class names (COCO class names)
-    yolo_class_names = yolo_model.names
+def detect_objects_yolo_batch(
+    images: List[np.ndarray],
+    yolo_model: "YOLO",
+    class_map: np.ndarray,
+    device: torch.device,
+) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+    """
+    Detect objects in several decoded RGB images with one YOLO call.
 
-    # Create class name mapping from YOLO to our vocabulary
-    class_name_map = {}
-    for yolo_id, yolo_name in yolo_class_names.items():
-        # Try direct mapping first
-        if yolo_name in vocabulary.object2id:
-            class_name_map[yolo_id] = vocabulary.get_object_id(yolo_name)
-        # Try lowercase
-        elif yolo_name.lower() in vocabulary.object2id:
-            class_name_map[yolo_id] = vocabulary.get_object_id(yolo_name.lower())
-        # Fallback to <unk>
-        else:
-            class_name_map[yolo_id] = 0  # <unk>
+    Returns:
+        The normalized [x_c, y_c, w, h, class_id] boxes and confidences of
+        every image, as detect_objects_yolo with return_scores
+    """
+    if not images:
+        return []
 
-    # Process each detection
-    for i in range(len(detections.boxes)):
-        box = detections.boxes[i]
+    # YOLO expects numpy images in BGR channel order
+    results = yolo_model(
+        [np.ascontiguousarray(image[..., ::-1]) for image in images], verbose=False
+    )
+    return [
+        yolo_detections_to_boxes(detections, class_map, device, return_scores=True)
+        for detections in results
+    ]
 
-        # Get class ID and confidence
-        cls_id = int(box.cls.item())
-        confidence = box.conf.item()
 
-        # Skip low-confidence detections
-        if confidence < CONFIG["yolo"]["conf"]:
-            continue
+def yolo_detections_to_boxes(
+    detections: Any,
+    class_map: np.ndarray,
+    device: torch.device,
+    return_scores: bool = False,
+) -> Union[torch.Tensor, Tuple[torch.Tensor, torch.Tensor]]:
+    """
+    Convert YOLO detections to normalized boxes with vocabulary class ids.
 
-        # Get bounding box in xyxy format (unnormalized)
-        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+    Works on the whole xyxy/conf/cls tensors at once, on the device YOLO ran on.
 
-        # Convert to xywh format and normalize
-        x_c = ((x1 + x2) / 2) / img_width
-        y_c = ((y1 + y2) / 2) / img_height
-        w = (x2 - x1) / img_width
-        h = (y2 - y1) / img_height
+    Args:
+        detections: Ultralytics Results for one image
+        class_map: Vocabulary object id of each YOLO class id
+        device: PyTorch device for the returned boxes
+        return_scores: Also return the detection confidences
 
-        # Map class ID to vocabulary
-        vocab_cls_id = class_name_map.get(cls_id, 0)  # Default to <unk> if not found
+    Returns:
+        Bounding boxes in format [x_c, y_c, w, h, class_id] (normalized),
+        and their [num_boxes] confidences with return_scores
+    """
+    # Skip low-confidence detections
+    keep = detections.boxes.conf >= CONFIG["yolo"]["conf"]
+    xyxy = detections.boxes.xyxy[keep]
+    cls_ids = detections.boxes.cls[keep].long()
+
+    # Convert to xywh format and normalize by the image size
+    img_height, img_width = detections.orig_shape
+    x1, y1, x2, y2 = xyxy.unbind(dim=1)
+    normalized = torch.stack(
+        [
+            ((x1 + x2) / 2) / img_width,
+            ((y1 + y2) / 2) / img_height,
+            (x2 - x1) / img_width,
+            (y2 - y1) / img_height,
+        ],
+        dim=1,
+    )
 
-        # Add to boxes
-        boxes.append([x_c, y_c, w, h, vocab_cls_id])
+    # Map class IDs to vocabulary, defaulting to <unk> if not found
+    class_map = torch.as_tensor(class_map, device=cls_ids.device)
+    known = cls_ids < len(class_map)
+    vocab_cls_ids = torch.where(
+        known, class_map[cls_ids.clamp(max=len(class_map) - 1)], 0
+    )
 
-    # Convert to tensor with explicit float32 dtype
-    if boxes:
-        return torch.tensor(boxes, device=device, dtype=torch.float32)
-    else:
-        return torch.zeros((0, 5), device=device, dtype=torch.float32)
+    boxes = torch.cat([normalized, vocab_cls_ids.unsqueeze(1).to(normalized.dtype)], 1)
+    boxes = boxes.to(device=device, dtype=torch.float32)
+    if return_scores:
+        scores = detections.boxes.conf[keep].to(device=device, dtype=torch.float32)
+        return boxes, scores
+    return boxes
 
 
 # Visualization functions
@@ -544,6 +1573,8 @@ def visualize_image_with_boxes(
     image: np.ndarray, objects: List[Dict[str, Any]], output_path: str
 ) -> None:
     """Visualize image with bounding boxes and labels."""
+    import matplotlib.pyplot as plt
+
     # Create figure
     plt.figure(figsize=(10, 8))
 
@@ -608,10 +1639,90 @@ def visualize_image_with_boxes(
     logger.info(f"Annotated image saved to {output_path}")
 
 
+def draw_image_with_boxes(
+    image: np.ndarray, objects: List[Dict[str, Any]], output_path: str
+) -> None:
+    """Draw bounding boxes and labels directly on the image at native resolution."""
+    canvas = Image.fromarray(image).convert("RGB")
+    img_width, img_height = canvas.size
+    draw = ImageDraw.Draw(canvas, "RGBA")
+
+    # Scale line width and text with the image, like a fixed-size figure would
+    line_width = max(2, round(min(img_width, img_height) / 300))
+    font = ImageFont.load_default(size=max(12, round(min(img_width, img_height) / 40)))
+
+    # Generate colors for classes
+    num_classes = max(len(objects), 1)
+    colors = [
+        tuple(round(c * 255) for c in colorsys.hsv_to_rgb(i / num_classes, 1.0, 1.0))
+        for i in range(num_classes)
+    ]
+
+    # Draw bounding boxes and labels
+    for i, obj in enumerate(objects):
+        # Get bounding box
+        x_c, y_c, w, h = obj["bbox"]
+
+        # Scale to image size if normalized
+        if max(x_c, y_c, w, h) <= 1.0:
+            x_c *= img_width
+            y_c *= img_height
+            w *= img_width
+            h *= img_height
+
+        # Convert to (x1, y1, x2, y2) format
+        x1 = x_c - w / 2
+        y1 = y_c - h / 2
+        x2 = x_c + w / 2
+        y2 = y_c + h / 2
+
+        # Predicted boxes can have negative sizes, which PIL rejects
+        x1, x2 = sorted((x1, x2))
+        y1, y2 = sorted((y1, y2))
+
+        color = colors[i % len(colors)]
+        draw.rectangle([x1, y1, x2, y2], outline=color, width=line_width)
+
+        # Draw label on a translucent background just above the box
+        label = f"{obj['label']} ({obj['score']:.2f})"
+        left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+        text_y = max(0, y1 - (bottom - top) - 2 * line_width)
+        draw.rectangle(
+            [x1, text_y, x1 + right + 2 * line_width, text_y + bottom + line_width],
+            fill=(255, 255, 255, 178),
+        )
+        draw.text((x1 + line_width, text_y), label, fill=color, font=font)
+
+    canvas.save(output_path, compress_level=CONFIG["rendering"]["png_compress_level"])
+
+    logger.info(f"Annotated image saved to {output_path}")
+
+
+def annotate_image(
+    image: np.ndarray,
+    objects: List[Dict[str, Any]],
+    output_path: str,
+    annotator: Optional[str] = None,
+) -> None:
+    """Save the annotated image with the configured annotator."""
+    if annotator is None:
+        annotator = CONFIG["rendering"]["annotator"]
+
+    if annotator == "pil":
+        draw_image_with_boxes(image, objects, output_path)
+    elif annotator == "matplotlib":
+        visualize_image_with_boxes(image, objects, output_path)
+    else:
+        raise ValueError(f"Unsupported annotator: {annotator}")
+
+
 def visualize_graph(
     objects: List[Dict[str, Any]], relationships: List[Dict[str, Any]], output_path: str
 ) -> None:
     """Visualize relationship graph."""
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     # Create figure
     plt.figure(figsize=(10, 8))
 
@@ -657,6 +1768,301 @@ def visualize_graph(
     logger.info(f"Graph visualization saved to {output_path}")
 
 
+def graph_filename(file_prefix: str, suffix: str = "") -> str:
+    """File name of a graph image for the configured graph renderer."""
+    extension = "svg" if CONFIG["rendering"]["graph"] == "svg" else "png"
+    return f"{file_prefix}_graph{suffix}.{extension}"
+
+
+def graph_layout(
+    objects: List[Dict[str, Any]], relationships: List[Dict[str, Any]]
+) -> Tuple[np.ndarray, Dict[Tuple[int, int], List[str]]]:
+    """
+    Deterministic circular layout of the scene graph.
+
+    Parallel relationships between the same subject and object are merged into
+    one edge. Nodes are placed on a circle in breadth-first order from the best
+    connected node, so related objects end up next to each other.
+
+    Args:
+        objects: Detected objects (graph nodes)
+        relationships: Relationships between them (graph edges)
+
+    Returns:
+        Tuple of (node positions in the unit square with shape [N, 2],
+        predicates of each (subject_id, object_id) edge by decreasing score)
+    """
+    # Merge parallel edges, keeping the predicates in score order
+    edges: Dict[Tuple[int, int], List[str]] = {}
+    for rel in sorted(relationships, key=lambda rel: -rel["score"]):
+        predicates = edges.setdefault((rel["subject_id"], rel["object_id"]), [])
+        if rel["predicate"] not in predicates:
+            predicates.append(rel["predicate"])
+
+    neighbours = [set() for _ in objects]
+    for subj_idx, obj_idx in edges:
+        neighbours[subj_idx].add(obj_idx)
+        neighbours[obj_idx].add(subj_idx)
+
+    def rank(node):
+        return -len(neighbours[node]), node
+
+    # Breadth-first order, starting from the best connected unvisited node
+    order = []
+    visited = set()
+    for start in sorted(range(len(objects)), key=rank):
+        if start in visited:
+            continue
+        visited.add(start)
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbour in sorted(neighbours[node], key=rank):
+                if neighbour not in visited:
+                    visited.add(neighbour)
+                    queue.append(neighbour)
+
+    positions = np.full((len(objects), 2), 0.5)
+    if len(objects) > 1:
+        angles = np.pi / 2 - 2 * np.pi * np.arange(len(objects)) / len(objects)
+        positions[order, 0] = 0.5 + 0.5 * np.cos(angles)
+        positions[order, 1] = 0.5 - 0.5 * np.sin(angles)
+
+    return positions, edges
+
+
+def save_graph_svg(
+    objects: List[Dict[str, Any]], relationships: List[Dict[str, Any]], output_path: str
+) -> None:
+    """Write the relationship graph as a lightweight SVG."""
+    width, height, margin = 800, 640, 90
+    positions, edges = graph_layout(objects, relationships)
+    points = margin + positions * np.array([width - 2 * margin, height - 2 * margin])
+    node_radius = max(8.0, min(24.0, 240.0 / max(len(objects), 1)))
+    arrow_size = 8.0
+
+    svg = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" '
+        f'markerWidth="{arrow_size}" markerHeight="{arrow_size}" '
+        'markerUnits="userSpaceOnUse" orient="auto">'
+        '<path d="M0,0 L10,5 L0,10 z" fill="#555"/></marker></defs>',
+        '<rect width="100%" height="100%" fill="white"/>',
+        f'<text x="{width / 2}" y="30" font-size="18" text-anchor="middle">'
+        "Scene Graph</text>",
+    ]
+
+    # Draw edges, bending edges that have a reverse edge so both stay visible
+    labels = []
+    for (subj_idx, obj_idx), predicates in edges.items():
+        start, end = points[subj_idx], points[obj_idx]
+        delta = end - start
+        length = math.hypot(*delta) or 1.0
+        normal = np.array([-delta[1], delta[0]]) / length
+        bend = 0.15 * length if (obj_idx, subj_idx) in edges else 0.0
+        control = (start + end) / 2 + normal * bend
+
+        # Stop the curve at the node borders
+        to_control = control - start
+        start = start + to_control / (math.hypot(*to_control) or 1.0) * node_radius
+        from_control = control - end
+        end = end + from_control / (math.hypot(*from_control) or 1.0) * node_radius
+
+        svg.append(
+            f'<path d="M{start[0]:.1f},{start[1]:.1f} Q{control[0]:.1f},'
+            f'{control[1]:.1f} {end[0]:.1f},{end[1]:.1f}" fill="none" '
+            'stroke="#555" stroke-width="1.5" stroke-opacity="0.7" '
+            'marker-end="url(#arrow)"/>'
+        )
+
+        label = ", ".join(predicates[:3])
+        if len(predicates) > 3:
+            label += f" +{len(predicates) - 3}"
+        middle = 0.25 * start + 0.5 * control + 0.25 * end
+        labels.append(
+            f'<text x="{middle[0]:.1f}" y="{middle[1]:.1f}" font-size="11" '
+            'text-anchor="middle" paint-order="stroke" stroke="white" '
+            f'stroke-width="3">{escape(label)}</text>'
+        )
+
+    # Draw nodes
+    for i, obj in enumerate(objects):
+        x, y = points[i]
+        svg.append(
+            f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{node_radius:.1f}" '
+            'fill="skyblue" fill-opacity="0.8"/>'
+        )
+        svg.append(
+            f'<text x="{x:.1f}" y="{y - node_radius - 4:.1f}" font-size="12" '
+            'font-weight="bold" text-anchor="middle" paint-order="stroke" '
+            f'stroke="white" stroke-width="3">{escape(obj["label"])} {i}</text>'
+        )
+
+    # Edge labels go on top of everything else
+    svg.extend(labels)
+    svg.append("</svg>")
+
+    with open(output_path, "w") as f:
+        f.write("\n".join(svg))
+
+    logger.info(f"Graph visualization saved to {output_path}")
+
+
+def save_graph(
+    objects: List[Dict[str, Any]], relationships: List[Dict[str, Any]], output_path: str
+) -> None:
+    """Save the relationship graph in the format given by the file extension."""
+    if output_path.endswith(".svg"):
+        save_graph_svg(objects, relationships, output_path)
+    else:
+        visualize_graph(objects, relationships, output_path)
+
+
+def save_relationship_scores(
+    path: str,
+    rel_probs: torch.Tensor,
+    obj_pairs: torch.Tensor,
+    top_k: Optional[int] = None,
+) -> None:
+    """
+    Store the top-k relationship scores of every object pair.
+
+    Scores are saved as float16 next to the predicate ids and the pairs, which
+    is enough to rebuild the relationship list for any confidence threshold.
+    """
+    if top_k is None:
+        top_k = CONFIG["relationships"]["stored_top_k"]
+
+    scores, labels = torch.topk(rel_probs, min(top_k, rel_probs.shape[1]), dim=1)
+    np.savez(
+        path,
+        scores=scores.cpu().numpy().astype(np.float16),
+        labels=labels.cpu().numpy().astype(np.int16),
+        pairs=obj_pairs.cpu().numpy().astype(np.int32),
+    )
+
+
+def load_relationship_scores(
+    path: str,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Load the stored scores ([P, K], best first), predicate ids and pairs."""
+    with np.load(path) as data:
+        rel_scores = torch.from_numpy(data["scores"].astype(np.float32))
+        rel_labels = torch.from_numpy(data["labels"].astype(np.int64))
+        obj_pairs = torch.from_numpy(data["pairs"].astype(np.int64))
+    return rel_scores, rel_labels, obj_pairs
+
+
+def symmetric_predicate_ids(vocabulary: Vocabulary) -> np.ndarray:
+    """Ids of the configured symmetric predicates present in the vocabulary."""
+    return np.array(
+        [
+            vocabulary.relationship2id[name]
+            for name in CONFIG["relationships"]["symmetric_predicates"]
+            if name in vocabulary.relationship2id
+        ],
+        dtype=np.int64,
+    )
+
+
+def filter_relationships(
+    objects: List[Dict[str, Any]],
+    rel_scores: torch.Tensor,
+    rel_labels: torch.Tensor,
+    obj_pairs: torch.Tensor,
+    confidence_threshold: float,
+    vocabulary: Vocabulary,
+    top_k: int = 1,
+    max_relationships: Optional[int] = None,
+    dedupe_symmetric: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Build the relationship list from per-pair predictions.
+
+    Everything up to the final list is done on whole arrays; relationships
+    are returned in pair order.
+
+    Args:
+        objects: Detected objects, indexed by the entries of obj_pairs
+        rel_scores: Relationship scores of each pair, best first ([P] or [P, K])
+        rel_labels: Predicate ids matching rel_scores
+        obj_pairs: [subject, object] indices of each pair
+        confidence_threshold: Minimum score of a kept relationship
+        vocabulary: Vocabulary for predicate names
+        top_k: Number of predicates kept per pair
+        max_relationships: Keep only this many highest scoring relationships
+        dedupe_symmetric: Keep one direction of symmetric predicates like "near"
+
+    Returns:
+        List of relationship dictionaries
+    """
+    scores = rel_scores.cpu().numpy()
+    labels = rel_labels.cpu().numpy()
+    if scores.ndim == 1:
+        scores = scores[:, None]
+        labels = labels[:, None]
+
+    # One candidate per pair and predicate, in pair order
+    k = min(top_k, scores.shape[1])
+    scores = scores[:, :k].reshape(-1)
+    labels = labels[:, :k].reshape(-1)
+    pairs = np.repeat(obj_pairs.cpu().numpy(), k, axis=0)
+
+    # Filter by confidence, dropping pairs that refer to unknown objects
+    keep = scores > confidence_threshold
+    keep &= ((pairs >= 0) & (pairs < len(objects))).all(axis=1)
+    candidates = np.flatnonzero(keep)
+
+    if dedupe_symmetric and len(candidates) > 0:
+        cand_labels = labels[candidates]
+        cand_pairs = np.sort(pairs[candidates], axis=1)
+        symmetric = np.isin(cand_labels, symmetric_predicate_ids(vocabulary))
+
+        # Both directions of a symmetric relationship share a key; the others
+        # get unique negative keys
+        num_objects = len(objects)
+        keys = np.where(
+            symmetric,
+            (cand_pairs[:, 0] * num_objects + cand_pairs[:, 1])
+            * len(vocabulary.relationship_names)
+            + cand_labels,
+            -1 - np.arange(len(candidates)),
+        )
+
+        # Visit candidates by decreasing score so the best direction is kept
+        by_score = np.argsort(-scores[candidates], kind="stable")
+        _, first = np.unique(keys[by_score], return_index=True)
+        candidates = np.sort(candidates[by_score[first]])
+
+    if max_relationships is not None and len(candidates) > max_relationships:
+        best = np.argsort(-scores[candidates], kind="stable")[:max_relationships]
+        candidates = np.sort(candidates[best])
+
+    # Create relationship list
+    object_labels = [obj["label"] for obj in objects]
+    subject_ids = pairs[candidates, 0].tolist()
+    object_ids = pairs[candidates, 1].tolist()
+    label_ids = labels[candidates].tolist()
+    predicates = vocabulary.get_relationship_names(label_ids)
+
+    return [
+        {
+            "subject_id": subject_id,
+            "object_id": object_id,
+            "predicate": predicate,
+            "predicate_id": label_id,
+            "score": score,
+            "subject": object_labels[subject_id],
+            "object": object_labels[object_id],
+        }
+        for subject_id, object_id, predicate, label_id, score in zip(
+            subject_ids, object_ids, predicates, label_ids, scores[candidates].tolist()
+        )
+    ]
+
+
 def process_image(
     image_path: str,
     model_path: str,
@@ -665,221 +2071,465 @@ def process_image(
     use_fixed_boxes: bool = False,
     output_dir: str = "outputs",
     base_filename: str = None,
+    models: Optional[SceneGraphModels] = None,
+    batcher: Optional["InferenceBatcher"] = None,
+    max_pairs: Optional[int] = None,
+    render: bool = True,
+    image_bytes: Optional[bytes] = None,
+    top_k: Optional[int] = None,
+    max_relationships: Optional[int] = None,
+    dedupe_symmetric: Optional[bool] = None,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
 ) -> Tuple[List, List, str, str]:
     """
     Process an image to generate a scene graph.
 
     Args:
-        image_path: Path to the input image
+        image_path: Path to the input image (may be None if image_bytes is given)
         model_path: Path to the model checkpoint
         vocabulary_path: Path to the vocabulary file
         confidence_threshold: Confidence threshold for relationships
         use_fixed_boxes: Whether to use fixed boxes or YOLO detection
         output_dir: Directory to save outputs
         base_filename: Optional base filename to use instead of the original image name
+        models: Preloaded models (loaded from model_path/vocabulary_path if not given)
+        batcher: Micro-batching scheduler to run the forward pass through
+        max_pairs: Number of most plausible object pairs to score
+            (defaults to CONFIG["relationships"]["max_pairs"])
+        render: Whether to save the visualizations; when False the returned
+            paths are where they can be rendered later
+        image_bytes: Encoded image to use instead of reading image_path
+        top_k, max_relationships, dedupe_symmetric: Relationship filtering
+            options (see filter_relationships; default to CONFIG["relationships"])
+        progress: Called with the name and details of every finished stage
+            ("decoded", "detected", "scored", "rendered")
 
     Returns:
         Tuple of (objects, relationships, annotated_image_path, graph_path)
     """
     # Check if files exist
-    if not os.path.exists(image_path):
+    if image_bytes is None and not os.path.exists(image_path):
         raise FileNotFoundError(f"Image not found at {image_path}")
 
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model not found at {model_path}")
-
-    if not os.path.exists(vocabulary_path):
-        raise FileNotFoundError(f"Vocabulary not found at {vocabulary_path}")
-
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
-    # Load vocabulary
-    vocabulary = Vocabulary.load(vocabulary_path)
-    logger.info(
-        f"Loaded vocabulary with {len(vocabulary.object2id)} objects and {len(vocabulary.relationship2id)} relationships"
-    )
-
-    # Set device
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    logger.info(f"Using device: {device}")
+    # Load models unless a preloaded bundle was given
+    if models is None:
+        models = load_models(model_path, vocabulary_path)
+    vocabulary = models.vocabulary
+    model = models.model
+    device = models.device
 
-    # Load and preprocess image
-    image = Image.open(image_path).convert("RGB")
-    img_width, img_height = image.size
+    # Decode the image once; detection, the model and rendering share it
+    if image_bytes is not None:
+        image = decode_image(image_bytes)
+    else:
+        image = Image.open(image_path).convert("RGB")
+    image_array = np.asarray(image)
+    if progress is not None:
+        progress("decoded", {"width": image.width, "height": image.height})
 
     # Use YOLO for object detection
     logger.info("Detecting objects with YOLO...")
-    boxes = detect_objects_yolo(image_path, vocabulary, device, use_fixed_boxes)
+    boxes, detector_scores = detect_objects_yolo(
+        image_array,
+        vocabulary,
+        device,
+        use_fixed_boxes,
+        yolo_model=models.yolo_model,
+        class_map=models.yolo_class_map,
+        return_scores=True,
+    )
     logger.info(f"Detected {len(boxes)} objects")
+    if progress is not None:
+        # The detector's objects, before the model refines labels and boxes
+        progress(
+            "detected",
+            {
+                "num_objects": len(boxes),
+                "objects": detected_objects(boxes, detector_scores, vocabulary),
+            },
+        )
 
     if len(boxes) == 0:
         raise ValueError("No objects detected. Cannot generate scene graph.")
 
-    # Create encoder
-    encoder = VisualFeatureEncoder(backbone_name=CONFIG["model"]["backbone"])
+    # Preprocess image for scene graph model
+    img_tensor = preprocess_image(image).unsqueeze(0).to(device)
 
-    # Create model
-    model = SceneGraphGenerationModel(
-        backbone=encoder,
-        num_obj_classes=len(vocabulary.object2id),
-        num_rel_classes=len(vocabulary.relationship2id),
-        num_attr_classes=len(vocabulary.attribute2id),
-        embedding_dim=CONFIG["model"]["embedding_dim"],
-        hidden_dim=CONFIG["model"]["hidden_dim"],
-    )
+    if max_pairs is None:
+        max_pairs = CONFIG["relationships"]["max_pairs"]
 
-    # Load model weights
-    logger.info(f"Loading model from {model_path}...")
-    checkpoint = torch.load(model_path, map_location=device)
-    if "model_state_dict" in checkpoint:
-        model.load_state_dict(checkpoint["model_state_dict"])
-        logger.info("Loaded model state dict from checkpoint")
+    # Run inference for scene graph generation
+    logger.info("Generating scene graph...")
+    with torch.no_grad():
+        # Forward pass - batched with concurrent requests when a batcher is given
+        if batcher is not None:
+            outputs = batcher.infer(img_tensor, boxes, max_pairs)
+        else:
+            outputs = model(
+                img_tensor, [boxes], max_pairs=max_pairs, heads=models.heads
+            )
+
+    # Determine base filename for output files
+    if base_filename:
+        # Use provided base filename if specified
+        file_prefix = base_filename
+    elif image_path:
+        # Otherwise use the original image name
+        file_prefix = os.path.splitext(os.path.basename(image_path))[0]
     else:
-        model.load_state_dict(checkpoint)
-        logger.info("Loaded direct model state from checkpoint")
+        file_prefix = "image"
+
+    return finish_scene_graph(
+        outputs,
+        boxes,
+        detector_scores,
+        image_array,
+        vocabulary,
+        confidence_threshold,
+        output_dir,
+        file_prefix,
+        render=render,
+        top_k=top_k,
+        max_relationships=max_relationships,
+        dedupe_symmetric=dedupe_symmetric,
+        progress=progress,
+    )
 
-    model.to(device)
-    model.eval()
 
-    # Preprocess image for scene graph model
-    transform = T.Compose(
-        [
-            T.Resize((CONFIG["img_size"], CONFIG["img_size"])),
-            T.ToTensor(),
-            T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ]
-    )
-    img_tensor = transform(image).unsqueeze(0).to(device)
+def detected_objects(
+    boxes: torch.Tensor, detector_scores: torch.Tensor, vocabulary: Vocabulary
+) -> List[Dict[str, Any]]:
+    """Object list of the detector's boxes alone, in the format of build_objects."""
+    label_ids = boxes[:, 4].long().cpu().numpy()
+    labels = vocabulary.get_object_names(label_ids)
+    scores = detector_scores.cpu().tolist()
+    bboxes = boxes[:, :4].cpu().tolist()
+    return [
+        {
+            "label": labels[i],
+            "label_id": int(label_ids[i]),
+            "score": float(scores[i]),
+            "bbox": bboxes[i],
+        }
+        for i in range(len(label_ids))
+    ]
 
-    # Run inference for scene graph generation
-    logger.info("Generating scene graph...")
-    with torch.no_grad():
-        # Forward pass
-        outputs = model(img_tensor, [boxes])
 
-        # Process predictions
-        obj_logits = outputs["obj_logits"][0]
+def build_objects(
+    outputs: Dict[str, List[Any]],
+    boxes: torch.Tensor,
+    detector_scores: torch.Tensor,
+    vocabulary: Vocabulary,
+) -> List[Dict[str, Any]]:
+    """Object list of one image from its model outputs (see finish_scene_graph)."""
+    # Process predictions; without the object head the detector's labels
+    # and confidences are used
+    obj_logits = outputs["obj_logits"][0]
+    if obj_logits is not None:
         obj_probs = torch.softmax(obj_logits, dim=1)
         obj_scores, obj_labels = torch.max(obj_probs, dim=1)
+    else:
+        obj_scores, obj_labels = detector_scores, boxes[:, 4].long()
+
+    # Get bounding box predictions (the detector's boxes without the head)
+    bbox_pred = outputs["bbox_pred"][0]
+    if bbox_pred is None:
+        bbox_pred = boxes[:, :4]
+
+    # Create object list, looking up all names at once
+    label_ids = obj_labels.cpu().numpy()
+    labels = vocabulary.get_object_names(label_ids)
+    scores = obj_scores.cpu().tolist()
+    bboxes = bbox_pred.cpu().tolist()
+
+    objects = []
+    for i in range(len(label_ids)):
+        objects.append(
+            {
+                "label": labels[i],
+                "label_id": int(label_ids[i]),
+                "score": scores[i],
+                "bbox": bboxes[i],
+            }
+        )
 
-        # Get bounding box predictions
-        bbox_pred = outputs["bbox_pred"][0]
+    # Top attributes of every object, scored independently of each other
+    attr_logits = outputs["attr_logits"][0]
+    if attr_logits is not None:
+        attr_k = min(CONFIG["heads"]["attribute_top_k"], attr_logits.shape[1])
+        attr_scores, attr_ids = torch.topk(torch.sigmoid(attr_logits), attr_k)
+        attr_ids = attr_ids.cpu().numpy()
+        attr_names = vocabulary.get_attribute_names(attr_ids)
+        attr_scores = attr_scores.cpu().tolist()
+        for i, obj in enumerate(objects):
+            obj["attributes"] = [
+                {"label": name, "label_id": int(attr_id), "score": score}
+                for name, attr_id, score in zip(
+                    attr_names[i], attr_ids[i], attr_scores[i]
+                )
+            ]
 
-        # Create object list
-        objects = []
-        for i in range(len(obj_labels)):
-            bbox = bbox_pred[i].cpu().numpy().tolist()
-            label_id = obj_labels[i].item()
-            score = obj_scores[i].item()
+    return objects
 
-            objects.append(
-                {
-                    "label": vocabulary.get_object_name(label_id),
-                    "label_id": label_id,
-                    "score": score,
-                    "bbox": bbox,
-                }
-            )
 
-        # Process relationships
-        relationships = []
-        if "rel_logits" in outputs and outputs["rel_logits"]:
-            rel_logits = outputs["rel_logits"][0]
-            obj_pairs = outputs["obj_pairs"][0]
-
-            if rel_logits is not None and len(rel_logits) > 0:
-                rel_probs = torch.softmax(rel_logits, dim=1)
-                rel_scores, rel_labels = torch.max(rel_probs, dim=1)
-
-                # Filter by confidence
-                rel_mask = rel_scores > confidence_threshold
-                rel_labels = rel_labels[rel_mask]
-                rel_scores = rel_scores[rel_mask]
-                filtered_pairs = obj_pairs[rel_mask]
-
-                # Create relationship list
-                for i in range(len(rel_labels)):
-                    subj_idx = filtered_pairs[i, 0].item()
-                    obj_idx = filtered_pairs[i, 1].item()
-                    label_id = rel_labels[i].item()
-                    score = rel_scores[i].item()
-
-                    # Map to filtered object indices
-                    subj_new_idx = -1
-                    obj_new_idx = -1
-
-                    for j, obj in enumerate(objects):
-                        if j == subj_idx:
-                            subj_new_idx = j
-                        if j == obj_idx:
-                            obj_new_idx = j
-
-                    if subj_new_idx != -1 and obj_new_idx != -1:
-                        relationships.append(
-                            {
-                                "subject_id": subj_new_idx,
-                                "object_id": obj_new_idx,
-                                "predicate": vocabulary.get_relationship_name(label_id),
-                                "predicate_id": label_id,
-                                "score": score,
-                                "subject": objects[subj_new_idx]["label"],
-                                "object": objects[obj_new_idx]["label"],
-                            }
-                        )
+def finish_scene_graph(
+    outputs: Dict[str, List[Any]],
+    boxes: torch.Tensor,
+    detector_scores: torch.Tensor,
+    image_array: np.ndarray,
+    vocabulary: Vocabulary,
+    confidence_threshold: float,
+    output_dir: str,
+    file_prefix: str,
+    render: bool = True,
+    top_k: Optional[int] = None,
+    max_relationships: Optional[int] = None,
+    dedupe_symmetric: Optional[bool] = None,
+    save_scores: bool = True,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Tuple[List, List, str, str]:
+    """
+    Turn the model outputs of one image into its scene graph and output files.
 
-    # Determine base filename for output files
-    if base_filename:
-        # Use provided base filename if specified
-        file_prefix = base_filename
-    else:
-        # Otherwise use the original image name
-        file_prefix = os.path.splitext(os.path.basename(image_path))[0]
+    Args:
+        outputs: Model outputs for this image alone (lists of length one)
+        boxes: The image's detected boxes, [x_c, y_c, w, h, class_id]
+        detector_scores: Detection confidences of the boxes
+        image_array: Decoded RGB image, for rendering
+        file_prefix: Base filename of the output files in output_dir
+        save_scores: Store the per-pair relationship scores for re-filtering
+        Other arguments: See process_image
+
+    Returns:
+        Tuple of (objects, relationships, annotated_image_path, graph_path)
+    """
+    if top_k is None:
+        top_k = CONFIG["relationships"]["top_k"]
+    if max_relationships is None:
+        max_relationships = CONFIG["relationships"]["max_relationships"]
+    if dedupe_symmetric is None:
+        dedupe_symmetric = CONFIG["relationships"]["dedupe_symmetric"]
+
+    objects = build_objects(outputs, boxes, detector_scores, vocabulary)
 
     # Generate output filenames with consistent naming pattern
     annotated_image_path = os.path.join(output_dir, f"{file_prefix}_annotated.png")
-    graph_path = os.path.join(output_dir, f"{file_prefix}_graph.png")
+    graph_path = os.path.join(output_dir, graph_filename(file_prefix))
+
+    # Process relationships
+    relationships = []
+    num_pairs = 0
+    if "rel_logits" in outputs and outputs["rel_logits"]:
+        rel_logits = outputs["rel_logits"][0]
+        obj_pairs = outputs["obj_pairs"][0]
+        num_pairs = len(obj_pairs) if obj_pairs is not None else 0
+
+        if rel_logits is not None and len(rel_logits) > 0:
+            rel_probs = torch.softmax(rel_logits, dim=1)
+
+            # Keep the scores of every pair so the threshold can change later
+            if save_scores:
+                save_relationship_scores(
+                    os.path.join(output_dir, f"{file_prefix}_rel_scores.npz"),
+                    rel_probs,
+                    obj_pairs,
+                )
 
-    # Log the paths for debugging
-    logger.info(f"Using file prefix: {file_prefix}")
-    logger.info(f"Saving annotated image to: {annotated_image_path}")
-    logger.info(f"Saving graph to: {graph_path}")
+            rel_scores, rel_labels = torch.topk(
+                rel_probs, min(top_k, rel_probs.shape[1]), dim=1
+            )
+            relationships = filter_relationships(
+                objects,
+                rel_scores,
+                rel_labels,
+                obj_pairs,
+                confidence_threshold,
+                vocabulary,
+                top_k=top_k,
+                max_relationships=max_relationships,
+                dedupe_symmetric=dedupe_symmetric,
+            )
 
-    # Save visualizations
-    visualize_image_with_boxes(np.array(image), objects, annotated_image_path)
-    visualize_graph(objects, relationships, graph_path)
+    if progress is not None:
+        progress(
+            "scored",
+            {"num_pairs": num_pairs, "num_relationships": len(relationships)},
+        )
 
-    logger.info(f"Visualization complete. Files saved to:")
-    logger.info(f"  - {annotated_image_path}")
-    logger.info(f"  - {graph_path}")
+    if render:
+        # Log the paths for debugging
+        logger.info(f"Using file prefix: {file_prefix}")
+        logger.info(f"Saving annotated image to: {annotated_image_path}")
+        logger.info(f"Saving graph to: {graph_path}")
+
+        # Save visualizations
+        annotate_image(image_array, objects, annotated_image_path)
+        save_graph(objects, relationships, graph_path)
+
+        logger.info(f"Visualization complete. Files saved to:")
+        logger.info(f"  - {annotated_image_path}")
+        logger.info(f"  - {graph_path}")
+        if progress is not None:
+            progress(
+                "rendered",
+                {
+                    "annotated_image": os.path.basename(annotated_image_path),
+                    "graph": os.path.basename(graph_path),
+                },
+            )
 
     # Convert objects for JSON serialization
     serializable_objects = []
     for obj in objects:
-        serializable_objects.append(
-            {
-                "label": obj["label"],
-                "label_id": int(obj["label_id"]),
-                "score": float(obj["score"]),
-                "bbox": [float(val) for val in obj["bbox"]],
-            }
-        )
+        serializable_obj = {
+            "label": obj["label"],
+            "label_id": int(obj["label_id"]),
+            "score": float(obj["score"]),
+            "bbox": [float(val) for val in obj["bbox"]],
+        }
+        if "attributes" in obj:
+            serializable_obj["attributes"] = obj["attributes"]
+        serializable_objects.append(serializable_obj)
 
     return serializable_objects, relationships, annotated_image_path, graph_path
 
 
-if __name__ == "__main__":
-    # This can be used for testing the service directly
-    image_path = "test.jpg"
-    model_path = "app/models/model.pth"
-    vocabulary_path = "app/models/vocabulary.json"
+def process_images(
+    images: List[bytes],
+    output_dirs: List[str],
+    base_filenames: List[str],
+    models: SceneGraphModels,
+    confidence_threshold: float = 0.5,
+    max_pairs: Optional[int] = None,
+    render: bool = True,
+    top_k: Optional[int] = None,
+    max_relationships: Optional[int] = None,
+    dedupe_symmetric: Optional[bool] = None,
+) -> List[Union[Tuple[List, List, str, str], Exception]]:
+    """
+    Generate scene graphs for several images at once.
 
-    objects, relationships, annotated_path, graph_path = process_image(
-        image_path=image_path,
-        model_path=model_path,
-        vocabulary_path=vocabulary_path,
-        confidence_threshold=0.3,
-        output_dir="outputs",
+    YOLO runs on all images in one call and the scene graph model in one
+    forward pass over all images with detected objects. Every image is
+    resized to the same input size, so the batch needs no padding; their
+    boxes and pairs are packed as in SceneGraphGenerationModel.forward.
+
+    Args:
+        images: Encoded images
+        output_dirs: Output directory of each image
+        base_filenames: Base filename of each image's output files
+        models: Loaded models
+        Other arguments: See process_image
+
+    Returns:
+        One result per image, as returned by process_image, or the exception
+        that image failed with (undecodable, no objects detected, ...)
+    """
+    results: List[Any] = [None] * len(images)
+
+    # Decode every image once; images that cannot be decoded fail on their own
+    decoded = []
+    for i, image_bytes in enumerate(images):
+        try:
+            decoded.append((i, decode_image(image_bytes)))
+        except Exception as e:
+            results[i] = e
+
+    predictions = run_batch_inference(
+        [image for _, image in decoded], models, max_pairs=max_pairs
     )
 
-    print(f"Processed {len(objects)} objects and {len(relationships)} relationships")
+    for (i, _), prediction in zip(decoded, predictions):
+        if isinstance(prediction, Exception):
+            results[i] = prediction
+            continue
+        try:
+            os.makedirs(output_dirs[i], exist_ok=True)
+            results[i] = finish_scene_graph(
+                *prediction,
+                models.vocabulary,
+                confidence_threshold,
+                output_dirs[i],
+                base_filenames[i],
+                render=render,
+                top_k=top_k,
+                max_relationships=max_relationships,
+                dedupe_symmetric=dedupe_symmetric,
+            )
+        except Exception as e:
+            results[i] = e
+
+    return results
+
+
+def run_batch_inference(
+    images: List[Image.Image],
+    models: SceneGraphModels,
+    max_pairs: Optional[int] = None,
+    img_tensors: Optional[List[torch.Tensor]] = None,
+) -> List[Union[Tuple, Exception]]:
+    """
+    Detect objects and run the scene graph model on a batch of decoded images.
+
+    Args:
+        images: Decoded RGB images
+        models: Loaded models
+        max_pairs: See process_image
+        img_tensors: The images already preprocessed with preprocess_image
+            (preprocessed here if not given)
+
+    Returns:
+        For every image, the arguments finish_scene_graph takes before the
+        vocabulary: (outputs, boxes, detector_scores, image_array); or a
+        ValueError if no objects were detected in it
+    """
+    image_arrays = [np.asarray(image) for image in images]
+    detections = detect_objects_yolo_batch(
+        image_arrays, models.yolo_model, models.yolo_class_map, models.device
+    )
+
+    results: List[Any] = [None] * len(images)
+    batch = []
+    for i, (boxes, _) in enumerate(detections):
+        if len(boxes) == 0:
+            results[i] = ValueError("No objects detected. Cannot generate scene graph.")
+        else:
+            batch.append(i)
+    logger.info(f"Detected objects in {len(batch)} of {len(images)} images")
+
+    if not batch:
+        return results
+
+    if max_pairs is None:
+        max_pairs = CONFIG["relationships"]["max_pairs"]
+    if img_tensors is None:
+        img_tensors = [preprocess_image(image) for image in images]
+
+    # One forward pass for all images with objects
+    with torch.no_grad():
+        outputs = models.model(
+            torch.stack([img_tensors[i] for i in batch]).to(models.device),
+            [detections[i][0] for i in batch],
+            max_pairs=max_pairs,
+            heads=models.heads,
+        )
+
+    for j, i in enumerate(batch):
+        boxes, detector_scores = detections[i]
+        image_outputs = {key: [value[j]] for key, value in outputs.items()}
+        results[i] = (image_outputs, boxes, detector_scores, image_arrays[i])
+    return results
+
+
+# Seconds spent importing this module and its dependencies
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+
+if __name__ == "__main__":
+    # Process a directory or manifest of images (see app.process_dataset)
+    from app.process_dataset import main
+
+    main()
@@ -0,0 +1,231 @@
+"""
+Serve the API from several worker processes that share one copy of the models.
+
+The models are loaded once in this parent process, which then forks the web
+workers. Weight tensors are never written during inference, so their pages
+stay shared between all workers (copy-on-write) instead of every worker
+holding its own ResNet-50 and object embedding. Each worker is pinned to its
+own slice of the CPU cores and runs that many torch threads, so the workers
+do not oversubscribe the machine.
+
+Usage (from the backend directory):
+    python -m app.serve --workers 4 --port 8000
+
+Workers that exit unexpectedly are forked again from the parent, which still
+holds the loaded models. GET /api/metrics reports the memory of every worker.
+Hot reloads are rejected, since they would only reach one worker; restart
+the launcher to serve a new checkpoint.
+"""
+
+import os
+import time
+import signal
+import socket
+import argparse
+import logging
+from typing import Any, Dict, List, Optional
+
+import psutil
+import torch
+
+from app.scene_graph_service import CONFIG
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Environment variable with the pid of the parent that forked the workers
+LAUNCHER_PID_ENV = "SGG_LAUNCHER_PID"
+
+
+def split_cores(num_workers: int) -> List[List[int]]:
+    """Split the cores available to this process into one slice per worker."""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+
+    # Workers share cores round-robin when there are more workers than cores
+    if num_workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(num_workers)]
+
+    size, extra = divmod(len(cores), num_workers)
+    slices = []
+    start = 0
+    for i in range(num_workers):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+def apply_thread_budget(cores: List[int], num_threads: Optional[int] = None) -> int:
+    """Pin the current process to cores and size the torch thread pools to match."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    if num_threads is None:
+        num_threads = len(cores)
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first inter-op parallel work
+        pass
+
+    # Exported ONNX Runtime graphs get the same budget unless configured
+    if CONFIG["runtime"]["num_threads"] is None:
+        CONFIG["runtime"]["num_threads"] = num_threads
+    return num_threads
+
+
+def node_memory_report() -> Dict[str, Any]:
+    """
+    Resident memory of the launcher and each of its workers, in MB.
+
+    rss counts shared pages in every process that maps them, pss splits them
+    between those processes and uss is the memory only that process holds, so
+    the sum of pss is what the node really uses.
+    """
+    launcher_pid = os.environ.get(LAUNCHER_PID_ENV)
+    launcher_pid = int(launcher_pid) if launcher_pid else None
+    if launcher_pid is not None:
+        parent = psutil.Process(launcher_pid)
+        processes = [parent] + parent.children()
+    else:
+        processes = [psutil.Process()]
+
+    report = []
+    for process in processes:
+        try:
+            memory = process.memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        entry = {
+            "pid": process.pid,
+            "role": "launcher" if process.pid == launcher_pid else "worker",
+            "rss_mb": memory.rss / 1024 / 1024,
+            "uss_mb": memory.uss / 1024 / 1024,
+        }
+        # Proportional set size is only reported on Linux
+        if hasattr(memory, "pss"):
+            entry["pss_mb"] = memory.pss / 1024 / 1024
+        report.append(entry)
+
+    totals = {
+        key: sum(entry[key] for entry in report)
+        for key in ("rss_mb", "uss_mb", "pss_mb")
+        if all(key in entry for entry in report)
+    }
+    return {"processes": report, "total": totals}
+
+
+def run_worker(
+    sock: socket.socket, cores: List[int], num_threads: Optional[int], args
+) -> None:
+    """Run one uvicorn server on the shared socket in a forked worker."""
+    import uvicorn
+
+    from app.main import app
+
+    num_threads = apply_thread_budget(cores, num_threads)
+    logger.info(
+        f"Worker {os.getpid()} serving on cores {cores} with {num_threads} threads"
+    )
+
+    config = uvicorn.Config(app, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(args) -> None:
+    # Importing the app here means workers start with everything imported
+    from app.main import MODEL_PATH, VOCABULARY_PATH
+    from app.model_registry import registry
+
+    # Load once; warm-up, thread pools and the batcher start in each worker
+    registry.preload(MODEL_PATH, VOCABULARY_PATH)
+    launcher_pid = os.getpid()
+    os.environ[LAUNCHER_PID_ENV] = str(launcher_pid)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    core_slices = split_cores(args.workers)
+    workers: Dict[int, int] = {}  # pid -> worker index
+    stopping = False
+
+    def fork_worker(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # Let uvicorn install its own handlers for graceful shutdown
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 1
+            try:
+                run_worker(sock, core_slices[index], args.threads, args)
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+        workers[pid] = index
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(args.workers):
+        fork_worker(index)
+    logger.info(
+        f"Serving on {args.host}:{args.port} with {args.workers} workers "
+        f"(launcher {launcher_pid})"
+    )
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning(f"Worker {pid} exited with status {status}, starting a new one")
+        time.sleep(1)  # Avoid a tight loop when workers crash on startup
+        fork_worker(index)
+
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the API from workers sharing one copy of the models"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=CONFIG["serving"]["processes"])
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=CONFIG["serving"]["threads_per_process"],
+        help="Torch threads per worker (default: one per core of its slice)",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    serve(args)
+
+
+if __name__ == "__main__":
+    main()
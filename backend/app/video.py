@@ -0,0 +1,471 @@
+"""
+Generate a stream of scene graphs from a video file or a sequence of frames.
+
+Frames are sampled at --fps. YOLO runs on every sampled frame and its boxes
+are matched to the previous frame's by IoU, so objects keep a track id. The
+full model (ResNet backbone and object heads) only runs on keyframes: the
+first frame, frames where the scene changed, frames with new objects and at
+least every max_keyframe_interval frames. In between, objects keep the
+labels and attributes predicted for their track, and relationships are
+carried forward for pairs whose boxes have barely moved; only the other
+pairs are scored again.
+
+Usage (from the backend directory):
+    python -m app.video input.mp4 --output graphs.jsonl --fps 5
+    python -m app.video frames_dir/ --source-fps 30 --fps 10
+
+Every sampled frame becomes one JSON line with its objects (with track ids)
+and relationships. Throughput is logged in frames per second.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.scene_graph_service import (
+    CONFIG,
+    IMAGE_EXTENSIONS,
+    ExportedSceneGraphModel,
+    SceneGraphGenerationModel,
+    SceneGraphModels,
+    build_objects,
+    detect_objects_yolo_batch,
+    filter_relationships,
+    load_models,
+    preprocess_image,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def iter_frames(
+    source: str, sample_fps: float, source_fps: Optional[float] = None
+) -> Iterator[Tuple[int, float, Image.Image]]:
+    """
+    Sampled frames of a video file or a directory of frame images.
+
+    Yields (frame index, timestamp in seconds, RGB image). Frames that are
+    skipped are not decoded.
+    """
+    if os.path.isdir(source):
+        names = sorted(
+            name
+            for name in os.listdir(source)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        source_fps = source_fps or 30.0
+        step = max(1, round(source_fps / sample_fps))
+        for index in range(0, len(names), step):
+            image = Image.open(os.path.join(source, names[index])).convert("RGB")
+            yield index, index / source_fps, image
+        return
+
+    # Only needed for video files
+    import cv2
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Could not open video {source}")
+    source_fps = source_fps or capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, round(source_fps / sample_fps))
+    try:
+        index = 0
+        while capture.grab():
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                yield index, index / source_fps, image
+            index += 1
+    finally:
+        capture.release()
+
+
+def box_iou(boxes_a: torch.Tensor, boxes_b: torch.Tensor) -> torch.Tensor:
+    """[A, B] IoU matrix of normalized [x_c, y_c, w, h, ...] boxes."""
+    a = boxes_a[:, None, :4]
+    b = boxes_b[None, :, :4]
+    ix1 = torch.max(a[..., 0] - a[..., 2] / 2, b[..., 0] - b[..., 2] / 2)
+    iy1 = torch.max(a[..., 1] - a[..., 3] / 2, b[..., 1] - b[..., 3] / 2)
+    ix2 = torch.min(a[..., 0] + a[..., 2] / 2, b[..., 0] + b[..., 2] / 2)
+    iy2 = torch.min(a[..., 1] + a[..., 3] / 2, b[..., 1] + b[..., 3] / 2)
+    inter = (ix2 - ix1).clamp(min=0) * (iy2 - iy1).clamp(min=0)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return inter / union.clamp(min=1e-6)
+
+
+def match_tracks(
+    prev_boxes: torch.Tensor,
+    prev_ids: np.ndarray,
+    boxes: torch.Tensor,
+    min_iou: float,
+) -> np.ndarray:
+    """
+    Track id of every box, greedily matched by IoU to same-class previous boxes.
+
+    Returns:
+        [num_boxes] track ids, -1 for boxes that start a new track
+    """
+    track_ids = np.full(len(boxes), -1, dtype=np.int64)
+    if len(prev_boxes) == 0 or len(boxes) == 0:
+        return track_ids
+
+    iou = box_iou(prev_boxes, boxes)
+    iou[prev_boxes[:, None, 4] != boxes[None, :, 4]] = 0
+    iou = iou.cpu().numpy()
+
+    # Best matches first; every previous and current box is used at most once
+    prev_used = np.zeros(len(prev_boxes), dtype=bool)
+    for flat in np.argsort(-iou, axis=None):
+        prev_idx, idx = divmod(int(flat), len(boxes))
+        if iou[prev_idx, idx] < min_iou:
+            break
+        if prev_used[prev_idx] or track_ids[idx] >= 0:
+            continue
+        prev_used[prev_idx] = True
+        track_ids[idx] = prev_ids[prev_idx]
+    return track_ids
+
+
+def scene_thumbnail(image: Image.Image) -> np.ndarray:
+    """Small grayscale copy of a frame to measure scene changes with."""
+    thumbnail = image.convert("L").resize((32, 32), Image.BILINEAR)
+    return np.asarray(thumbnail, dtype=np.float32) / 255
+
+
+class VideoSceneGraphGenerator:
+    """
+    Scene graphs of consecutive frames, reusing work between similar frames.
+
+    Call process_frame with the sampled frames in order; state carried between
+    calls (tracks, per-track objects and per-pair relationship scores) is
+    reset on every keyframe.
+    """
+
+    def __init__(
+        self,
+        models: SceneGraphModels,
+        confidence_threshold: float = 0.5,
+        max_pairs: Optional[int] = None,
+        top_k: Optional[int] = None,
+        max_relationships: Optional[int] = None,
+        dedupe_symmetric: Optional[bool] = None,
+    ):
+        self.models = models
+        self.confidence_threshold = confidence_threshold
+        relationships = CONFIG["relationships"]
+        self.max_pairs = (
+            max_pairs if max_pairs is not None else relationships["max_pairs"]
+        )
+        self.top_k = top_k if top_k is not None else relationships["top_k"]
+        self.max_relationships = (
+            max_relationships
+            if max_relationships is not None
+            else relationships["max_relationships"]
+        )
+        self.dedupe_symmetric = (
+            dedupe_symmetric
+            if dedupe_symmetric is not None
+            else relationships["dedupe_symmetric"]
+        )
+        self.options = CONFIG["video"]
+
+        # Boxes and track ids of the previous frame
+        self.prev_boxes = torch.zeros(0, 5, device=models.device)
+        self.prev_ids = np.zeros(0, dtype=np.int64)
+        self.next_track_id = 0
+
+        # Predictions of the last keyframe, by track id
+        self.track_objects: Dict[int, Dict[str, Any]] = {}
+        # Stored relationship scores, labels and boxes of (subject, object) tracks
+        self.pair_scores: Dict[Tuple[int, int], Tuple[np.ndarray, ...]] = {}
+        self.keyframe_thumbnail: Optional[np.ndarray] = None
+        self.frames_since_keyframe = 0
+
+        # Statistics
+        self.frames = 0
+        self.keyframes = 0
+        self.pairs_reused = 0
+        self.pairs_scored = 0
+
+    def process_frame(self, image: Image.Image) -> Dict[str, Any]:
+        """Scene graph of the next frame: objects with track ids and relationships."""
+        models = self.models
+        self.frames += 1
+
+        boxes, detector_scores = detect_objects_yolo_batch(
+            [np.asarray(image)], models.yolo_model, models.yolo_class_map, models.device
+        )[0]
+        track_ids = match_tracks(
+            self.prev_boxes, self.prev_ids, boxes, self.options["match_iou"]
+        )
+        new_tracks = track_ids < 0
+        track_ids[new_tracks] = self.next_track_id + np.arange(new_tracks.sum())
+        self.next_track_id += int(new_tracks.sum())
+        self.prev_boxes, self.prev_ids = boxes, track_ids
+
+        thumbnail = scene_thumbnail(image)
+        keyframe = (
+            self.keyframe_thumbnail is None
+            or bool(new_tracks.any())
+            or self.frames_since_keyframe + 1 >= self.options["max_keyframe_interval"]
+            or np.abs(thumbnail - self.keyframe_thumbnail).mean()
+            > self.options["scene_change"]
+        )
+
+        if len(boxes) == 0:
+            return {"keyframe": keyframe, "objects": [], "relationships": []}
+
+        img_tensor = None
+        if keyframe:
+            img_tensor = preprocess_image(image).unsqueeze(0).to(models.device)
+            self.keyframes += 1
+            self.keyframe_thumbnail = thumbnail
+            self.frames_since_keyframe = 0
+
+            with torch.no_grad():
+                outputs = models.model(
+                    img_tensor, [boxes], max_pairs=self.max_pairs, heads=models.heads
+                )
+            objects = build_objects(outputs, boxes, detector_scores, models.vocabulary)
+            self._remember_objects(objects, boxes, track_ids)
+
+            self.pair_scores.clear()
+            rel_logits = outputs["rel_logits"][0]
+            if rel_logits is not None:
+                self._remember_pairs(
+                    outputs["obj_pairs"][0],
+                    torch.softmax(rel_logits, dim=1),
+                    boxes,
+                    track_ids,
+                )
+        else:
+            self.frames_since_keyframe += 1
+            objects = self._tracked_objects(boxes, track_ids)
+
+        relationships = []
+        if "relationships" in models.heads and len(boxes) > 1:
+            relationships = self._relationships(
+                objects, image, img_tensor, boxes, track_ids
+            )
+
+        for obj, track_id in zip(objects, track_ids.tolist()):
+            obj["track_id"] = track_id
+        return {
+            "keyframe": keyframe,
+            "objects": objects,
+            "relationships": relationships,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        scored = self.pairs_reused + self.pairs_scored
+        return {
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "pairs_reused": self.pairs_reused,
+            "pairs_scored": self.pairs_scored,
+            "reuse_ratio": self.pairs_reused / scored if scored else 0.0,
+        }
+
+    def _remember_objects(
+        self, objects: List[Dict[str, Any]], boxes: torch.Tensor, track_ids: np.ndarray
+    ) -> None:
+        """Keep the keyframe predictions of every track."""
+        offsets = (
+            np.array([obj["bbox"] for obj in objects]) - boxes[:, :4].cpu().numpy()
+        )
+        self.track_objects = {
+            track_id: {**obj, "bbox_offset": offset}
+            for track_id, obj, offset in zip(track_ids.tolist(), objects, offsets)
+        }
+
+    def _tracked_objects(
+        self, boxes: torch.Tensor, track_ids: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """Objects of a frame between keyframes from the predictions of their tracks."""
+        objects = []
+        for box, track_id in zip(boxes[:, :4].cpu().numpy(), track_ids.tolist()):
+            tracked = self.track_objects[track_id]
+            obj = {key: value for key, value in tracked.items() if key != "bbox_offset"}
+            # Follow the detector box, keeping the keyframe's refinement
+            obj["bbox"] = (box + tracked["bbox_offset"]).tolist()
+            objects.append(obj)
+        return objects
+
+    def _remember_pairs(
+        self,
+        pairs: torch.Tensor,
+        rel_probs: torch.Tensor,
+        boxes: torch.Tensor,
+        track_ids: np.ndarray,
+    ) -> None:
+        """Store the top relationship scores of pairs with the boxes they were scored at."""
+        k = min(CONFIG["relationships"]["stored_top_k"], rel_probs.shape[1])
+        scores, labels = torch.topk(rel_probs, k, dim=1)
+        pairs = pairs.cpu().numpy()
+        pair_boxes = boxes[:, :4].cpu().numpy()[pairs]
+        keys = track_ids[pairs].tolist()
+        for i, (subj_track, obj_track) in enumerate(keys):
+            self.pair_scores[(subj_track, obj_track)] = (
+                scores[i].cpu().numpy(),
+                labels[i].cpu().numpy(),
+                pair_boxes[i],
+            )
+
+    def _relationship_images(self, image: Image.Image) -> torch.Tensor:
+        """Image input of a relationships-only pass between keyframes."""
+        model = self.models.model
+        # Only exported graphs that contain the backbone read the images; the
+        # eager model skips the backbone when just the relationships run
+        if isinstance(model, ExportedSceneGraphModel) and (
+            model.backend == "torchscript" or "images" in model.input_names
+        ):
+            return preprocess_image(image).unsqueeze(0).to(self.models.device)
+        return torch.empty(0, device=self.models.device)
+
+    def _relationships(
+        self,
+        objects: List[Dict[str, Any]],
+        image: Image.Image,
+        img_tensor: Optional[torch.Tensor],
+        boxes: torch.Tensor,
+        track_ids: np.ndarray,
+    ) -> List[Dict[str, Any]]:
+        """
+        Relationships of the frame, rescoring only pairs whose boxes moved.
+
+        img_tensor is the preprocessed frame on keyframes and None otherwise.
+        """
+        device = boxes.device
+        counts = [len(boxes)]
+        pairs, _ = SceneGraphGenerationModel.build_pairs(counts, device)
+        pairs, _, _ = SceneGraphGenerationModel.prune_pairs(
+            boxes, pairs, pairs, counts, [self.max_pairs]
+        )
+
+        pairs_np = pairs.cpu().numpy()
+        pair_boxes = boxes[:, :4].cpu().numpy()[pairs_np]
+        keys = track_ids[pairs_np].tolist()
+
+        # Reuse scores of pairs whose boxes both moved less than the threshold
+        stale = []
+        for i, key in enumerate(keys):
+            stored = self.pair_scores.get(tuple(key))
+            if stored is None or (
+                np.abs(pair_boxes[i] - stored[2]).max()
+                > self.options["motion_threshold"]
+            ):
+                stale.append(i)
+        if img_tensor is not None:
+            # The full keyframe pass already scored every pair
+            self.pairs_scored += len(keys)
+        else:
+            self.pairs_reused += len(keys) - len(stale)
+            self.pairs_scored += len(stale)
+
+        if stale:
+            if img_tensor is None:
+                img_tensor = self._relationship_images(image)
+            stale_pairs = pairs[stale]
+            batch_idx = torch.zeros(len(boxes), dtype=torch.long, device=device)
+            with torch.no_grad():
+                *_, rel_logits = self.models.model.forward_packed(
+                    img_tensor, boxes, batch_idx, stale_pairs, heads=("relationships",)
+                )
+            self._remember_pairs(
+                stale_pairs, torch.softmax(rel_logits, dim=1), boxes, track_ids
+            )
+
+        stored = [self.pair_scores[tuple(key)] for key in keys]
+        if not stored:
+            return []
+        rel_scores = torch.from_numpy(np.stack([scores for scores, _, _ in stored]))
+        rel_labels = torch.from_numpy(np.stack([labels for _, labels, _ in stored]))
+        return filter_relationships(
+            objects,
+            rel_scores,
+            rel_labels,
+            pairs.cpu(),
+            self.confidence_threshold,
+            self.models.vocabulary,
+            top_k=self.top_k,
+            max_relationships=self.max_relationships,
+            dedupe_symmetric=self.dedupe_symmetric,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate scene graphs from a video or a directory of frames"
+    )
+    parser.add_argument("source", help="Video file or directory of frame images")
+    parser.add_argument(
+        "--output", default="-", help="JSON lines output file (default: stdout)"
+    )
+    parser.add_argument(
+        "--model-path",
+        default=os.environ.get("SGG_MODEL_PATH", "app/models/model.pth"),
+    )
+    parser.add_argument(
+        "--vocabulary-path",
+        default=os.environ.get("SGG_VOCABULARY_PATH", "app/models/vocabulary.json"),
+    )
+    parser.add_argument("--fps", type=float, default=CONFIG["video"]["sample_fps"])
+    parser.add_argument(
+        "--source-fps",
+        type=float,
+        default=None,
+        help="Frame rate of the source (read from video files, 30 for directories)",
+    )
+    parser.add_argument("--confidence-threshold", type=float, default=0.5)
+    parser.add_argument(
+        "--max-pairs", type=int, default=CONFIG["relationships"]["max_pairs"]
+    )
+    args = parser.parse_args()
+
+    models = load_models(args.model_path, args.vocabulary_path)
+    generator = VideoSceneGraphGenerator(
+        models,
+        confidence_threshold=args.confidence_threshold,
+        max_pairs=args.max_pairs,
+    )
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    started = time.perf_counter()
+    try:
+        for index, timestamp, image in iter_frames(
+            args.source, args.fps, args.source_fps
+        ):
+            graph = generator.process_frame(image)
+            output.write(
+                json.dumps({"frame": index, "time": round(timestamp, 3), **graph})
+                + "\n"
+            )
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    stats = generator.stats()
+    logger.info(
+        f"Processed {stats['frames']} frames in {elapsed:.1f}s "
+        f"({stats['frames'] / max(elapsed, 1e-9):.1f} frames/s, "
+        f"{stats['keyframes']} keyframes, "
+        f"{stats['reuse_ratio']:.0%} of relationship scores reused)"
+    )
+
+
+if __name__ == "__main__":
+    main()
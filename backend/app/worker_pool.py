@@ -0,0 +1,161 @@
+import asyncio
+import math
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the inference queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _timed_call(fn: Callable, args: Tuple, kwargs: Dict) -> Tuple[float, Any]:
+    """Run fn in the worker and report when it actually started."""
+    started_at = time.time()
+    return started_at, fn(*args, **kwargs)
+
+
+class InferencePool:
+    """
+    Bounded pool that runs blocking inference off the event loop.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more
+    wait for a worker; anything beyond that is rejected immediately with
+    PoolSaturatedError instead of piling up behind the event loop.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue: int = 8,
+        executor: str = "thread",
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor_type = executor
+
+        if executor == "thread":
+            self._executor: Executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="inference"
+            )
+        elif executor == "process":
+            # Each worker process loads its own models through the initializer
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers, initializer=initializer, initargs=initargs
+            )
+        else:
+            raise ValueError(f"Unsupported executor: {executor}")
+
+        self._futures: Set[Future] = set()
+
+        # Statistics
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._futures)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        mean_run = self.total_run / self.completed if self.completed else 1.0
+        waves = max(1, self.pending - self.max_workers + 1) / self.max_workers
+        return max(1, math.ceil(mean_run * waves))
+
+    def start_workers(self, probe: Callable[[], Tuple[int, Any]]) -> Dict[int, Any]:
+        """
+        Start every worker process and wait until each has run its initializer.
+
+        probe runs in the workers and returns (pid, info); the info of every
+        worker is returned by pid. Blocks, so call it off the event loop.
+        Thread pools have nothing to start and return an empty dict.
+        """
+        workers: Dict[int, Any] = {}
+        if self.executor_type != "process":
+            return workers
+        while True:
+            # A worker only picks up tasks once its initializer is done, but
+            # the first one ready may take them all, so probe until every
+            # worker has answered
+            futures = [self._executor.submit(probe) for _ in range(self.max_workers)]
+            for future in futures:
+                pid, info = future.result()
+                workers[pid] = info
+            if len(workers) >= self.max_workers:
+                return workers
+            time.sleep(0.1)
+
+    def is_full(self) -> bool:
+        # Only touched from the event loop thread, so no lock is needed
+        return self.pending >= self.max_workers + self.max_queue
+
+    def check_capacity(self) -> None:
+        """Raise PoolSaturatedError if no queue slot is free."""
+        if self.is_full():
+            self.rejected += 1
+            raise PoolSaturatedError(self.retry_after())
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in the pool, rejecting it if the queue is full."""
+        self.check_capacity()
+        return await self._run(fn, args, kwargs)
+
+    async def run_when_free(self, fn: Callable, *args, **kwargs) -> Any:
+        """Like run, but wait for a queue slot instead of rejecting fn."""
+        while self.is_full():
+            await asyncio.sleep(self.retry_after())
+        return await self._run(fn, args, kwargs)
+
+    async def _run(self, fn: Callable, args: Tuple, kwargs: Dict) -> Any:
+        submitted_at = time.time()
+        future = self._executor.submit(_timed_call, fn, args, kwargs)
+        # The slot stays taken until the work finishes, even if the caller
+        # is cancelled while waiting for it
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        try:
+            started_at, result = await asyncio.wrap_future(future)
+        except Exception:
+            self.failed += 1
+            raise
+
+        finished_at = time.time()
+        wait = max(0.0, started_at - submitted_at)
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_run += finished_at - started_at
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        running = sum(1 for f in self._futures if f.running())
+        return {
+            "executor": self.executor_type,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": running,
+            "queue_depth": self.pending - running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "mean_wait_ms": (
+                self.total_wait / self.completed * 1000 if self.completed else 0.0
+            ),
+            "max_wait_ms": self.max_wait * 1000,
+            "mean_run_ms": (
+                self.total_run / self.completed * 1000 if self.completed else 0.0
+            ),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
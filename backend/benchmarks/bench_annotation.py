@@ -0,0 +1,89 @@
+"""
+Benchmark the annotated image renderers.
+
+Renders the same detections with the PIL annotator (boxes drawn on the image
+at native resolution) and the matplotlib annotator (300 dpi figure), and
+reports latency and output file size for each.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_annotation --image test.jpg
+
+Without --image a synthetic image of --size pixels is used; real photos give
+more realistic file sizes.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.scene_graph_service import annotate_image
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Smooth gradients plus mild noise, compressing roughly like a photo."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / width, y / height, (x + y) / (width + height)], axis=-1) * 200
+    noise = rng.normal(0, 8, size=(height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def random_objects(num_objects: int, seed: int = 0):
+    """Random normalized detections with plausible labels."""
+    rng = np.random.default_rng(seed)
+    labels = ["person", "car", "tree", "building", "dog", "window", "sign"]
+    objects = []
+    for i in range(num_objects):
+        w, h = rng.uniform(0.05, 0.4, size=2)
+        x_c, y_c = rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2)
+        objects.append(
+            {
+                "label": labels[i % len(labels)],
+                "label_id": i,
+                "score": float(rng.uniform(0.3, 1.0)),
+                "bbox": [float(x_c), float(y_c), float(w), float(h)],
+            }
+        )
+    return objects
+
+
+def time_annotator(image, objects, annotator: str, output_path: str, repeats: int):
+    annotate_image(image, objects, output_path, annotator=annotator)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        annotate_image(image, objects, output_path, annotator=annotator)
+    latency_ms = (time.perf_counter() - start) / repeats * 1000
+    return latency_ms, os.path.getsize(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--image", default=None)
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 960])
+    parser.add_argument("--objects", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.image:
+        image = np.array(Image.open(args.image).convert("RGB"))
+    else:
+        image = synthetic_image(*args.size)
+    objects = random_objects(args.objects)
+
+    print(f"image {image.shape[1]}x{image.shape[0]}, {len(objects)} objects")
+    print(f"{'annotator':>10} {'latency ms':>11} {'file KB':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for annotator in ("matplotlib", "pil"):
+            output_path = os.path.join(tmp_dir, f"{annotator}.png")
+            latency_ms, size = time_annotator(
+                image, objects, annotator, output_path, args.repeats
+            )
+            print(f"{annotator:>10} {latency_ms:>11.1f} {size / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Compare the eager scene graph model with its TorchScript and ONNX exports.
+
+Exports the model with app.export_model, checks that every runtime returns
+the same outputs as the eager model (largest absolute difference per output,
+identical pair selection) and reports per-stage latency: backbone, RoI
+pooling with the object heads and relationship scoring for the eager model,
+and the packed graph and full call (including pair building) for all of them.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_export --threads 4
+    python -m benchmarks.bench_export --heads relationships
+
+ONNX Runtime is an optional dependency (pip install onnxruntime); its rows
+are skipped when it is not installed.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import torch
+
+from app.export_model import export_model
+from app.scene_graph_service import (
+    CONFIG,
+    MODEL_HEADS,
+    ExportedSceneGraphModel,
+    SceneGraphGenerationModel,
+    Vocabulary,
+    build_model,
+)
+from benchmarks.bench_pair_pruning import random_boxes
+
+OUTPUT_KEYS = ("obj_logits", "attr_logits", "bbox_pred", "rel_logits")
+
+
+def time_call(fn, repeats: int) -> float:
+    with torch.no_grad():
+        fn()  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def max_differences(expected: dict, actual: dict) -> dict:
+    """Largest absolute difference of every output over all images."""
+    differences = {}
+    for key in OUTPUT_KEYS:
+        differences[key] = 0.0
+        for a, b in zip(expected[key], actual[key]):
+            if a is None or b is None:
+                assert a is None and b is None, f"{key}: outputs missing"
+                continue
+            differences[key] = max(differences[key], (a - b).abs().max().item())
+    for a, b in zip(expected["obj_pairs"], actual["obj_pairs"]):
+        assert torch.equal(a, b), "pair selection differs"
+    return differences
+
+
+def eager_stage_latencies(model: SceneGraphGenerationModel, inputs, repeats: int):
+    """Latency of the backbone, RoI pooling with object heads and relationships."""
+    images, boxes, batch_idx, pairs = inputs
+    features = model.backbone(images)
+
+    def object_heads():
+        roi_features = model.pool_rois(features, boxes[:, :4], batch_idx)
+        obj_feats = model.obj_feature_embedding(roi_features)
+        model.obj_classifier(obj_feats)
+        model.attr_classifier(obj_feats)
+        model.bbox_regressor(obj_feats)
+
+    return (
+        time_call(lambda: model.backbone(images), repeats),
+        time_call(object_heads, repeats),
+        time_call(
+            lambda: model.relationship_predictor.forward_packed(boxes, pairs), repeats
+        ),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model-path", default="app/models/model.pth")
+    parser.add_argument("--vocabulary-path", default="app/models/vocabulary.json")
+    parser.add_argument("--num-boxes", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--threads", type=int, default=None, help="ONNX Runtime intra-op threads"
+    )
+    parser.add_argument("--heads", nargs="+", choices=MODEL_HEADS, default=MODEL_HEADS)
+    parser.add_argument("--tolerance", type=float, default=1e-2)
+    args = parser.parse_args()
+
+    vocabulary = Vocabulary.load(args.vocabulary_path)
+    device = torch.device("cpu")
+    model = build_model(vocabulary, args.model_path, device)
+    num_classes = len(vocabulary.object_names)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        runtimes = {"eager": model}
+        for export_format, backend in (
+            ("torchscript", "torchscript"),
+            ("onnx", "onnxruntime"),
+        ):
+            path = os.path.join(tmp_dir, f"model.{export_format}")
+            try:
+                if backend == "onnxruntime":
+                    import onnxruntime  # noqa: F401
+                export_model(model, path, export_format, heads=args.heads)
+            except ImportError:
+                print(f"skipping {backend}: not installed")
+                continue
+            runtimes[backend] = ExportedSceneGraphModel(
+                path, backend, device, num_threads=args.threads
+            )
+
+        # Parity: batches with a single object, a few objects and pruned pairs
+        generator = torch.Generator().manual_seed(0)
+        img_size = CONFIG["img_size"]
+        cases = [([1], None), ([3, 5], None), ([args.num_boxes, 4], 30)]
+        print(f"{'backend':>12} " + " ".join(f"{key:>12}" for key in OUTPUT_KEYS))
+        with torch.no_grad():
+            worst = {name: dict.fromkeys(OUTPUT_KEYS, 0.0) for name in runtimes}
+            for counts, max_pairs in cases:
+                images = torch.randn(
+                    len(counts), 3, img_size, img_size, generator=generator
+                )
+                boxes = [random_boxes(n, num_classes, generator) for n in counts]
+                expected = model(images, boxes, max_pairs=max_pairs, heads=args.heads)
+                for name, runtime in runtimes.items():
+                    actual = runtime(
+                        images, boxes, max_pairs=max_pairs, heads=args.heads
+                    )
+                    for key, diff in max_differences(expected, actual).items():
+                        worst[name][key] = max(worst[name][key], diff)
+        for name, differences in worst.items():
+            print(
+                f"{name:>12} "
+                + " ".join(f"{differences[key]:>12.2e}" for key in OUTPUT_KEYS)
+            )
+            assert all(
+                diff <= args.tolerance for diff in differences.values()
+            ), f"{name} outputs differ from the eager model"
+
+        # Latency: one image at a time, as the service runs it
+        images = torch.randn(1, 3, img_size, img_size, generator=generator)
+        boxes = [random_boxes(args.num_boxes, num_classes, generator)]
+        packed_boxes = boxes[0]
+        batch_idx = torch.zeros(len(packed_boxes), dtype=torch.long)
+        _, pairs = SceneGraphGenerationModel.build_pairs([len(packed_boxes)], device)
+        inputs = (images, packed_boxes, batch_idx, pairs)
+
+        print()
+        print(f"{args.num_boxes} boxes, {len(pairs)} pairs")
+        print(
+            f"{'backend':>12} {'backbone ms':>12} {'objects ms':>11} "
+            f"{'relations ms':>13} {'graph ms':>9} {'total ms':>9}"
+        )
+        with torch.no_grad():
+            backbone_ms, objects_ms, relations_ms = eager_stage_latencies(
+                model, inputs, args.repeats
+            )
+        for name, runtime in runtimes.items():
+            graph_ms = time_call(
+                lambda: runtime.forward_packed(*inputs, heads=args.heads), args.repeats
+            )
+            total_ms = time_call(
+                lambda: runtime(images, boxes, heads=args.heads), args.repeats
+            )
+            if name == "eager":
+                stages = (
+                    f"{backbone_ms:>12.1f} {objects_ms:>11.1f} {relations_ms:>13.2f}"
+                )
+            else:
+                stages = f"{'-':>12} {'-':>11} {'-':>13}"
+            print(f"{name:>12} {stages} {graph_ms:>9.1f} {total_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
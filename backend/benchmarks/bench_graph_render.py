@@ -0,0 +1,101 @@
+"""
+Benchmark the scene graph renderers.
+
+Renders random scene graphs with 10, 50 and 200 relationships through the
+matplotlib renderer (spring layout, 300 dpi PNG) and the SVG renderer
+(circular layout, merged parallel edges), and reports layout time, total
+latency and file size for each.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_graph_render
+"""
+
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+import networkx as nx
+
+from app.scene_graph_service import graph_layout, save_graph
+
+
+def random_graph(num_edges: int, seed: int = 0):
+    """Random objects and relationships with about num_edges relationships."""
+    rng = random.Random(seed)
+    # Enough objects that the ordered pairs can hold the relationships
+    num_objects = math.ceil((1 + math.sqrt(1 + 4 * num_edges)) / 2) + 2
+    labels = ["person", "car", "tree", "building", "dog", "window", "sign"]
+    predicates = ["on", "near", "has", "behind", "in front of", "wearing"]
+
+    objects = [
+        {"label": labels[i % len(labels)], "label_id": i, "score": 1.0, "bbox": []}
+        for i in range(num_objects)
+    ]
+    pairs = [(s, o) for s in range(num_objects) for o in range(num_objects) if s != o]
+    relationships = []
+    for subj_idx, obj_idx in rng.sample(pairs, num_edges):
+        relationships.append(
+            {
+                "subject_id": subj_idx,
+                "object_id": obj_idx,
+                "predicate": rng.choice(predicates),
+                "predicate_id": 0,
+                "score": rng.random(),
+                "subject": objects[subj_idx]["label"],
+                "object": objects[obj_idx]["label"],
+            }
+        )
+    return objects, relationships
+
+
+def spring_layout(objects, relationships):
+    """The layout step of the matplotlib renderer."""
+    G = nx.DiGraph()
+    G.add_nodes_from(range(len(objects)))
+    G.add_edges_from((rel["subject_id"], rel["object_id"]) for rel in relationships)
+    return nx.spring_layout(G, seed=42)
+
+
+def time_call(fn, repeats: int, *args) -> float:
+    fn(*args)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(*args)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--edge-counts", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'edges':>5} {'nodes':>5} {'renderer':>10} {'layout ms':>10} "
+        f"{'total ms':>9} {'file KB':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_edges in args.edge_counts:
+            objects, relationships = random_graph(num_edges)
+            renderers = (
+                ("png", spring_layout, "graph.png"),
+                ("svg", graph_layout, "graph.svg"),
+            )
+            for name, layout, filename in renderers:
+                output_path = os.path.join(tmp_dir, filename)
+                layout_ms = time_call(layout, args.repeats, objects, relationships)
+                total_ms = time_call(
+                    save_graph, args.repeats, objects, relationships, output_path
+                )
+                size_kb = os.path.getsize(output_path) / 1024
+                print(
+                    f"{num_edges:>5} {len(objects):>5} {name:>10} {layout_ms:>10.2f} "
+                    f"{total_ms:>9.1f} {size_kb:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark candidate pair pruning against exhaustive relationship scoring.
+
+For a range of object counts, times the scene graph forward pass with every
+ordered pair scored and with only the top max_pairs spatial proposals, and
+reports the recall of the pruned pairing: the share of the exhaustive run's
+most confident relationships whose pair survives pruning.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pair_pruning --model-path app/models/model.pth
+
+Without --model-path the model is randomly initialized, which is fine for
+latency but makes the recall numbers meaningless.
+"""
+
+import argparse
+import time
+
+import torch
+
+from app.scene_graph_service import (
+    CONFIG,
+    SceneGraphGenerationModel,
+    VisualFeatureEncoder,
+    Vocabulary,
+    build_model,
+)
+
+
+def random_boxes(
+    num_boxes: int, num_classes: int, generator: torch.Generator
+) -> torch.Tensor:
+    """Random normalized [x_c, y_c, w, h, class_id] boxes, street-scene sized."""
+    boxes = torch.rand(num_boxes, 5, generator=generator)
+    boxes[:, 2:4] = boxes[:, 2:4] * 0.25 + 0.02
+    boxes[:, 4] = torch.randint(1, num_classes, (num_boxes,), generator=generator)
+    return boxes
+
+
+def time_forward(model, images, boxes, max_pairs, repeats: int) -> float:
+    with torch.no_grad():
+        model(images, boxes, max_pairs=max_pairs)  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(images, boxes, max_pairs=max_pairs)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def time_relationship_stage(
+    model, boxes: torch.Tensor, max_pairs, repeats: int
+) -> float:
+    """Time pair building, pruning and the relationship predictor only."""
+    counts = [len(boxes)]
+
+    def run():
+        local_pairs, global_pairs = model.build_pairs(counts, boxes.device)
+        _, global_pairs, _ = model.prune_pairs(
+            boxes, local_pairs, global_pairs, counts, [max_pairs]
+        )
+        model.relationship_predictor.forward_packed(boxes, global_pairs)
+
+    with torch.no_grad():
+        run()  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            run()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def pruning_recall(model, boxes: torch.Tensor, max_pairs: int, top: int) -> float:
+    """Share of the exhaustive top relationships kept by the pruned pairing."""
+    counts = [len(boxes)]
+    local_pairs, global_pairs = model.build_pairs(counts, boxes.device)
+
+    with torch.no_grad():
+        rel_logits = model.relationship_predictor.forward_packed(boxes, global_pairs)
+    rel_scores = torch.softmax(rel_logits, dim=1)[:, 1:].max(dim=1).values
+
+    # Relationship logits of a pair do not depend on the other pairs, so the
+    # pruned run scores exactly the kept subset of these pairs
+    _, kept_pairs, _ = model.prune_pairs(
+        boxes, local_pairs, global_pairs, counts, [max_pairs]
+    )
+    kept = set(map(tuple, kept_pairs.tolist()))
+
+    best = torch.topk(rel_scores, min(top, len(rel_scores))).indices
+    hits = sum(tuple(global_pairs[i].tolist()) in kept for i in best)
+    return hits / len(best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model-path", default=None)
+    parser.add_argument("--vocabulary-path", default="app/models/vocabulary.json")
+    parser.add_argument(
+        "--object-counts", type=int, nargs="+", default=[10, 30, 60, 100]
+    )
+    parser.add_argument("--max-pairs", type=int, default=256)
+    parser.add_argument(
+        "--top", type=int, default=20, help="Exhaustive relationships for recall"
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    vocabulary = Vocabulary.load(args.vocabulary_path)
+    device = torch.device("cpu")
+    if args.model_path:
+        model = build_model(vocabulary, args.model_path, device)
+    else:
+        model = SceneGraphGenerationModel(
+            backbone=VisualFeatureEncoder(backbone_name=CONFIG["model"]["backbone"]),
+            num_obj_classes=len(vocabulary.object2id),
+            num_rel_classes=len(vocabulary.relationship2id),
+            num_attr_classes=len(vocabulary.attribute2id),
+            embedding_dim=CONFIG["model"]["embedding_dim"],
+            hidden_dim=CONFIG["model"]["hidden_dim"],
+        ).eval()
+
+    generator = torch.Generator().manual_seed(0)
+    images = torch.randn(1, 3, CONFIG["img_size"], CONFIG["img_size"])
+
+    print(
+        f"{'objects':>7} {'pairs':>6} {'kept':>5} "
+        f"{'forward ms (all / pruned)':>26} {'rel stage ms (all / pruned)':>28} "
+        f"{'recall@' + str(args.top):>10}"
+    )
+    for count in args.object_counts:
+        boxes = random_boxes(count, len(vocabulary.object2id), generator)
+        num_pairs = count * (count - 1)
+
+        exhaustive_ms = time_forward(model, images, [boxes], None, args.repeats)
+        pruned_ms = time_forward(model, images, [boxes], args.max_pairs, args.repeats)
+        exhaustive_rel_ms = time_relationship_stage(model, boxes, None, args.repeats)
+        pruned_rel_ms = time_relationship_stage(
+            model, boxes, args.max_pairs, args.repeats
+        )
+        recall = pruning_recall(model, boxes, args.max_pairs, args.top)
+
+        print(
+            f"{count:>7} {num_pairs:>6} {min(num_pairs, args.max_pairs):>5} "
+            f"{exhaustive_ms:>16.1f} / {pruned_ms:>7.1f} "
+            f"{exhaustive_rel_ms:>18.1f} / {pruned_rel_ms:>7.1f} {recall:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
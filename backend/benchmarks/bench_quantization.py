@@ -0,0 +1,138 @@
+"""
+Compare the int8 quantized scene graph model with the fp32 model.
+
+Runs both models on the same images and boxes and reports backbone and full
+forward latency, top-1 agreement of object and relationship predictions,
+the largest probability difference and the bounding box error.
+
+Usage (from the backend directory):
+    python -m app.quantize --calibration-dir calibration_images/
+    python -m benchmarks.bench_quantization \
+        --quantized-path app/models/model_int8.pth --image-dir test_images/
+
+Without --quantized-path the Linear layers are quantized on the fly (fp32
+backbone). Without --image-dir random images are used, which is fine for
+latency but says little about accuracy.
+"""
+
+import argparse
+import os
+import time
+
+import torch
+from PIL import Image
+
+from app.quantize import IMAGE_EXTENSIONS
+from app.scene_graph_service import (
+    CONFIG,
+    Vocabulary,
+    build_model,
+    preprocess_image,
+    quantize_model,
+)
+from benchmarks.bench_pair_pruning import random_boxes
+
+
+def load_images(image_dir, num_images: int) -> torch.Tensor:
+    if image_dir is None:
+        generator = torch.Generator().manual_seed(0)
+        img_size = CONFIG["img_size"]
+        return torch.randn(num_images, 3, img_size, img_size, generator=generator)
+
+    filenames = sorted(
+        name
+        for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:num_images]
+    return torch.stack(
+        [
+            preprocess_image(Image.open(os.path.join(image_dir, name)).convert("RGB"))
+            for name in filenames
+        ]
+    )
+
+
+def time_call(fn, repeats: int) -> float:
+    with torch.no_grad():
+        fn()  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model-path", default="app/models/model.pth")
+    parser.add_argument("--quantized-path", default=None)
+    parser.add_argument("--vocabulary-path", default="app/models/vocabulary.json")
+    parser.add_argument("--image-dir", default=None)
+    parser.add_argument("--num-images", type=int, default=8)
+    parser.add_argument("--num-boxes", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    vocabulary = Vocabulary.load(args.vocabulary_path)
+    device = torch.device("cpu")
+    fp32_model = build_model(vocabulary, args.model_path, device)
+    if args.quantized_path:
+        int8_model = build_model(vocabulary, args.quantized_path, device)
+    else:
+        int8_model = quantize_model(build_model(vocabulary, args.model_path, device))
+
+    images = load_images(args.image_dir, args.num_images)
+    generator = torch.Generator().manual_seed(0)
+    boxes = [
+        random_boxes(args.num_boxes, len(vocabulary.object_names), generator)
+        for _ in range(len(images))
+    ]
+
+    # Accuracy: compare predictions image by image
+    obj_agree = rel_agree = total_objs = total_rels = 0
+    max_obj_prob_diff = max_rel_prob_diff = bbox_error = 0.0
+    with torch.no_grad():
+        for image, image_boxes in zip(images, boxes):
+            expected = fp32_model(image[None], [image_boxes])
+            actual = int8_model(image[None], [image_boxes])
+
+            obj_fp32 = torch.softmax(expected["obj_logits"][0], dim=1)
+            obj_int8 = torch.softmax(actual["obj_logits"][0], dim=1)
+            rel_fp32 = torch.softmax(expected["rel_logits"][0], dim=1)
+            rel_int8 = torch.softmax(actual["rel_logits"][0], dim=1)
+
+            obj_agree += (obj_fp32.argmax(1) == obj_int8.argmax(1)).sum().item()
+            rel_agree += (rel_fp32.argmax(1) == rel_int8.argmax(1)).sum().item()
+            total_objs += len(obj_fp32)
+            total_rels += len(rel_fp32)
+            max_obj_prob_diff = max(
+                max_obj_prob_diff, (obj_fp32 - obj_int8).abs().max().item()
+            )
+            max_rel_prob_diff = max(
+                max_rel_prob_diff, (rel_fp32 - rel_int8).abs().max().item()
+            )
+            bbox_error += (
+                (expected["bbox_pred"][0] - actual["bbox_pred"][0]).abs().sum().item()
+            )
+
+    # Latency: one image at a time, as the service runs it
+    image, image_boxes = images[:1], boxes[:1]
+    print(f"{'model':>6} {'backbone ms':>12} {'forward ms':>11}")
+    for name, model in (("fp32", fp32_model), ("int8", int8_model)):
+        backbone_ms = time_call(lambda: model.backbone(image), args.repeats)
+        forward_ms = time_call(lambda: model(image, image_boxes), args.repeats)
+        print(f"{name:>6} {backbone_ms:>12.1f} {forward_ms:>11.1f}")
+
+    print()
+    print(f"object top-1 agreement:        {obj_agree / total_objs:.3f}")
+    print(f"relationship top-1 agreement:  {rel_agree / total_rels:.3f}")
+    print(f"max object prob difference:    {max_obj_prob_diff:.4f}")
+    print(f"max relationship prob diff.:   {max_rel_prob_diff:.4f}")
+    print(f"mean bbox abs error:           {bbox_error / total_objs / 4:.5f}")
+
+    for path in (args.model_path, args.quantized_path):
+        if path:
+            print(f"{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
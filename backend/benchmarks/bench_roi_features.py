@@ -0,0 +1,180 @@
+"""
+Benchmark for the batched RoI feature extraction.
+
+Times the batched summed-area-table RoI pooling against the original per-box
+crop + AdaptiveAvgPool2d loop across box counts, and prints how far apart
+their outputs are. tests/test_roi_pooling.py checks that they match.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_roi_features
+"""
+
+import argparse
+import time
+from typing import List
+
+import torch
+
+from app.scene_graph_service import SceneGraphGenerationModel
+
+
+def extract_roi_features_loop(
+    features: torch.Tensor, boxes: List[torch.Tensor], roi_size: int = 7
+) -> List[torch.Tensor]:
+    """Original per-box implementation, kept here as the reference."""
+    roi_pool = torch.nn.AdaptiveAvgPool2d((roi_size, roi_size))
+    channels = features.shape[1]
+    roi_features = []
+
+    for i in range(features.shape[0]):
+        if len(boxes[i]) == 0:
+            roi_features.append(
+                torch.empty(0, channels * roi_size**2, device=features.device)
+            )
+            continue
+
+        bbox = boxes[i][:, :4]
+        x_c, y_c, w, h = bbox[:, 0], bbox[:, 1], bbox[:, 2], bbox[:, 3]
+        x1 = torch.clamp((x_c - w / 2) * features.shape[3], 0, features.shape[3] - 1)
+        y1 = torch.clamp((y_c - h / 2) * features.shape[2], 0, features.shape[2] - 1)
+        x2 = torch.clamp((x_c + w / 2) * features.shape[3], 0, features.shape[3] - 1)
+        y2 = torch.clamp((y_c + h / 2) * features.shape[2], 0, features.shape[2] - 1)
+        rois = torch.stack([x1, y1, x2, y2], dim=1)
+
+        obj_features = []
+        for roi in rois:
+            x1, y1, x2, y2 = map(int, roi.cpu().numpy())
+            if x2 <= x1 or y2 <= y1:
+                roi_feat = torch.zeros(
+                    channels, roi_size, roi_size, device=features.device
+                )
+            else:
+                roi_feat = roi_pool(features[i, :, y1:y2, x1:x2].unsqueeze(0)).squeeze(
+                    0
+                )
+            obj_features.append(roi_feat.view(-1))
+
+        roi_features.append(torch.stack(obj_features))
+
+    return roi_features
+
+
+def pooling_model(roi_size: int = 7) -> SceneGraphGenerationModel:
+    """A model with only RoI pooling set up, without the 51M-parameter heads."""
+    model = SceneGraphGenerationModel.__new__(SceneGraphGenerationModel)
+    torch.nn.Module.__init__(model)
+    model.roi_size = roi_size
+    return model
+
+
+def extract_roi_features_batched(
+    features: torch.Tensor,
+    boxes: List[torch.Tensor],
+    roi_size: int = 7,
+    fused_gather: bool = True,
+) -> List[torch.Tensor]:
+    model = pooling_model(roi_size)
+    counts = [len(b) for b in boxes]
+    if fused_gather or sum(counts) == 0:
+        packed = model.extract_packed_roi_features(features, boxes)
+    else:
+        # Same packing as extract_packed_roi_features, with the per-bin gather
+        bbox = torch.cat([b[:, :4] for b in boxes if len(b) > 0])
+        batch_idx = torch.repeat_interleave(
+            torch.arange(len(boxes), device=features.device),
+            torch.tensor(counts, device=features.device),
+        )
+        packed = model.pool_rois(features, bbox, batch_idx, fused_gather=False)
+    return list(packed.split(counts))
+
+
+def random_boxes(num_boxes: int, generator: torch.Generator) -> torch.Tensor:
+    """Random normalized [x_c, y_c, w, h, class_id] boxes."""
+    boxes = torch.rand(num_boxes, 5, generator=generator)
+    boxes[:, 2:4] = boxes[:, 2:4] * 0.6 + 0.01
+    boxes[:, 4] = 0
+    return boxes
+
+
+def degenerate_boxes() -> torch.Tensor:
+    """Boxes that hit the clamping and empty-crop branches."""
+    return torch.tensor(
+        [
+            [0.5, 0.5, 0.0, 0.0, 0],  # zero size
+            [0.5, 0.5, 0.01, 0.5, 0],  # narrower than one feature cell
+            [0.5, 0.5, 0.5, 0.01, 0],  # shorter than one feature cell
+            [0.5, 0.5, 1.0, 1.0, 0],  # whole image
+            [1.2, 1.2, 0.3, 0.3, 0],  # completely outside
+            [-0.1, 0.5, 0.4, 0.4, 0],  # partially outside
+            [0.99, 0.99, 0.05, 0.05, 0],  # bottom-right corner
+            [0.2, 0.3, 0.12, 0.1, 0],  # smaller than the 7x7 grid
+        ]
+    )
+
+
+def check_parity(features: torch.Tensor, boxes: List[torch.Tensor]) -> float:
+    reference = extract_roi_features_loop(features, boxes)
+    batched = extract_roi_features_batched(features, boxes)
+
+    max_error = 0.0
+    for ref, out in zip(reference, batched):
+        assert ref.shape == out.shape, f"Shape mismatch: {ref.shape} vs {out.shape}"
+        if ref.numel():
+            max_error = max(max_error, (ref - out).abs().max().item())
+    return max_error
+
+
+def time_call(fn, *args, repeats: int) -> float:
+    fn(*args)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(*args)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--box-counts", type=int, nargs="+", default=[1, 10, 30, 60, 100, 300]
+    )
+    parser.add_argument("--feature-size", type=int, default=16)
+    parser.add_argument("--channels", type=int, default=2048)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    generator = torch.Generator().manual_seed(0)
+    size = args.feature_size
+    # Backbone features are post-ReLU, hence non-negative
+    features = torch.rand(2, args.channels, size, size, generator=generator) * 4
+
+    # Parity: random boxes in a two-image batch, an empty image and edge cases
+    cases = {
+        "random": [random_boxes(50, generator), random_boxes(20, generator)],
+        "empty image": [random_boxes(5, generator), torch.zeros(0, 5)],
+        "degenerate": [degenerate_boxes(), degenerate_boxes()],
+    }
+    with torch.no_grad():
+        for name, boxes in cases.items():
+            error = check_parity(features, boxes)
+            print(f"parity [{name}]: max abs error {error:.2e}")
+
+    print()
+    print(f"{'boxes':>6} {'loop ms':>10} {'batched ms':>11} {'speedup':>8}")
+    with torch.no_grad():
+        for count in args.box_counts:
+            boxes = [random_boxes(count, generator)]
+            single = features[:1]
+            loop_ms = time_call(
+                extract_roi_features_loop, single, boxes, repeats=args.repeats
+            )
+            batched_ms = time_call(
+                extract_roi_features_batched, single, boxes, repeats=args.repeats
+            )
+            print(
+                f"{count:>6} {loop_ms:>10.2f} {batched_ms:>11.2f} "
+                f"{loop_ms / batched_ms:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
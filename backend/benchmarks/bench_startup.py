@@ -0,0 +1,75 @@
+"""
+Measure how long a fresh worker takes to become ready.
+
+Imports app.scene_graph_service in a new interpreter (as a freshly started
+worker would) and compares loading the checkpoint by copying every tensor
+(the previous torch.load) with memory-mapping it into a model created on the
+meta device (build_model).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --model-path app/models/model.pth
+
+Run it twice: the first run after a reboot reads the checkpoint from disk,
+later runs are served from the page cache, as for every worker but the first.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+import psutil
+import torch
+
+from app.scene_graph_service import Vocabulary, build_model, create_model
+
+
+def time_import(module: str) -> float:
+    """Seconds to import a module in a new interpreter, minus the interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - start - baseline
+
+
+def copying_load(vocabulary: Vocabulary, model_path: str) -> torch.nn.Module:
+    """Load the checkpoint the way the service did before memory-mapping."""
+    model = create_model(vocabulary)
+    checkpoint = torch.load(model_path, map_location="cpu")
+    model.load_state_dict(checkpoint.get("model_state_dict", checkpoint))
+    return model.eval()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model-path", default="app/models/model.pth")
+    parser.add_argument("--vocabulary-path", default="app/models/vocabulary.json")
+    args = parser.parse_args()
+
+    for module in ("torch", "app.scene_graph_service", "app.main"):
+        print(f"import {module:<26} {time_import(module):>7.2f} s")
+    print()
+
+    vocabulary = Vocabulary.load(args.vocabulary_path)
+    device = torch.device("cpu")
+    process = psutil.Process()
+
+    print(f"{'loader':>8} {'load s':>7} {'RSS delta MB':>13}")
+    for name, load in (
+        ("copy", lambda: copying_load(vocabulary, args.model_path)),
+        ("mmap", lambda: build_model(vocabulary, args.model_path, device)),
+    ):
+        rss_before = process.memory_info().rss
+        start = time.perf_counter()
+        model = load()
+        elapsed = time.perf_counter() - start
+        rss_delta = (process.memory_info().rss - rss_before) / 1024 / 1024
+        print(f"{name:>8} {elapsed:>7.2f} {rss_delta:>13.1f}")
+        del model
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark and parity check for the vectorized YOLO post-processing.
+
+Converts synthetic YOLO detections into normalized vocabulary boxes with the
+original per-box loop and with yolo_detections_to_boxes, checks that both
+give the same boxes and times them for 10 to 300 detections.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_yolo_postprocess
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from app.scene_graph_service import CONFIG, yolo_detections_to_boxes
+
+NUM_YOLO_CLASSES = 80
+
+
+def detections_to_boxes_loop(
+    detections: Results, class_map: np.ndarray, device: torch.device
+) -> torch.Tensor:
+    """Original per-box implementation, kept here as the reference."""
+    if len(detections.boxes) == 0:
+        return torch.zeros((0, 5), device=device, dtype=torch.float32)
+
+    boxes = []
+    img_height, img_width = detections.orig_shape
+    for i in range(len(detections.boxes)):
+        box = detections.boxes[i]
+        cls_id = int(box.cls.item())
+        confidence = box.conf.item()
+        if confidence < CONFIG["yolo"]["conf"]:
+            continue
+
+        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+        x_c = ((x1 + x2) / 2) / img_width
+        y_c = ((y1 + y2) / 2) / img_height
+        w = (x2 - x1) / img_width
+        h = (y2 - y1) / img_height
+        vocab_cls_id = int(class_map[cls_id]) if cls_id < len(class_map) else 0
+        boxes.append([x_c, y_c, w, h, vocab_cls_id])
+
+    if boxes:
+        return torch.tensor(boxes, device=device, dtype=torch.float32)
+    return torch.zeros((0, 5), device=device, dtype=torch.float32)
+
+
+def random_detections(
+    num_detections: int, generator: torch.Generator, width=640, height=480
+) -> Results:
+    """Ultralytics Results holding random boxes, scores and COCO classes."""
+    x1 = torch.rand(num_detections, generator=generator) * width * 0.7
+    y1 = torch.rand(num_detections, generator=generator) * height * 0.7
+    x2 = x1 + torch.rand(num_detections, generator=generator) * width * 0.3 + 1
+    y2 = y1 + torch.rand(num_detections, generator=generator) * height * 0.3 + 1
+    conf = torch.rand(num_detections, generator=generator)
+    cls = torch.randint(0, NUM_YOLO_CLASSES, (num_detections,), generator=generator)
+    data = torch.stack([x1, y1, x2, y2, conf, cls.float()], dim=1)
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    names = {i: f"class{i}" for i in range(NUM_YOLO_CLASSES)}
+    return Results(image, path="", names=names, boxes=data)
+
+
+def time_call(fn, repeats: int, *args) -> float:
+    fn(*args)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(*args)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--detection-counts", type=int, nargs="+", default=[10, 30, 100, 300]
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    generator = torch.Generator().manual_seed(0)
+    # Some YOLO classes map to <unk>, as with the real vocabulary
+    class_map = torch.randint(0, 7000, (NUM_YOLO_CLASSES,), generator=generator)
+    class_map[::7] = 0
+    class_map = class_map.numpy()
+
+    print(
+        f"{'detections':>10} {'kept':>5} {'loop ms':>8} {'vectorized ms':>14} {'match':>6}"
+    )
+    for count in args.detection_counts:
+        detections = random_detections(count, generator)
+        expected = detections_to_boxes_loop(detections, class_map, device)
+        actual = yolo_detections_to_boxes(detections, class_map, device)
+        match = expected.shape == actual.shape and torch.equal(expected, actual)
+
+        loop_ms = time_call(
+            detections_to_boxes_loop, args.repeats, detections, class_map, device
+        )
+        vectorized_ms = time_call(
+            yolo_detections_to_boxes, args.repeats, detections, class_map, device
+        )
+        print(
+            f"{count:>10} {len(expected):>5} {loop_ms:>8.2f} "
+            f"{vectorized_ms:>14.3f} {str(match):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Batched RoI pooling must match the original per-box implementation."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from benchmarks.bench_roi_features import (
+    degenerate_boxes,
+    extract_roi_features_batched,
+    extract_roi_features_loop,
+    random_boxes,
+)
+
+
+@pytest.fixture
+def features():
+    generator = torch.Generator().manual_seed(0)
+    # Backbone features are post-ReLU, hence non-negative
+    return torch.rand(2, 64, 16, 16, generator=generator) * 4
+
+
+def make_cases():
+    generator = torch.Generator().manual_seed(1)
+    return {
+        "random": [random_boxes(50, generator), random_boxes(20, generator)],
+        "empty image": [random_boxes(5, generator), torch.zeros(0, 5)],
+        "no boxes": [torch.zeros(0, 5), torch.zeros(0, 5)],
+        "degenerate": [degenerate_boxes(), degenerate_boxes()],
+    }
+
+
+@pytest.mark.parametrize("fused_gather", [True, False])
+@pytest.mark.parametrize("case", ["random", "empty image", "no boxes", "degenerate"])
+def test_batched_matches_loop(features, case, fused_gather):
+    boxes = make_cases()[case]
+    with torch.no_grad():
+        reference = extract_roi_features_loop(features, boxes)
+        batched = extract_roi_features_batched(
+            features, boxes, fused_gather=fused_gather
+        )
+
+    assert len(batched) == len(reference)
+    for ref, out in zip(reference, batched):
+        assert out.shape == ref.shape
+        if ref.numel():
+            torch.testing.assert_close(out, ref, rtol=1e-4, atol=1e-3)
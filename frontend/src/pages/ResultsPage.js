@@ -491,14 +491,6 @@ const ResultsPage = () => {
           // Get the short ID (first part of UUID) to construct filenames
           const shortId = jobId.split("-")[0];
 
-          // Construct image URLs with the correct pattern
-          const annotated_image_url = `/outputs/${jobId}/${shortId}_annotated.png`;
-          const graph_url = `/outputs/${jobId}/${shortId}_graph.png`;
-
-          console.log("Attempting to load:");
-          console.log(" - Annotated image:", annotated_image_url);
-          console.log(" - Graph:", graph_url);
-
           // Try to fetch job data if API endpoint is implemented
           let apiData = {};
           try {
@@ -543,6 +535,18 @@ const ResultsPage = () => {
             };
           }
 
+          // Use the image URLs from the API (the graph is an SVG by default);
+          // only guess them from the job ID when the API did not return any
+          const annotated_image_url =
+            apiData.annotated_image_url ||
+            `/outputs/${jobId}/${shortId}_annotated.png`;
+          const graph_url =
+            apiData.graph_url || `/outputs/${jobId}/${shortId}_graph.png`;
+
+          console.log("Attempting to load:");
+          console.log(" - Annotated image:", annotated_image_url);
+          console.log(" - Graph:", graph_url);
+
           // Add image URLs to the data object
           const resultData = {
             ...apiData,